@@ -8,6 +8,7 @@
 import struct
 import os
 import array
+import micropython
 
 class BNO055:
     ''' @brief    An orientation sensor driver class for the BNO055 from Bosch Sensortec.
@@ -33,6 +34,12 @@ class BNO055:
         ## @brief     A boolean flag used to start IMU calibration
         #  @details   Works with the task IMU and user interface to do IMU calibration
         self.calib_IMU_flag = calib_IMU_flag
+        ## @brief     Buffer reused for every euler angle read
+        #  @details   Preallocated so that euler_angle_into() does not allocate
+        self._eul_buf = bytearray(6)
+        ## @brief     Buffer reused for every angular velocity read
+        #  @details   Preallocated so that angular_vel_into() does not allocate
+        self._ang_buf = bytearray(6)
         
     def set_operating (self):
         ''' @brief Sets operating mode
@@ -80,6 +87,7 @@ class BNO055:
                     #f.write(f"{R55}, {R56}, {R57}, {R58}, {R59}, {R5A}, {R5B}, {R5C}, {R5D}, {R5E}, {R5F}, {R60}, {R61}, {R62}, {R63}, {R64}, {R65}, {R66}, {R67}, {R68}, {R69}, {RA}\r\n")
                     pass
         
+    # emitter: native
     def euler_angle (self):
         ''' @brief Obtains and returns euler angles measured by the i2c
         '''
@@ -91,6 +99,7 @@ class BNO055:
         return(eul_vals)
                  
     
+    # emitter: native
     def angular_vel (self):
         ''' @brief Obtains and returns angular velocity measured by the i2c
         '''
@@ -100,4 +109,64 @@ class BNO055:
         ang_signed_ints = struct.unpack('<hhh', ang_bytes)        
         ang_vals = tuple(ang_int/900 for ang_int in ang_signed_ints)
         return(ang_vals)
-  
\ No newline at end of file
+
+    # emitter: native
+    def euler_angle_into (self, eul_vals):
+        ''' @brief          Reads euler angles into a preallocated array
+            @details        Unlike euler_angle(), this does not set the operating mode
+                            and reuses the same buffers on every call, so the only
+                            objects created are the resulting floats.
+            @param eul_vals An array of at least three floats that receives heading, roll, and pitch in degrees
+        '''
+        buf = self.i2c.mem_read(self._eul_buf, 0x28, 0x1A)
+        eul_vals[0] = _int16(buf[0], buf[1])/16
+        eul_vals[1] = _int16(buf[2], buf[3])/16
+        eul_vals[2] = _int16(buf[4], buf[5])/16
+
+    # emitter: native
+    def angular_vel_into (self, ang_vals):
+        ''' @brief          Reads angular velocities into a preallocated array
+            @details        Unlike angular_vel(), this does not set the operating mode
+                            and reuses the same buffers on every call.
+            @param ang_vals An array of at least three floats that receives the x, y, and z angular velocities
+        '''
+        buf = self.i2c.mem_read(self._ang_buf, 0x28, 0x14)
+        ang_vals[0] = _int16(buf[0], buf[1])/900
+        ang_vals[1] = _int16(buf[2], buf[3])/900
+        ang_vals[2] = _int16(buf[4], buf[5])/900
+
+    # emitter: native
+    def euler_angle_raw_into (self, eul_raw):
+        ''' @brief          Reads the raw euler angle registers into a preallocated array
+            @details        Like euler_angle_into(), but without the division, so no objects
+                            are created at all. The values are in units of 1/16 degree.
+            @param eul_raw  An integer array of at least three elements that receives heading, roll, and pitch
+        '''
+        buf = self.i2c.mem_read(self._eul_buf, 0x28, 0x1A)
+        eul_raw[0] = _int16(buf[0], buf[1])
+        eul_raw[1] = _int16(buf[2], buf[3])
+        eul_raw[2] = _int16(buf[4], buf[5])
+
+    # emitter: native
+    def angular_vel_raw_into (self, ang_raw):
+        ''' @brief          Reads the raw angular velocity registers into a preallocated array
+            @details        Like angular_vel_into(), but without the division. The values are
+                            in units of 1/900 rad/s.
+            @param ang_raw  An integer array of at least three elements that receives the x, y, and z angular velocities
+        '''
+        buf = self.i2c.mem_read(self._ang_buf, 0x28, 0x14)
+        ang_raw[0] = _int16(buf[0], buf[1])
+        ang_raw[1] = _int16(buf[2], buf[3])
+        ang_raw[2] = _int16(buf[4], buf[5])
+
+# emitter: viper
+def _int16 (lsb: int, msb: int) -> int:
+    ''' @brief      Combines two register bytes into a signed 16-bit integer
+        @details    The annotations let the viper emitter keep every value a machine integer
+        @param lsb  The least significant byte
+        @param msb  The most significant byte
+    '''
+    value = lsb | (msb << 8)
+    if value > 32767:
+        value -= 65536
+    return value
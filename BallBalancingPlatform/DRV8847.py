@@ -7,6 +7,7 @@
 '''
 import pyb
 import utime
+import micropython
 
 
 class DRV8847:
@@ -94,6 +95,7 @@ class Motor:
         self.channel_B = self.tim.channel(channel_B, pyb.Timer.PWM, pin=pinB)
         pass
     
+    # emitter: native
     def set_duty (self, duty):
         ''' @brief Set the PWM duty cycle for the motor channel.
             @details This method sets the duty cycle to be sent to the motor to the 
@@ -0,0 +1,129 @@
+'''@file        async_runtime.py
+   @brief       uasyncio runtime for the term project tasks.
+   @details     An alternative to scheduler.py where every task runs as a
+                coroutine. Periodic tasks sleep until their next deadline,
+                the user interface waits for serial input through a stream
+                reader instead of polling the serial port on every pass, and
+                touch panel calibration yields while it waits for contact.
+                Runs on uasyncio on the Nucleo and on asyncio under CPython
+                with the stand-ins in the host directory.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import utime
+import task_userinterface
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+async def sleep_us(us):
+    ''' @brief      Waits the given number of microseconds
+        @details    uasyncio sleeps with millisecond resolution, so on the Nucleo the
+                    wait is rounded up to whole milliseconds, and is at least 1 ms.
+                    Rounding down would turn every wait under 1 ms into sleep_ms(0),
+                    which returns at once and makes the coroutine poll.
+        @param us   The number of microseconds to wait
+    '''
+    if hasattr(asyncio, 'sleep_ms'):
+        await asyncio.sleep_ms(max(1, (us + 999) // 1000))
+    else:
+        await asyncio.sleep(us / 1000000)
+
+def serial_reader(ser):
+    ''' @brief      Creates a stream reader for a serial port
+        @param ser  A pyb.USB_VCP object
+        @return     An object whose read() coroutine waits for characters
+    '''
+    if hasattr(ser, 'stream'):
+        # Host stand-in for pyb.USB_VCP
+        return ser.stream()
+    return asyncio.StreamReader(ser)
+
+async def wait_release(next_time, period):
+    ''' @brief            Waits for the next release of a task on a fixed period grid
+        @details          Releases are kept on a fixed period grid so the rate does not drift
+                          with the run time of the task. After a stall, the grid is restarted
+                          from the current time instead of running back to back. Every
+                          coroutine of this module releases its task through here.
+        @param next_time  The utime.ticks_us() value of the latest release
+        @param period     The period, in microseconds, between releases
+        @return           The utime.ticks_us() value of the release waited for
+    '''
+    next_time = utime.ticks_add(next_time, period)
+    delay = utime.ticks_diff(next_time, utime.ticks_us())
+    if delay < 0:
+        next_time = utime.ticks_add(utime.ticks_us(), period)
+        delay = period
+    await sleep_us(delay)
+    return next_time
+
+async def periodic(task, period):
+    ''' @brief          Runs a task once per period
+        @details        See wait_release() for the release grid.
+        @param task     Any object with a run() method
+        @param period   The period, in microseconds, between runs of the task
+    '''
+    next_time = utime.ticks_us()
+    while True:
+        task.run()
+        next_time = await wait_release(next_time, period)
+
+async def user_interface(task_user):
+    ''' @brief              Runs the user interface task
+        @details            While Task_User waits for a command, this coroutine waits on
+                            the serial stream and uses no CPU time. In every other state
+                            Task_User runs once per period on the grid of wait_release(),
+                            which starts from the command, so data collection and printing
+                            keep their timing and yield between runs.
+        @param task_user    The Task_User object
+    '''
+    reader = serial_reader(task_user.ser)
+    next_time = utime.ticks_us()
+    while True:
+        if task_user.state == task_userinterface.S1_wait_for_char:
+            char_in = await reader.read(1)
+            next_time = utime.ticks_us()
+            task_user.handle_char(char_in.decode(), next_time)
+        else:
+            task_user.run()
+            next_time = await wait_release(next_time, task_user.period)
+
+async def panel(task_panel):
+    ''' @brief              Runs the touch panel task
+        @details            Calibration is run here one contact check at a time, so the
+                            other tasks keep running while the user places a finger on
+                            the panel, instead of from Task_Panel where it would block.
+                            The scans are released on the grid of wait_release() every
+                            period_pan, which restarts after a calibration. uasyncio wakes a
+                            coroutine on a tick of utime.ticks_ms(), at most 1 ms after its
+                            release, so with the 1 ms period_pan of main.py the panel is
+                            scanned once per millisecond tick.
+        @param task_panel   The Task_Panel object
+    '''
+    next_time = utime.ticks_us()
+    while True:
+        if task_panel.calib_pan_flag.read() == 1:
+            for delay in task_panel.panel_obj.calibrate_steps():
+                await asyncio.sleep(delay)
+            task_panel.calib_pan_flag.write(0)
+            task_panel.runs = 0
+            next_time = utime.ticks_us()
+        task_panel.run()
+        next_time = await wait_release(next_time, task_panel.period_pan)
+
+async def run(task_user, task_panel, task_list):
+    ''' @brief              Runs every task until one of them raises an exception
+        @param task_user    The Task_User object
+        @param task_panel   The Task_Panel object, or None if the panel is scanned by another task
+        @param task_list    A list of (task, period) pairs for the remaining periodic tasks
+    '''
+    coroutines = [user_interface(task_user)]
+    if task_panel is not None:
+        coroutines.append(panel(task_panel))
+    for task, period in task_list:
+        coroutines.append(periodic(task, period))
+    await asyncio.gather(*coroutines)
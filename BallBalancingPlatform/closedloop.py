@@ -7,6 +7,38 @@
 '''
 
 from ulab import numpy as np
+import array
+import math
+import os
+import micropython
+from micropython import const
+
+## @brief     Duty cycle, in percent, per unit of computed torque
+#  @details   The conversion the gains were tuned with: 13.345*Torque*100/4
+DUTY_PER_TORQUE = 13.345*100/4
+
+## @brief     Position units per mm in the fixed-point state vectors
+#  @details   Positions are held in 1/256 mm, finer than one panel ADC count of about
+#             0.05 mm, so that the change of position over one control period still
+#             resolves slow ball velocities
+POSITION_SCALE = 256
+
+## @brief     BNO055 euler angle register units per degree
+ANGLE_SCALE = 16
+
+## @brief     BNO055 angular velocity register units per rad/s
+RATE_SCALE = 900
+
+## @brief     Fraction bits of the fixed-point duty cycle gains
+#  @details   Written as a bare const() so that the compiler folds it into the viper
+#             FixedLoop.run() as a machine integer, which micropython.const() is not
+GAIN_SHIFT = const(16)
+
+## @brief     Largest residual of a region inequality that still counts as inside the region
+#  @details   host/mpc_table.py scales every inequality so that no state vector element
+#             can change its left hand side by more than one over the range the table
+#             was built for. This covers the rounding of the single precision table.
+MPC_TOLERANCE = 1e-4
 
 class ClosedLoop:
     ''' @brief   A closed loop speed control used in conjuction with the motor and encoder drivers
@@ -14,7 +46,7 @@ class ClosedLoop:
         
     '''
 
-    def __init__ (self, sat_max, sat_min, L, state_vect, gain):
+    def __init__ (self, sat_max, sat_min, L, state_vect, gain, max_age=None, schedule=None, axis=0):
         ''' @brief            Constructs a controller object that computes an actuation value based on reference and measured values
             @details          This class uses gains and position and angle data to compute an actuation value.
             @param sat_max    Variable used to define maximum saturation limit for the PWM level used for motor speed
@@ -22,6 +54,10 @@ class ClosedLoop:
             @param L          Variable used to define actuation level
             @state_vect       Variable used to define state vectors
             @param gain       Variable used to define proportional gain value
+            @param max_age    Optional age, in microseconds, beyond which a state vector element is
+                              considered stale. The actuation level is held at zero while any element is stale.
+            @param schedule   Optional GainSchedule that replaces the gain vector on every run
+            @param axis       The axis of the schedule this controller uses, 0 for x and 1 for y
         '''
         ## @brief    Variable used to define maximum saturation limit for the PWM level
         #  @details  This value is set to ensure the motor does not fall below a maximum PWM level
@@ -35,27 +71,62 @@ class ClosedLoop:
         ## @brief    Variable used to define proportional gain value
         #  @details  This value is the proportional gain inputted by the user.
         self.gain = gain
+        ## @brief    The gain vector negated and scaled from torque to duty cycle
+        #  @details  Computed once so that run() only takes a single dot product
+        self.duty_gain = gain*(-DUTY_PER_TORQUE)
         ## @brief    Variable used to define state vectors
-        #  @details  This array is filled with data in the following order: [position, velocity, angle, angular velocity]
+        #  @details  A shares.StateVector filled with data in the following order: [position, angle, velocity, angular velocity]
         self.state_vect = state_vect
+        ## @brief    Age, in microseconds, beyond which a state vector element is stale
+        #  @details  None disables the check
+        self.max_age = max_age
+        ## @brief    Sequence number of the state vector used for the latest actuation value
+        #  @details  The actuation value is only recomputed when the state vector has been written since
+        self.state_seq = -1
+        ## @brief    Number of runs that found a stale state vector element
+        self.stale_count = 0
+        ## @brief    Variable used to define the array for state vectors
+        #  @details  A view of the state vector share, which the touch panel and IMU tasks update in place
+        self.state_vect_array = state_vect.view()
+        ## @brief    Optional GainSchedule that supplies the gain vector
+        #  @details  None uses the fixed gain vector
+        self.schedule = schedule
+        ## @brief    The axis of the schedule, 0 for x and 1 for y
+        self.axis = axis
         
+    # emitter: native
     def run (self):
         ''' @brief Uses state vector values and gain values to compute torque to compute actuation value L.
+            @details Checks first that no state vector element is older than max_age, so a
+                     sensor that stops writing is caught, then does nothing if the state
+                     vector has not been written since the previous run.
+                     The only object created is the float result of the dot product,
+                     which is clamped to the saturation limits and written to L once.
         '''
-        ## @brief    Variable used to define the array for state vectors
-        #  @details  This array will be filled with state vector data read from the touch panel and IMU
-        self.state_vect_array = np.array([self.state_vect[0].read(), self.state_vect[1].read(), self.state_vect[2].read(), self.state_vect[3].read()])                  
-        ## @brief    Variable used to define the torque calculated
-        #  @details  This value is calculated using gain values and the state vector values
-        self.Torque = np.dot(-self.gain,self.state_vect_array)
-        self.L.write((13.345)*self.Torque*100/4)
-        if self.L.read() > self.sat_max:
-           self.L.write(self.sat_max)
-        if self.L.read() < self.sat_min:
-           self.L.write(self.sat_min)
-        pass                  
+        if self.max_age is not None and self.state_vect.max_age() > self.max_age:
+            self.stale_count += 1
+            self.L.write(0)
+            return
+        if not self.state_vect.changed_since(self.state_seq):
+            return
+        self.state_seq = self.state_vect.seq
+        if self.schedule is not None:
+            self.schedule.duty_gain_into(self.axis, self.duty_gain)
+        duty = np.dot(self.duty_gain, self.state_vect_array)
+        if duty > self.sat_max:
+            duty = self.sat_max
+        elif duty < self.sat_min:
+            duty = self.sat_min
+        self.L.write(duty)
                            
     
+    def set_gain (self, gain):
+        ''' @brief Replaces the gain vector
+            @param gain The new gain vector
+        '''
+        self.gain = gain
+        self.duty_gain = gain*(-DUTY_PER_TORQUE)
+
     def get__Kp (self):
         ''' @brief Returns gain value for modification
         '''
@@ -67,4 +138,478 @@ class ClosedLoop:
         '''
         ## @brief    Kp represents the proportional gain value
         #  @details  This value is used for modification
-        self.Kp = Kp
\ No newline at end of file
+        self.Kp = Kp
+
+class FixedLoop:
+    ''' @brief   A closed loop controller that only uses integer arithmetic
+        @details The state vector holds integers in the units the sensors deliver
+                 them in: the ball position in 1/POSITION_SCALE mm, the platform
+                 angle in the 1/16 degree units of the BNO055 euler angle registers,
+                 the ball velocity as the change of position over one control
+                 period, and the angular velocity in the 1/900 rad/s units of the
+                 BNO055 gyro registers. The float gain vector of ClosedLoop is
+                 converted once into integer gains with GAIN_SHIFT fraction bits
+                 that include the conversion to duty cycle, so run() is four integer
+                 multiplications, a shift, and a clamp, and the duty cycle is an
+                 integer percent. All intermediate values stay small integers for
+                 state vectors within the panel and the normal range of motion.
+    '''
+
+    def __init__ (self, sat_max, sat_min, L, gain, period):
+        ''' @brief            Constructs a fixed-point controller
+            @param sat_max    Maximum duty cycle, an integer percent
+            @param sat_min    Minimum duty cycle, an integer percent
+            @param L          Share that receives the duty cycle
+            @param gain       The float gain vector of ClosedLoop, on [mm, degrees, mm/us, rad/s]
+            @param period     The control period in microseconds, over which the velocity is measured
+        '''
+        ## @brief    Maximum duty cycle, an integer percent
+        self.sat_max = sat_max
+        ## @brief    Minimum duty cycle, an integer percent
+        self.sat_min = sat_min
+        ## @brief    Share that receives the duty cycle
+        self.L = L
+        ## @brief    The control period in microseconds
+        self.period = period
+        ## @brief    The integer state vector, written by Task_ControlFixed
+        #  @details  [position, angle, change of position per period, angular velocity] in sensor units
+        self.state = array.array('i', 4*[0])
+        self.set_gain(gain)
+
+    def set_gain (self, gain):
+        ''' @brief      Converts a float gain vector into the integer duty cycle gains
+            @param gain The float gain vector of ClosedLoop
+        '''
+        ## @brief    The float gain vector
+        self.gain = gain
+        scale = (POSITION_SCALE, ANGLE_SCALE, POSITION_SCALE*self.period, RATE_SCALE)
+        ## @brief    Duty cycle gains per state vector unit with GAIN_SHIFT fraction bits
+        self.duty_gain = array.array('i', [int(round(-DUTY_PER_TORQUE*gain[n]/scale[n]*(1 << GAIN_SHIFT))) for n in range(4)])
+
+    # emitter: viper
+    def run (self):
+        ''' @brief Computes the duty cycle from the integer state vector and writes it to L
+            @details The int() conversions keep every value a machine integer when
+                     run() is compiled with the viper emitter, where the sum of the
+                     four products must then stay below 2**31.
+        '''
+        s = self.state
+        g = self.duty_gain
+        duty = (int(g[0])*int(s[0]) + int(g[1])*int(s[1]) + int(g[2])*int(s[2]) + int(g[3])*int(s[3])
+                + (1 << (GAIN_SHIFT - 1))) >> GAIN_SHIFT
+        if duty > int(self.sat_max):
+            duty = int(self.sat_max)
+        elif duty < int(self.sat_min):
+            duty = int(self.sat_min)
+        self.L.write(duty)
+
+class GainSchedule:
+    ''' @brief   A table of gain vectors indexed by ball radius and ball speed
+        @details The table holds one gain vector per axis at every point of an
+                 evenly spaced grid of radius and speed, flattened into a single
+                 array. Once per state vector update the radius and speed of the
+                 ball are computed and the grid cell and bilinear weights are found,
+                 and each controller then interpolates its gain vector from the four
+                 corners of that cell. Beyond the last grid point the gains of the
+                 edge of the table are used.
+    '''
+
+    def __init__ (self, state_vect, radius_step, speed_step, num_radius, num_speed, table):
+        ''' @brief             Constructs a gain schedule
+            @param state_vect  A shares.StateVector of both axes, [x, theta_y, x_dot, theta_y_dot, y, theta_x, y_dot, theta_x_dot]
+            @param radius_step Spacing of the grid in ball radius, in mm
+            @param speed_step  Spacing of the grid in ball speed, in mm/us
+            @param num_radius  Number of grid points in radius, at least 2
+            @param num_speed   Number of grid points in speed, at least 2
+            @param table       The gains, 8 per grid point, the x axis gains followed by the y axis
+                               gains, with the grid points ordered by radius and then by speed
+        '''
+        ## @brief    The state vector of both axes
+        self.state_vect = state_vect
+        ## @brief    View of the state vector share
+        self.state_vect_array = state_vect.view()
+        ## @brief    Spacing of the grid in ball radius, in mm
+        self.radius_step = radius_step
+        ## @brief    Spacing of the grid in ball speed, in mm/us
+        self.speed_step = speed_step
+        ## @brief    Number of grid points in radius
+        self.num_radius = num_radius
+        ## @brief    Number of grid points in speed
+        self.num_speed = num_speed
+        ## @brief    The gains negated and scaled from torque to duty cycle
+        #  @details  A flat array of 8 values per grid point, converted once like ClosedLoop.duty_gain
+        self.duty_table = array.array('f', (gain*(-DUTY_PER_TORQUE) for gain in table))
+        ## @brief    Sequence number of the state vector the cell was found for
+        self.state_seq = -1
+        ## @brief    Offset in duty_table of the corner of the cell with the lower radius and speed
+        self.base = 0
+        ## @brief    Bilinear weight of each corner of the cell
+        #  @details  Lower radius and speed, lower radius and higher speed, higher radius and
+        #            lower speed, and higher radius and speed
+        self.weights = array.array('f', [1, 0, 0, 0])
+
+    def locate (self):
+        ''' @brief   Finds the grid cell and weights for the current radius and speed
+            @details Does nothing if the state vector has not been written since the previous call.
+        '''
+        if not self.state_vect.changed_since(self.state_seq):
+            return
+        self.state_seq = self.state_vect.seq
+        s = self.state_vect_array
+        r = math.sqrt(s[0]*s[0] + s[4]*s[4])/self.radius_step
+        v = math.sqrt(s[2]*s[2] + s[6]*s[6])/self.speed_step
+        i = int(r)
+        if i > self.num_radius - 2:
+            i = self.num_radius - 2
+            r = i + 1
+        j = int(v)
+        if j > self.num_speed - 2:
+            j = self.num_speed - 2
+            v = j + 1
+        r -= i
+        v -= j
+        self.base = (i*self.num_speed + j)*8
+        w = self.weights
+        w[0] = (1 - r)*(1 - v)
+        w[1] = (1 - r)*v
+        w[2] = r*(1 - v)
+        w[3] = r*v
+
+    def duty_gain_into (self, axis, out):
+        ''' @brief      Interpolates the duty cycle gain vector of one axis
+            @param axis The axis, 0 for x and 1 for y
+            @param out  An array of four elements that receives the gains, negated and
+                        scaled from torque to duty cycle like ClosedLoop.duty_gain
+        '''
+        self.locate()
+        t = self.duty_table
+        w = self.weights
+        a = self.base + 4*axis
+        b = a + 8
+        c = a + 8*self.num_speed
+        d = c + 8
+        for k in range(4):
+            out[k] = w[0]*t[a + k] + w[1]*t[b + k] + w[2]*t[c + k] + w[3]*t[d + k]
+
+def load_gain_schedule (state_vect, filename='gain_table.txt'):
+    ''' @brief            Reads a gain schedule written by host/gain_table.py
+        @details          The first line holds the number of radius and speed grid points
+                          and the grid spacing in mm and mm/us. Every further line holds the
+                          four x axis gains and four y axis gains of one grid point.
+        @param state_vect A shares.StateVector of both axes
+        @param filename   The name of the table file
+        @return           The GainSchedule, or None if the file does not exist
+    '''
+    if filename not in os.listdir():
+        return None
+    with open(filename, 'r') as f:
+        header = f.readline().strip().split(',')
+        table = []
+        for line in f:
+            if line.strip():
+                table.extend(float(value) for value in line.strip().split(','))
+    num_radius = int(header[0])
+    num_speed = int(header[1])
+    if len(table) != 8*num_radius*num_speed:
+        raise ValueError('gain table has {:} gains, expected {:}'.format(len(table), 8*num_radius*num_speed))
+    return GainSchedule(state_vect, float(header[2]), float(header[3]), num_radius, num_speed, table)
+
+class ExplicitMPC:
+    ''' @brief   An explicit model predictive controller for one axis
+        @details The controller plans the duty cycles over a horizon of about half a
+                 second with the duty cycle limits as constraints, so it does not
+                 ask for more than the motor can give the way saturated state
+                 feedback does. The quadratic programs were solved offline by
+                 host/mpc_table.py. Their solution divides the state space into
+                 regions, one for each combination of planned duty cycles at the
+                 limits, and within a region the first duty cycle is an affine
+                 function of the state vector. Every run searches the regions in the
+                 order of how often they occurred offline and evaluates the
+                 inequalities of a region one at a time, moving on to the next
+                 region at the first one the state violates, then evaluates the law
+                 of the first region that contains the state. Near balance that is
+                 the first region, so most runs only evaluate its few inequalities.
+                 A state outside every region uses the region it violates least, and
+                 the duty cycle is always clamped to the saturation limits.
+    '''
+
+    def __init__ (self, sat_max, sat_min, L, state_vect, rows, row_start, laws, max_age=None):
+        ''' @brief            Constructs an explicit model predictive controller
+            @param sat_max    Maximum duty cycle in percent
+            @param sat_min    Minimum duty cycle in percent
+            @param L          Share that receives the duty cycle
+            @param state_vect The shares.StateVector of the axis, [position, angle, velocity, angular velocity]
+            @param rows       A flat array of the region inequalities rows*state <= bound, five
+                              values per inequality, the four coefficients followed by the bound,
+                              with the inequalities of each region together
+            @param row_start  The index of the first inequality of every region, followed by
+                              the total number of inequalities
+            @param laws       A flat array of the law of every region, five values per region,
+                              the four duty cycle gains followed by the duty cycle offset
+            @param max_age    Optional age, in microseconds, beyond which a state vector element is
+                              considered stale. The actuation level is held at zero while any element is stale.
+        '''
+        ## @brief    Maximum duty cycle in percent
+        self.sat_max = sat_max
+        ## @brief    Minimum duty cycle in percent
+        self.sat_min = sat_min
+        ## @brief    Share that receives the duty cycle
+        self.L = L
+        ## @brief    The state vector of the axis
+        self.state_vect = state_vect
+        ## @brief    View of the state vector share
+        self.state_vect_array = state_vect.view()
+        ## @brief    Coefficients and bounds of the region inequalities, five values per inequality
+        #  @details  Read once into a single array so that run() indexes it without creating
+        #            a residual vector or a view per region
+        self.rows = rows
+        ## @brief    Index of the first inequality of every region, followed by the number of inequalities
+        self.row_start = row_start
+        ## @brief    The number of regions
+        self.num_regions = len(row_start) - 1
+        ## @brief    Duty cycle gains and offset of the law of every region, five values per region
+        self.laws = laws
+        ## @brief    Age, in microseconds, beyond which a state vector element is stale
+        #  @details  None disables the check
+        self.max_age = max_age
+        ## @brief    Sequence number of the state vector used for the latest actuation value
+        self.state_seq = -1
+        ## @brief    Number of runs that found a stale state vector element
+        self.stale_count = 0
+        ## @brief    The region used by the latest run
+        self.region = 0
+        ## @brief    Number of runs that found the state outside every region
+        self.outside_count = 0
+
+    # emitter: native
+    def run (self):
+        ''' @brief Finds the region of the state vector and writes the duty cycle of its law to L
+            @details Checks first that no state vector element is older than max_age, so a
+                     sensor that stops writing is caught, then does nothing if the state
+                     vector has not been written since the previous run.
+        '''
+        if self.max_age is not None and self.state_vect.max_age() > self.max_age:
+            self.stale_count += 1
+            self.L.write(0)
+            return
+        if not self.state_vect.changed_since(self.state_seq):
+            return
+        self.state_seq = self.state_vect.seq
+        s = self.state_vect_array
+        s0 = s[0]
+        s1 = s[1]
+        s2 = s[2]
+        s3 = s[3]
+        t = self.rows
+        start = self.row_start
+        region = -1
+        for r in range(self.num_regions):
+            k = 5*start[r]
+            end = 5*start[r + 1]
+            while k < end:
+                if t[k]*s0 + t[k + 1]*s1 + t[k + 2]*s2 + t[k + 3]*s3 - t[k + 4] > MPC_TOLERANCE:
+                    break
+                k += 5
+            if k >= end:
+                region = r
+                break
+        if region < 0:
+            region = self.nearest()
+            self.outside_count += 1
+        self.region = region
+        g = self.laws
+        k = 5*region
+        duty = g[k]*s0 + g[k + 1]*s1 + g[k + 2]*s2 + g[k + 3]*s3 + g[k + 4]
+        if duty > self.sat_max:
+            duty = self.sat_max
+        elif duty < self.sat_min:
+            duty = self.sat_min
+        self.L.write(duty)
+
+    def nearest (self):
+        ''' @brief          Finds the region whose inequalities the state violates least
+            @details        Only runs for a state outside every region, so it evaluates
+                            every inequality again rather than keeping the residuals of run().
+            @return         The index of the region
+        '''
+        s = self.state_vect_array
+        t = self.rows
+        start = self.row_start
+        best = 0
+        best_violation = None
+        for r in range(self.num_regions):
+            violation = 0
+            for k in range(5*start[r], 5*start[r + 1], 5):
+                residual = t[k]*s[0] + t[k + 1]*s[1] + t[k + 2]*s[2] + t[k + 3]*s[3] - t[k + 4]
+                if residual > violation:
+                    violation = residual
+            if best_violation is None or violation < best_violation:
+                best = r
+                best_violation = violation
+        return best
+
+def load_explicit_mpc (sat_max, sat_min, L_1, L_2, state_vect_x, state_vect_y, filename='mpc_table.txt'):
+    ''' @brief              Reads the explicit MPC tables written by host/mpc_table.py
+        @details            The file holds the table of the x axis followed by the table of the
+                            y axis. A table starts with a line holding the number of regions and
+                            the number of inequalities, followed by a line with the index of the
+                            first inequality of every region and the total, one line of four
+                            coefficients and the bound per inequality, and one line of four gains
+                            and the offset per region.
+        @param sat_max      Maximum duty cycle in percent
+        @param sat_min      Minimum duty cycle in percent
+        @param L_1          Share that receives the duty cycle of motor 1
+        @param L_2          Share that receives the duty cycle of motor 2
+        @param state_vect_x The state vector of the x axis
+        @param state_vect_y The state vector of the y axis
+        @param filename     The name of the table file
+        @return             The controllers of motor 1 and motor 2, or None if the file does not exist
+    '''
+    if filename not in os.listdir():
+        return None
+    with open(filename, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    controllers = []
+    n = 0
+    for L, state_vect in ((L_1, state_vect_x), (L_2, state_vect_y)):
+        num_regions, num_rows = [int(value) for value in lines[n].split(',')]
+        row_start = array.array('H', [int(value) for value in lines[n + 1].split(',')])
+        rows = [[float(value) for value in line.split(',')] for line in lines[n + 2:n + 2 + num_rows]]
+        n += 2 + num_rows
+        laws = [[float(value) for value in line.split(',')] for line in lines[n:n + num_regions]]
+        n += num_regions
+        if (len(row_start) != num_regions + 1 or row_start[num_regions] != num_rows or len(rows) != num_rows
+                or len(laws) != num_regions or any(len(row) != 5 for row in rows + laws)):
+            raise ValueError('malformed explicit MPC table in ' + filename)
+        controllers.append(ExplicitMPC(sat_max, sat_min, L, state_vect,
+                                       array.array('f', (value for row in rows for value in row)), row_start,
+                                       array.array('f', (value for law in laws for value in law))))
+    return tuple(controllers)
+
+class MIMOLoop:
+    ''' @brief   A closed loop controller for both motors at once
+        @details Computes both motor duty cycles from the full state vector of
+                 both axes in a single matrix-vector product. The gain matrix has
+                 one row per motor, so gains from the state of one axis to the motor
+                 of the other axis, which separate ClosedLoop objects cannot
+                 represent, are simply the off-diagonal blocks.
+
+                 By default, when either duty cycle exceeds the saturation limits,
+                 both are scaled down by the same factor, so the direction of the
+                 combined effort is kept instead of being bent towards one axis.
+    '''
+
+    def __init__ (self, sat_max, sat_min, L_1, L_2, state_vect, gain, max_age=None, shared_saturation=True):
+        ''' @brief            Constructs a controller for both motors
+            @param sat_max    Maximum duty cycle of either motor
+            @param sat_min    Minimum duty cycle of either motor
+            @param L_1        Share that receives the duty cycle of motor 1
+            @param L_2        Share that receives the duty cycle of motor 2
+            @param state_vect A shares.StateVector of both axes, [x, theta_y, x_dot, theta_y_dot, y, theta_x, y_dot, theta_x_dot]
+            @param gain       The 2x8 gain matrix, one row per motor
+            @param max_age    Optional age, in microseconds, beyond which a state vector element is
+                              considered stale. Both duty cycles are held at zero while any element is stale.
+            @param shared_saturation True to scale both duty cycles by the same factor when either
+                              saturates, False to clamp each one on its own like ClosedLoop
+        '''
+        ## @brief    Maximum duty cycle of either motor
+        self.sat_max = sat_max
+        ## @brief    Minimum duty cycle of either motor
+        self.sat_min = sat_min
+        ## @brief    Share that receives the duty cycle of motor 1
+        self.L_1 = L_1
+        ## @brief    Share that receives the duty cycle of motor 2
+        self.L_2 = L_2
+        ## @brief    The state vector of both axes
+        self.state_vect = state_vect
+        ## @brief    View of the state vector share, updated in place by the sensor tasks
+        self.state_vect_array = state_vect.view()
+        ## @brief    Age, in microseconds, beyond which a state vector element is stale
+        #  @details  None disables the check
+        self.max_age = max_age
+        ## @brief    Sequence number of the state vector used for the latest duty cycles
+        self.state_seq = -1
+        ## @brief    Number of runs that found a stale state vector element
+        self.stale_count = 0
+        ## @brief    Whether both duty cycles are scaled together when either saturates
+        self.shared_saturation = shared_saturation
+        ## @brief    Number of runs in which a duty cycle reached the saturation limits
+        self.saturated_count = 0
+        self.set_gain(gain)
+
+    def set_gain (self, gain):
+        ''' @brief      Replaces the gain matrix
+            @param gain The new 2x8 gain matrix
+        '''
+        ## @brief    The 2x8 gain matrix
+        self.gain = gain
+        ## @brief    The gain matrix negated and scaled from torque to duty cycle
+        self.duty_gain = gain*(-DUTY_PER_TORQUE)
+
+    def run (self):
+        ''' @brief   Computes both duty cycles from the state vector
+            @details Checks first that no state vector element is older than max_age, so a
+                     sensor that stops writing is caught, then does nothing if the state
+                     vector has not been written since the previous run.
+        '''
+        if self.max_age is not None and self.state_vect.max_age() > self.max_age:
+            self.stale_count += 1
+            self.L_1.write(0)
+            self.L_2.write(0)
+            return
+        if not self.state_vect.changed_since(self.state_seq):
+            return
+        self.state_seq = self.state_vect.seq
+        duty = np.dot(self.duty_gain, self.state_vect_array)
+        duty_1 = duty[0]
+        duty_2 = duty[1]
+        scale_1 = self._limit(duty_1)
+        scale_2 = self._limit(duty_2)
+        if scale_1 < 1 or scale_2 < 1:
+            self.saturated_count += 1
+            if not self.shared_saturation:
+                duty_1 *= scale_1
+                duty_2 *= scale_2
+            elif scale_1 < scale_2:
+                duty_1 *= scale_1
+                duty_2 *= scale_1
+            else:
+                duty_1 *= scale_2
+                duty_2 *= scale_2
+        self.L_1.write(duty_1)
+        self.L_2.write(duty_2)
+
+    def _limit (self, duty):
+        ''' @brief      Finds the factor that brings a duty cycle within the saturation limits
+            @param duty The duty cycle
+            @return     The factor, 1 if the duty cycle is within the limits
+        '''
+        if duty > self.sat_max:
+            return self.sat_max/duty
+        if duty < self.sat_min:
+            return self.sat_min/duty
+        return 1
+
+    def axis (self, index):
+        ''' @brief       Returns an object that stands in for the ClosedLoop of one motor
+            @details     Lets the motor and control tasks use this controller unchanged.
+                         Running both axes in the same tick computes the duty cycles once.
+            @param index 0 for motor 1, 1 for motor 2
+            @return      An object with a run() method and the duty cycle share L
+        '''
+        return _MIMOAxis(self, self.L_1 if index == 0 else self.L_2)
+
+class _MIMOAxis:
+    ''' @brief   One motor of a MIMOLoop, with the interface of ClosedLoop
+    '''
+
+    def __init__ (self, loop, L):
+        ## @brief    The controller for both motors
+        self.loop = loop
+        ## @brief    Share that receives the duty cycle of this motor
+        self.L = L
+
+    def run (self):
+        ''' @brief Runs the controller for both motors if the state vector has changed
+        '''
+        self.loop.run()
@@ -0,0 +1,85 @@
+'''@file        async_demo.py
+   @brief       Runs the uasyncio task runtime on CPython asyncio.
+   @details     Builds the term project tasks on the host stand-ins for pyb and
+                utime, types a sequence of commands into the user interface, and
+                runs async_runtime.run() for a few seconds. Run from the
+                BallBalancingPlatform directory with
+                python host/async_demo.py [seconds] [keys]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import pyb
+import shares
+import DRV8847
+import BNO055
+import touch_pan
+import closedloop
+import task_userinterface
+import task_panel
+import task_IMU
+import task_motor
+import async_runtime
+from ulab import numpy as np
+
+async def keyboard(ser, keys, interval):
+    ''' @brief          Types one command character per interval into the serial port
+        @param ser      The host USB_VCP stand-in used by Task_User
+        @param keys     The command characters to type
+        @param interval Seconds between characters
+    '''
+    for key in keys:
+        await asyncio.sleep(interval)
+        ser.feed(key)
+
+async def demo(seconds, keys):
+    ''' @brief          Builds the tasks and runs them for the given time
+        @param seconds  How long to run the tasks
+        @param keys     The command characters to type
+    '''
+    L_1 = shares.StampedShare(0)
+    L_2 = shares.StampedShare(0)
+    balance_flag = shares.Share(0)
+    calib_pan_flag = shares.Share(0)
+    calib_IMU_flag = shares.Share(0)
+    disable_flag = shares.Share(0)
+    state_vect_x = shares.StateVector(4)
+    state_vect_y = shares.StateVector(4)
+
+    # Ball resting off-center on the panel
+    pyb.ADC.values['A0'] = 2300
+    pyb.ADC.values['A7'] = 1800
+
+    motor_drv = DRV8847.DRV8847(pyb.Pin.cpu.A15, pyb.Pin.cpu.B2, 3)
+    motor_1 = motor_drv.motor(pyb.Pin.cpu.B4, pyb.Pin.cpu.B5, 1, 2)
+    motor_2 = motor_drv.motor(pyb.Pin.cpu.B0, pyb.Pin.cpu.B1, 3, 4)
+    closedloop_1 = closedloop.ClosedLoop(80, -80, L_1, state_vect_x, np.array([-0.026, -0.026, -0.005, 0.006]))
+    closedloop_2 = closedloop.ClosedLoop(80, -80, L_2, state_vect_y, np.array([0.0099, 0.027, -0.001, -0.005]))
+    panel_obj = touch_pan.Touch_Pan(pyb.Pin.cpu.A7, pyb.Pin.cpu.A1, pyb.Pin.cpu.A6, pyb.Pin.cpu.A0)
+    IMU_obj = BNO055.BNO055(pyb.I2C(1, pyb.I2C.MASTER), calib_IMU_flag)
+
+    task1 = task_userinterface.Task_User(50000, balance_flag, calib_pan_flag, calib_IMU_flag, disable_flag, state_vect_x, state_vect_y, L_1, L_2)
+    task2 = task_panel.Task_Panel(500, panel_obj, state_vect_x, state_vect_y, calib_pan_flag)
+    task3 = task_IMU.Task_IMU(10000, IMU_obj, state_vect_x, calib_IMU_flag, state_vect_y)
+    task4 = task_motor.Task_Motor(2000, motor_1, motor_drv, L_1, balance_flag, state_vect_x, state_vect_y, disable_flag, closedloop_1)
+    task5 = task_motor.Task_Motor(2000, motor_2, None, L_2, balance_flag, state_vect_x, state_vect_y, disable_flag, closedloop_2)
+
+    runtime = asyncio.ensure_future(async_runtime.run(task1, task2, [(task3, 10000), (task4, 2000), (task5, 2000)]))
+    asyncio.ensure_future(keyboard(task1.ser, keys, min(0.5, seconds / (len(keys) + 1))))
+    await asyncio.sleep(seconds)
+    runtime.cancel()
+
+    print('panel runs {:}'.format(task2.runs))
+    print('x {:.1f}, y {:.1f}'.format(state_vect_x.read(0), state_vect_y.read(0)))
+    print('duty 1 {:.2f} %, duty 2 {:.2f} %'.format(L_1.read(), L_2.read()))
+
+if __name__ == '__main__':
+    asyncio.run(demo(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0,
+                     sys.argv[2] if len(sys.argv) > 2 else 'bx'))
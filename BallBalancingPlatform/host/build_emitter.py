@@ -0,0 +1,140 @@
+'''@file        build_emitter.py
+   @brief       Writes the firmware files with the per-tick hot paths compiled to machine code.
+   @details     MicroPython only recognizes the @micropython.native and
+                @micropython.viper decorators when they are written in the source,
+                so the code emitter cannot be chosen by a flag at run time. Instead
+                the hot functions of the firmware are tagged with a comment on the
+                line above the def, either
+
+                    # emitter: native
+
+                for functions that may be compiled with the native emitter, or
+
+                    # emitter: viper
+
+                for functions written so that the viper emitter keeps their
+                integers as machine integers. This script copies every .py file of
+                the source directory to the output directory and adds the decorator
+                the selected emitter gives each tagged function:
+
+                    bytecode    no decorators, the files are copied unchanged
+                    native      @micropython.native on every tagged function
+                    viper       @micropython.viper on viper tags, @micropython.native on the rest
+
+                Copy the output directory to the Nucleo in place of the source
+                files. Run from the BallBalancingPlatform directory with
+                python host/build_emitter.py --emitter native [--source .] [--output build]
+
+                Tags are only recognized in code, not inside triple-quoted strings
+                such as the docstring above. apply() is also used by
+                host/emitter_bench.py and only uses string operations, so that it
+                runs on the MicroPython unix port.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+## @brief     The emitters that can be selected, from slowest to fastest
+EMITTERS = ('bytecode', 'native', 'viper')
+
+## @brief     The comment that tags a hot function, followed by native or viper
+TAG = '# emitter: '
+
+def _quote_after(line, quote):
+    ''' @brief          Follows the triple-quoted strings of a line
+        @param line     A line of the source
+        @param quote    The triple quote the line starts inside of, or None in code
+        @return         The triple quote the line ends inside of, or None in code
+    '''
+    start = 0
+    while True:
+        if quote is None:
+            single = line.find("'''", start)
+            double = line.find('"""', start)
+            if single < 0 and double < 0:
+                return None
+            if double < 0 or 0 <= single < double:
+                pos = single
+            else:
+                pos = double
+            quote = line[pos:pos + 3]
+        else:
+            pos = line.find(quote, start)
+            if pos < 0:
+                return quote
+            quote = None
+        start = pos + 3
+
+def apply(source, emitter):
+    ''' @brief          Adds the decorators of an emitter to the tagged functions of a module
+        @param source   The source text of the module
+        @param emitter  One of EMITTERS
+        @return         The new source text and the number of decorated functions
+    '''
+    if emitter not in EMITTERS:
+        raise ValueError('unknown emitter ' + emitter)
+    lines = source.split('\n')
+    out = []
+    count = 0
+    quote = None
+    for n in range(len(lines)):
+        line = lines[n]
+        out.append(line)
+        in_string = quote is not None
+        quote = _quote_after(line, quote)
+        text = line.strip()
+        if in_string or not text.startswith(TAG) or emitter == 'bytecode':
+            continue
+        kind = text[len(TAG):].strip()
+        if kind not in ('native', 'viper'):
+            raise ValueError('line {:}: unknown emitter tag {:}'.format(n + 1, kind))
+        if n + 1 == len(lines) or not lines[n + 1].strip().startswith('def '):
+            raise ValueError('line {:}: an emitter tag must be followed by a def'.format(n + 1))
+        indent = line[:len(line) - len(line.lstrip())]
+        if kind == 'viper' and emitter == 'viper':
+            out.append(indent + '@micropython.viper')
+        else:
+            out.append(indent + '@micropython.native')
+        count += 1
+    if count and 'import micropython' not in source:
+        raise ValueError('a module with emitter tags must import micropython')
+    return '\n'.join(out), count
+
+def main(argv):
+    ''' @brief      Writes the firmware files for the selected emitter
+        @param argv The command line arguments
+        @return     The exit status
+    '''
+    import argparse
+    import os
+    parser = argparse.ArgumentParser(description='Writes the firmware files with the hot paths compiled to machine code.')
+    parser.add_argument('--emitter', choices=EMITTERS, default='native', help='the code emitter of the tagged functions')
+    parser.add_argument('--source', default='.', help='the directory of the firmware files')
+    parser.add_argument('--output', default='build', help='the directory to write')
+    args = parser.parse_args(argv[1:])
+
+    if os.path.abspath(args.source) == os.path.abspath(args.output):
+        parser.error('the output directory must differ from the source directory')
+    os.makedirs(args.output, exist_ok=True)
+    total = 0
+    for name in sorted(os.listdir(args.source)):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(args.source, name)) as f:
+            source = f.read()
+        try:
+            source, count = apply(source, args.emitter)
+        except ValueError as error:
+            print('{:}: {:}'.format(name, error))
+            return 1
+        with open(os.path.join(args.output, name), 'w') as f:
+            f.write(source)
+        if count:
+            print('{:<20}{:} functions'.format(name, count))
+        total += count
+    print('Wrote {:} with {:} {:} functions'.format(args.output, total, args.emitter))
+    return 0
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main(sys.argv))
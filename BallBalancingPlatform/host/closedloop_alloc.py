@@ -0,0 +1,104 @@
+'''@file        closedloop_alloc.py
+   @brief       Measures the heap memory allocated by every ClosedLoop.run() call.
+   @details     Runs the controller on a state vector that changes before every
+                call and reports the bytes allocated per call, next to the
+                previous implementation, which built a new array from four Share
+                reads, negated the gain vector, and wrote and re-read L up to three
+                times. On MicroPython the gc.mem_alloc() delta is measured with the
+                garbage collector disabled. On CPython, where gc.mem_alloc() does
+                not exist, tracemalloc is used instead. Copy this file next to the
+                project files and run it on the Nucleo, or run it on the host from
+                the BallBalancingPlatform directory with
+                python host/closedloop_alloc.py [calls]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import sys
+import gc
+
+try:
+    import os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+except (ImportError, AttributeError):
+    # MicroPython has no os.path, and the project files are already on the path
+    pass
+
+import shares
+import closedloop
+from ulab import numpy as np
+
+def legacy_run(loop, state_list):
+    ''' @brief              The ClosedLoop.run() hot path before it was made allocation-free
+        @param loop         The ClosedLoop object, for its gain, limits, and L
+        @param state_list   The state vector as a list of four Share objects
+    '''
+    state_vect_array = np.array([state_list[0].read(), state_list[1].read(), state_list[2].read(), state_list[3].read()])
+    torque = np.dot(-loop.gain, state_vect_array)
+    loop.L.write((13.345)*torque*100/4)
+    if loop.L.read() > loop.sat_max:
+        loop.L.write(loop.sat_max)
+    if loop.L.read() < loop.sat_min:
+        loop.L.write(loop.sat_min)
+
+def bytes_per_call(function, calls):
+    ''' @brief          Measures the heap memory allocated by calls to a function
+        @param function The function to call, taking the call number
+        @param calls    The number of calls
+        @return         The average number of bytes allocated per call
+    '''
+    function(0)
+    if hasattr(gc, 'mem_alloc'):
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        for n in range(calls):
+            function(n)
+        allocated = gc.mem_alloc() - before
+        gc.enable()
+    else:
+        allocated = _traced_bytes(function, calls)
+    return allocated/calls
+
+def _traced_bytes(function, calls):
+    ''' @brief  Totals the peak memory allocated by each call on CPython
+        @details Objects freed again before the call returns are counted too,
+                 like they are by gc.mem_alloc() with the garbage collector disabled.
+    '''
+    import tracemalloc
+    total = 0
+    tracemalloc.start()
+    for n in range(calls):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        function(n)
+        total += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return total
+
+def main(argv):
+    ''' @brief      Prints the bytes allocated per call for both implementations
+        @param argv The command line arguments
+    '''
+    calls = int(argv[1]) if len(argv) > 1 else 1000
+    gain = np.array([-0.026, -0.026, -0.005, 0.006])
+
+    state_vect = shares.StateVector(4)
+    loop = closedloop.ClosedLoop(80, -80, shares.StampedShare(0), state_vect, gain)
+    def new_path(n):
+        state_vect.write_field(0, n % 100)
+        loop.run()
+
+    state_list = [shares.Share(0), shares.Share(0), shares.Share(0), shares.Share(0)]
+    legacy_loop = closedloop.ClosedLoop(80, -80, shares.Share(0), state_vect, gain)
+    def legacy_path(n):
+        state_list[0].write(n % 100)
+        legacy_run(legacy_loop, state_list)
+
+    print('bytes allocated per call over {:} calls'.format(calls))
+    print('    previous ClosedLoop.run: {:.1f}'.format(bytes_per_call(legacy_path, calls)))
+    print('    ClosedLoop.run:          {:.1f}'.format(bytes_per_call(new_path, calls)))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,304 @@
+'''@file        emitter_bench.py
+   @brief       Times the per-tick hot paths compiled as bytecode, native, and viper code.
+   @details     Loads every firmware module with hot functions three times, once
+                for each emitter of build_emitter.py, by applying the same source
+                transformation as the build and compiling the result with exec().
+                Each hot function is first called on the same inputs in every form
+                and its outputs must be identical, then it is timed over many calls.
+                The table shows the time per call with the cost of the benchmark
+                loop subtracted, and the speed-up over bytecode. Rows of modules
+                that cannot be imported, for example without ulab, are skipped.
+                Exits with status 1 if a form gives a different result.
+
+                Meant for the MicroPython unix port, where the host stand-ins of
+                pyb run without the virtual clock. Build the port with ulab as a
+                user C module to include the shares, closedloop, and touch_pan rows.
+                Run from the BallBalancingPlatform directory with
+                micropython host/emitter_bench.py [calls]
+                On CPython the decorators have no effect and every column is
+                bytecode, which only checks that the benchmark itself runs.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import sys
+
+## @brief     Directory of this script
+HOST = sys.argv[0].rsplit('/', 1)[0] if '/' in sys.argv[0] else '.'
+## @brief     Directory of the firmware files
+FIRMWARE = HOST + '/..'
+## @brief     Directory of the Lab 4 files, which hold the encoder driver
+LAB_4 = HOST + '/../../Lab 4'
+
+if HOST not in sys.path:
+    sys.path.insert(0, HOST)
+sys.path.append(FIRMWARE)
+
+import gc
+import array
+import utime
+import pyb
+import build_emitter
+
+## @brief     The BNO055 registers read by the benchmark: euler angles at 0x1A and gyro at 0x14
+REGISTERS = {0x1A: (16*12, -16*3, 16*5), 0x14: (450, -900, 1800)}
+
+class Output:
+    ''' @brief  Receives the duty cycle of a controller, like a share
+    '''
+    def __init__(self):
+        self.value = 0
+
+    def write(self, value):
+        self.value = value
+
+    def read(self):
+        return self.value
+
+_modules = {}
+
+def load(filename, emitter):
+    ''' @brief          Compiles a firmware module with the decorators of an emitter
+        @param filename The path of the module
+        @param emitter  One of build_emitter.EMITTERS
+        @return         The namespace of the module
+    '''
+    key = (filename, emitter)
+    if key not in _modules:
+        with open(filename) as f:
+            source = f.read()
+        source = build_emitter.apply(source, emitter)[0]
+        namespace = {'__name__': filename.rsplit('/', 1)[-1][:-3]}
+        exec(source, namespace)
+        _modules[key] = namespace
+    return _modules[key]
+
+def set_sensors():
+    ''' @brief  Sets the panel ADC counts and the BNO055 registers read by the benchmarks
+    '''
+    pyb.ADC.values['A0'] = 2500
+    pyb.ADC.values['A7'] = 1800
+    regs = pyb.I2C.buses.setdefault(1, {})
+    for base in REGISTERS:
+        for n, value in enumerate(REGISTERS[base]):
+            value &= 0xFFFF
+            regs[(0x28, base + 2*n)] = value & 0xFF
+            regs[(0x28, base + 2*n + 1)] = value >> 8
+
+def share_read(ns):
+    share = ns['Share'](5)
+    def step():
+        share.read()
+    return step, lambda: share.read()
+
+def share_write(ns):
+    share = ns['Share'](0)
+    def step():
+        share.write(7)
+    def check():
+        step()
+        return share.read()
+    return step, check
+
+def stamped_write(ns):
+    share = ns['StampedShare'](0)
+    def step():
+        share.write(7)
+    def check():
+        step()
+        return (share.read(), share.seq)
+    return step, check
+
+def stamped_changed(ns):
+    share = ns['StampedShare'](0)
+    def step():
+        share.changed_since(0)
+    return step, lambda: (share.changed_since(0), share.changed_since(share.seq))
+
+def closedloop_run(ns):
+    from ulab import numpy as np
+    import shares
+    state_vect = shares.StateVector(4)
+    for n, value in enumerate((12.5, -1.5, 0.0002, 0.3)):
+        state_vect.write_field(n, value)
+    loop = ns['ClosedLoop'](80, -80, Output(), state_vect, np.array([-0.026, -0.026, -0.005, 0.006]))
+    def step():
+        loop.state_seq = -1
+        loop.run()
+    def check():
+        step()
+        return loop.L.read()
+    return step, check
+
+def fixedloop_run(ns):
+    loop = ns['FixedLoop'](80, -80, Output(), [-0.026, -0.026, -0.005, 0.006], 2000)
+    for n, value in enumerate((3200, -24, 13, 270)):
+        loop.state[n] = value
+    def step():
+        loop.run()
+    def check():
+        step()
+        return loop.L.read()
+    return step, check
+
+def make_panel(ns, fast=False, contact_first=False):
+    panel = ns['Touch_Pan'](pyb.Pin.cpu.A7, pyb.Pin.cpu.A1, pyb.Pin.cpu.A6, pyb.Pin.cpu.A0,
+                            fast=fast, contact_first=contact_first)
+    for n, value in enumerate((0.0489, 0.0004, -0.0003, 0.0303, -99.7, -61.2)):
+        panel.beta[n] = value
+    panel.calibrate_flag = 1
+    return panel
+
+def get_coords(ns):
+    panel = make_panel(ns)
+    def step():
+        panel.get_coords()
+    return step, lambda: (panel.get_coords(), panel.z_ADC_flag)
+
+def scan_counts(ns):
+    panel = make_panel(ns)
+    counts = array.array('i', 3*[0])
+    def step():
+        panel.scan_counts_into(counts)
+    def check():
+        step()
+        return (list(counts), panel.z_ADC_flag)
+    return step, check
+
+def panel_scan(name, contact_first):
+    ''' @brief          Returns the benchmark of a scan method of a fast touch panel
+        @param name     The name of the method
+    '''
+    def bench(ns):
+        panel = make_panel(ns, True, contact_first)
+        method = getattr(panel, name)
+        counts = array.array('i', 3*[0])
+        def step():
+            method(counts)
+        def check():
+            step()
+            return (list(counts), panel.z_ADC_flag)
+        return step, check
+    return bench
+
+def burst_read(ns):
+    burst = ns['BurstADC'](pyb.ADC('A0'), 9, ns['TRIMMED_MEAN'])
+    def step():
+        burst.read()
+    return step, lambda: (burst.read(), list(burst.buf))
+
+def imu_method(name, typecode):
+    ''' @brief          Returns the benchmark of a BNO055 method
+        @param name     The name of the method
+        @param typecode The typecode of the array it reads into, or None if it returns a tuple
+    '''
+    def bench(ns):
+        method = getattr(ns['BNO055'](pyb.I2C(1, pyb.I2C.MASTER), 0), name)
+        if typecode is None:
+            def step():
+                method()
+            return step, method
+        values = array.array(typecode, 3*[0])
+        def step():
+            method(values)
+        def check():
+            step()
+            return list(values)
+        return step, check
+    return bench
+
+def set_duty(ns):
+    motor = ns['Motor'](pyb.Pin.cpu.B4, pyb.Pin.cpu.B5, 1, 2, pyb.Timer(3, freq=20000))
+    def step():
+        motor.set_duty(-37)
+    def check():
+        results = []
+        for duty in (37, -37, 0):
+            motor.set_duty(duty)
+            results.append((motor.channel_A.pulse_width_percent(), motor.channel_B.pulse_width_percent()))
+        return results
+    return step, check
+
+def encoder_update(ns):
+    encoder = ns['Encoder'](pyb.Pin.cpu.B6, pyb.Pin.cpu.B7, 4)
+    def step():
+        encoder.update()
+    def check():
+        results = []
+        for count in (1200, 65000, 100, 100):
+            encoder.tim.counter(count)
+            encoder.update()
+            results.append((encoder.get_position(), encoder.get_delta()))
+        return results
+    return step, check
+
+## @brief     The benchmarks: name, module file, and a function that builds the
+#             step to time and the check whose results must match in every form
+BENCHMARKS = (('Share.read', FIRMWARE + '/shares.py', share_read),
+              ('Share.write', FIRMWARE + '/shares.py', share_write),
+              ('StampedShare.write', FIRMWARE + '/shares.py', stamped_write),
+              ('StampedShare.changed_since', FIRMWARE + '/shares.py', stamped_changed),
+              ('ClosedLoop.run', FIRMWARE + '/closedloop.py', closedloop_run),
+              ('FixedLoop.run', FIRMWARE + '/closedloop.py', fixedloop_run),
+              ('Touch_Pan.get_coords', FIRMWARE + '/touch_pan.py', get_coords),
+              ('Touch_Pan.scan_counts_into', FIRMWARE + '/touch_pan.py', scan_counts),
+              ('Touch_Pan.scan_fast_into', FIRMWARE + '/touch_pan.py', panel_scan('scan_fast_into', False)),
+              ('BurstADC.read', FIRMWARE + '/touch_pan.py', burst_read),
+              ('Touch_Pan.scan_contact_first_into', FIRMWARE + '/touch_pan.py', panel_scan('scan_contact_first_into', True)),
+              ('BNO055.euler_angle', FIRMWARE + '/BNO055.py', imu_method('euler_angle', None)),
+              ('BNO055.angular_vel', FIRMWARE + '/BNO055.py', imu_method('angular_vel', None)),
+              ('BNO055.euler_angle_into', FIRMWARE + '/BNO055.py', imu_method('euler_angle_into', 'f')),
+              ('BNO055.angular_vel_into', FIRMWARE + '/BNO055.py', imu_method('angular_vel_into', 'f')),
+              ('BNO055.euler_angle_raw_into', FIRMWARE + '/BNO055.py', imu_method('euler_angle_raw_into', 'i')),
+              ('BNO055.angular_vel_raw_into', FIRMWARE + '/BNO055.py', imu_method('angular_vel_raw_into', 'i')),
+              ('Motor.set_duty', FIRMWARE + '/DRV8847.py', set_duty),
+              ('Encoder.update', LAB_4 + '/encoder.py', encoder_update))
+
+def time_calls(step, calls):
+    ''' @brief      Times a step
+        @return     The time per call in microseconds
+    '''
+    gc.collect()
+    start = utime.ticks_us()
+    for n in range(calls):
+        step()
+    return utime.ticks_diff(utime.ticks_us(), start)/calls
+
+def main(argv):
+    ''' @brief      Runs every benchmark in every form
+        @param argv The command line arguments
+        @return     The exit status, 1 if a form gave a different result
+    '''
+    calls = int(argv[1]) if len(argv) > 1 else 2000
+    set_sensors()
+    def nothing():
+        pass
+    overhead = time_calls(nothing, calls)
+    print('{:} on {:}, {:} calls per form, {:.2f} us of loop overhead subtracted'.format(
+          'Time per call in us', sys.implementation.name, calls, overhead))
+    print('{:<36}{:>10}{:>18}{:>18}'.format('', *build_emitter.EMITTERS))
+    status = 0
+    for name, filename, bench in BENCHMARKS:
+        times = []
+        results = []
+        try:
+            for emitter in build_emitter.EMITTERS:
+                step, check = bench(load(filename, emitter))
+                results.append(check())
+                times.append(max(time_calls(step, calls) - overhead, 0))
+        except ImportError as error:
+            print('{:<36}skipped: {:}'.format(name, error))
+            continue
+        row = '{:<36}{:>10.2f}'.format(name, times[0])
+        for t in times[1:]:
+            row += '{:>10.2f}'.format(t) + ('{:>7.2f}x'.format(times[0]/t) if t > 0 else '{:>8}'.format('-'))
+        print(row)
+        for emitter, result in zip(build_emitter.EMITTERS[1:], results[1:]):
+            if result != results[0]:
+                print('    MISMATCH: {:} gives {:}, bytecode gives {:}'.format(emitter, result, results[0]))
+                status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,205 @@
+'''@file        fixedpoint_check.py
+   @brief       Checks the fixed-point control path against the float path and compares their speed.
+   @details     Builds the float Task_Control with two ClosedLoop controllers and
+                Task_ControlFixed with two FixedLoop controllers from the same gains,
+                on the same touch panel calibration and the same host stand-ins for
+                the panel ADC and the BNO055 registers. Both tasks then tick through
+                the same random trajectory of the ball and platform, including ticks
+                without contact, and the duty cycles they write to the motors are
+                compared. Some ticks come up to two periods late, which the
+                velocities of both paths must account for. The duty cycles are
+                compared except on the ticks where the contact changed, where the
+                float path differences the position against zero and the fixed-point
+                path holds the velocity at zero. The fixed-point duty cycle must
+                stay within the error bound of the integer arithmetic: half a
+                percent of output rounding, the 1/256 mm position resolution and its
+                effect on the velocity, and the rounding of the gains and
+                calibration coefficients. Both the gains of main.py and LQR gains
+                from lqr_gains.py are checked. Finally both ticks are timed on the
+                host. Exits with status 1 if a duty cycle is
+                outside the bound. Run from the BallBalancingPlatform directory with
+                python host/fixedpoint_check.py [ticks] [seed]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import array
+import random
+import time
+import numpy as np
+import utime
+import pyb
+import shares
+import closedloop
+import task_control
+import touch_pan
+import BNO055
+import lqr_gains
+
+## @brief     Control period in microseconds, period_motor in main.py
+PERIOD = 2000
+
+## @brief     A touch panel calibration like the one written to RT_cal_coeffs.txt
+#  @details   Kxx, Kxy, Kyx, Kyy, Xc, Yc, about 176 mm over 3600 counts and 100 mm over 3300 counts
+BETA = (0.0489, 0.0004, -0.0003, 0.0303, -99.7, -61.2)
+
+## @brief     The gain vectors of main.py
+MAIN_GAINS = ((-0.026, -0.026, -0.005, 0.006), (0.0099, 0.027, -0.001, -0.005))
+
+class Motor:
+    ''' @brief  Records the duty cycles written to a motor
+    '''
+    def __init__(self):
+        self.duty = 0
+
+    def set_duty(self, duty):
+        self.duty = duty
+
+class Sensors:
+    ''' @brief  Sets what the host stand-ins of the panel and the BNO055 read
+    '''
+    def __init__(self):
+        self.regs = pyb.I2C.buses.setdefault(1, {})
+
+    def set(self, x_count, y_count, angles, rates):
+        ''' @brief          Sets the panel counts and the euler angle and gyro registers
+            @param x_count  The ADC count of the x scan
+            @param y_count  The ADC count of the y scan, also read by the z scan
+            @param angles   Heading, roll, and pitch in units of 1/16 degree
+            @param rates    The x, y, and z angular velocities in units of 1/900 rad/s
+        '''
+        pyb.ADC.values['A0'] = x_count
+        pyb.ADC.values['A7'] = y_count
+        for base, values in ((0x1A, angles), (0x14, rates)):
+            for n, value in enumerate(values):
+                value &= 0xFFFF
+                self.regs[(0x28, base + 2*n)] = value & 0xFF
+                self.regs[(0x28, base + 2*n + 1)] = value >> 8
+
+def make_tasks(gain_1, gain_2):
+    ''' @brief      Builds the float and the fixed-point fused control tasks
+        @return     Both tasks and the motors of each, ((float task, motors), (fixed task, motors))
+    '''
+    tasks = []
+    for fixed in (False, True):
+        # Without the settle delay, whose sleeps would lengthen the virtual time between
+        # the ticks of the float task, which measures its velocity over that time
+        panel = touch_pan.Touch_Pan(pyb.Pin.cpu.A7, pyb.Pin.cpu.A1, pyb.Pin.cpu.A6, pyb.Pin.cpu.A0, fast=fixed,
+                                    settle_us=0)
+        panel.beta = array.array('f', BETA)
+        panel.calibrate_flag = 1
+        IMU = BNO055.BNO055(pyb.I2C(1, pyb.I2C.MASTER), shares.Share(0))
+        state_vect = shares.StateVector(8)
+        state_vect_x = state_vect.sub(0, 4)
+        state_vect_y = state_vect.sub(4, 4)
+        L_1 = shares.StampedShare(0)
+        L_2 = shares.StampedShare(0)
+        motors = (Motor(), Motor())
+        if fixed:
+            loops = (closedloop.FixedLoop(80, -80, L_1, np.array(gain_1), PERIOD),
+                     closedloop.FixedLoop(80, -80, L_2, np.array(gain_2), PERIOD))
+            cls = task_control.Task_ControlFixed
+        else:
+            loops = (closedloop.ClosedLoop(80, -80, L_1, state_vect_x, np.array(gain_1)),
+                     closedloop.ClosedLoop(80, -80, L_2, state_vect_y, np.array(gain_2)))
+            cls = task_control.Task_Control
+        task = cls(PERIOD, panel, IMU, state_vect_x, state_vect_y, loops[0], loops[1],
+                   motors[0], motors[1], shares.Share(1), shares.Share(0), shares.Share(0), shares.Share(0))
+        tasks.append((task, motors))
+    return tasks
+
+def error_bound(gain, state):
+    ''' @brief          The largest duty cycle difference the integer arithmetic can cause
+        @param gain     The float gain vector of the axis
+        @param state    The integer state vector of the FixedLoop of the axis
+    '''
+    duty_gain = [abs(closedloop.DUTY_PER_TORQUE*g) for g in gain]
+    scale = closedloop.POSITION_SCALE
+    # Calibration coefficients are rounded to 1/2**CAL_SHIFT of a position unit per count
+    cal = (4096 + 4096 + 1)*0.5/(1 << touch_pan.CAL_SHIFT)/scale
+    position = (1 + cal)/scale
+    bound = 0.5 + duty_gain[0]*position + duty_gain[2]*2*position/PERIOD
+    bound += sum(0.5*abs(s) for s in state)/(1 << closedloop.GAIN_SHIFT)
+    return bound + 1e-4
+
+def check(name, gain_1, gain_2, ticks, rng):
+    ''' @brief      Ticks both tasks through a random trajectory and compares the duty cycles
+        @return     The number of duty cycles outside the error bound
+    '''
+    (float_task, float_motors), (fixed_task, fixed_motors) = make_tasks(gain_1, gain_2)
+    sensors = Sensors()
+    x, y = 2048.0, 2048.0
+    angles = [0, 0, 0]
+    rates = [0, 0, 0]
+    worst = 0
+    worst_ratio = 0
+    failures = 0
+    skipped = 0
+    previous = True
+    for n in range(ticks):
+        x = min(3950, max(150, x + rng.gauss(0, 15)))
+        y = min(3750, max(450, y + rng.gauss(0, 15)))
+        angles = [0] + [min(320, max(-320, a + rng.randint(-3, 3))) for a in angles[1:]]
+        rates = [min(9000, max(-9000, r + rng.randint(-200, 200))) for r in rates]
+        contact = rng.random() >= 0.05
+        sensors.set(int(x), int(y) if contact else rng.randint(0, 300), angles, rates)
+        float_task.tick()
+        fixed_task.tick()
+        # Some ticks come late, as after a SKIP or RESYNC of the scheduler
+        utime.spend_us(PERIOD if rng.random() >= 0.05 else rng.randint(PERIOD + 1, 3*PERIOD))
+        changed = contact != previous
+        previous = contact
+        if changed:
+            skipped += 1
+            continue
+        for axis, gain in ((0, gain_1), (1, gain_2)):
+            error = abs(float_motors[axis].duty - fixed_motors[axis].duty)
+            bound = error_bound(gain, (fixed_task.closedloop_1, fixed_task.closedloop_2)[axis].state)
+            worst = max(worst, error)
+            worst_ratio = max(worst_ratio, error/bound)
+            if error > bound:
+                failures += 1
+    print('{:<10}{:} ticks, {:} at a contact change not compared, largest duty cycle difference {:.3f}%, {:.0%} of the bound, {:} outside'.format(
+          name, ticks, skipped, worst, worst_ratio, failures))
+    return failures
+
+def time_ticks(task, calls):
+    ''' @brief      Times the tick of a task on the host
+        @return     The time per tick in microseconds
+    '''
+    start = time.perf_counter()
+    for n in range(calls):
+        task.tick()
+    return (time.perf_counter() - start)/calls*1e6
+
+def main(argv):
+    ''' @brief      Runs the equivalence checks and the timing
+        @param argv The command line arguments
+        @return     The exit status, 1 if a duty cycle was outside the error bound
+    '''
+    ticks = int(argv[1]) if len(argv) > 1 else 5000
+    seed = int(argv[2]) if len(argv) > 2 else 305
+    utime.use_virtual_clock()
+
+    K = lqr_gains.lqr(*lqr_gains.discretize(*lqr_gains.linearize(), PERIOD/1000000),
+                      np.diag(lqr_gains.WEIGHTS[:4])[np.newaxis], np.array([[[lqr_gains.WEIGHTS[4]]]]))
+    lqr = tuple(K[0, 0]*lqr_gains.FIRMWARE_SCALE)
+    failures = check('main.py', MAIN_GAINS[0], MAIN_GAINS[1], ticks, random.Random(seed))
+    failures += check('LQR', lqr, lqr, ticks, random.Random(seed))
+
+    (float_task, m), (fixed_task, m) = make_tasks(*MAIN_GAINS)
+    Sensors().set(2500, 1800, [0, 40, -25], [300, -120, 80])
+    float_us = time_ticks(float_task, ticks)
+    fixed_us = time_ticks(fixed_task, ticks)
+    print('Host time per tick, including the stand-ins: float {:.1f} us, fixed-point {:.1f} us ({:.0%})'.format(
+          float_us, fixed_us, fixed_us/float_us))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
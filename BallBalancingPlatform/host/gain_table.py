@@ -0,0 +1,165 @@
+'''@file        gain_table.py
+   @brief       Generates and verifies the gain schedule of the term project.
+   @details     Linearizes the ball-on-plate model of lqr_gains.py about the ball
+                at every radius and speed of an evenly spaced grid, solves the LQR
+                problem for all grid points as one batch, and writes the gains in
+                the units of the state vectors to gain_table.txt, the file read by
+                closedloop.load_gain_schedule() when GAIN_SCHEDULE is set in
+                main.py. Copy the file to the Nucleo next to main.py.
+
+                The written table is then checked with the interpolation code of
+                closedloop.GainSchedule itself. At random radii, speeds, and
+                directions, including some beyond the table, the interpolated gains
+                are compared with the gains solved directly for that point, and the
+                closed loop of the local model with the interpolated gains must be
+                stable. Exits with status 1 if a grid point does not reproduce its
+                own gains or a closed loop is unstable. Run from the
+                BallBalancingPlatform directory with
+                python host/gain_table.py [--radius-max 88] [--speed-max 0.5] [--output gain_table.txt]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import math
+import random
+import numpy as np
+import lqr_gains
+import shares
+import closedloop
+
+## @brief     Largest relative error allowed where a check point lies on the grid
+#  @details   The table is stored in single precision floats on the Nucleo
+GRID_TOLERANCE = 1e-5
+
+def solve(radii, speeds, weights, period):
+    ''' @brief          Solves the LQR gains of one axis about a batch of operating points
+        @param radii    Ball positions in m
+        @param speeds   Ball speeds in m/s
+        @param weights  The weights on x, theta, x_dot, theta_dot, and the torque
+        @param period   The control period in seconds
+        @return         The gains in SI units, N x 4, and the discrete models, N x 4 x 4 and N x 4 x 1
+    '''
+    models = [lqr_gains.discretize(*lqr_gains.linearize(point=np.array([radius, 0, speed, 0])), period)
+              for radius, speed in zip(radii, speeds)]
+    Ad = np.array([model[0] for model in models])
+    Bd = np.array([model[1] for model in models])
+    Q = np.broadcast_to(np.diag(weights[:4]), Ad.shape).copy()
+    R = np.full((len(Ad), 1, 1), weights[4])
+    return lqr_gains.lqr(Ad, Bd, Q, R)[:, 0, :], Ad, Bd
+
+def write_table(filename, num_radius, num_speed, radius_step, speed_step, gain_x, gain_y):
+    ''' @brief          Writes the table in the format read by closedloop.load_gain_schedule()
+        @param gain_x   The x axis gains in state vector units, one row per grid point
+        @param gain_y   The y axis gains in state vector units, one row per grid point
+    '''
+    with open(filename, 'w') as f:
+        f.write('{:},{:},{:.9g},{:.9g}\n'.format(num_radius, num_speed, radius_step, speed_step))
+        for row_x, row_y in zip(gain_x, gain_y):
+            f.write(','.join('{:.9g}'.format(gain) for gain in list(row_x) + list(row_y)) + '\n')
+
+def load(filename):
+    ''' @brief      Reads the table back with the code that runs on the Nucleo
+        @return     The GainSchedule and the StateVector it reads the ball state from
+    '''
+    state_vect = shares.StateVector(8)
+    directory, name = os.path.split(os.path.abspath(filename))
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        schedule = closedloop.load_gain_schedule(state_vect, name)
+    finally:
+        os.chdir(cwd)
+    return schedule, state_vect
+
+def check(schedule, state_vect, args, count, rng):
+    ''' @brief          Compares interpolated gains with directly solved gains at random points
+        @param count    The number of random points, in addition to every grid point
+        @return         The exit status, 1 if a check failed
+    '''
+    points = [(i*schedule.radius_step, j*schedule.speed_step, True)
+              for i in range(schedule.num_radius) for j in range(schedule.num_speed)]
+    for n in range(count):
+        points.append((rng.uniform(0, 1.2*args.radius_max), rng.uniform(0, 1.2*args.speed_max/1000), False))
+
+    radius_end = (schedule.num_radius - 1)*schedule.radius_step
+    speed_end = (schedule.num_speed - 1)*schedule.speed_step
+    clamped = [(min(radius, radius_end)/1000, min(speed, speed_end)*1000) for radius, speed, on_grid in points]
+    solved, Ad, Bd = solve([p[0] for p in clamped], [p[1] for p in clamped], args.weights, args.period_us/1000000)
+
+    status = 0
+    errors = {True: [], False: []}
+    worst_radius = 0
+    out = np.zeros(4)
+    for k, (radius, speed, on_grid) in enumerate(points):
+        angle = rng.uniform(0, 2*math.pi)
+        state_vect.write_field(0, radius*math.cos(angle))
+        state_vect.write_field(4, radius*math.sin(angle))
+        state_vect.write_field(2, speed*math.cos(angle))
+        state_vect.write_field(6, speed*math.sin(angle))
+        for axis, signs in ((0, args.signs_x), (1, args.signs_y)):
+            schedule.duty_gain_into(axis, out)
+            gain = out/(-closedloop.DUTY_PER_TORQUE)/(lqr_gains.FIRMWARE_SCALE*signs)
+            error = np.linalg.norm(gain - solved[k])/np.linalg.norm(solved[k])
+            errors[on_grid].append(error)
+            radius_cl = np.abs(np.linalg.eigvals(Ad[k] - Bd[k] @ gain.reshape(1, 4))).max()
+            worst_radius = max(worst_radius, radius_cl)
+            if on_grid and error > GRID_TOLERANCE:
+                print('FAIL: grid point {:.1f} mm, {:.3f} m/s reproduces its gains with error {:.2g}'.format(radius, speed*1000, error))
+                status = 1
+            if radius_cl >= 1:
+                print('FAIL: unstable at {:.1f} mm, {:.3f} m/s, spectral radius {:.4f}'.format(radius, speed*1000, radius_cl))
+                status = 1
+    print('Grid points:   {:} checks, max relative gain error {:.2g}'.format(len(errors[True]), max(errors[True])))
+    if errors[False]:
+        print('Random points: {:} checks, max relative gain error {:.2g}, mean {:.2g}'.format(
+              len(errors[False]), max(errors[False]), sum(errors[False])/len(errors[False])))
+    print('Largest closed loop spectral radius {:.4f}'.format(worst_radius))
+    return status
+
+def main(argv):
+    ''' @brief      Generates, writes, and checks the gain table
+        @param argv The command line arguments
+        @return     The exit status, 1 if a check failed
+    '''
+    parser = argparse.ArgumentParser(description='Generates and verifies the gain schedule table.')
+    parser.add_argument('--radius-max', type=float, default=88.0, help='largest ball radius of the table, in mm')
+    parser.add_argument('--speed-max', type=float, default=0.5, help='largest ball speed of the table, in m/s')
+    parser.add_argument('--num-radius', type=int, default=5, help='number of grid points in radius')
+    parser.add_argument('--num-speed', type=int, default=4, help='number of grid points in speed')
+    parser.add_argument('--weights', type=lambda text: [float(value) for value in text.split(',')],
+                        default=list(lqr_gains.WEIGHTS), help='qx,qtheta,qxd,qthetad,r')
+    parser.add_argument('--period-us', type=int, default=lqr_gains.CONTROL_PERIOD_US, help='control period in microseconds')
+    parser.add_argument('--signs-x', type=lqr_gains.parse_signs, default=np.array(lqr_gains.SIGNS_X),
+                        help='signs of the x axis state elements')
+    parser.add_argument('--signs-y', type=lqr_gains.parse_signs, default=np.array(lqr_gains.SIGNS_Y),
+                        help='signs of the y axis state elements')
+    parser.add_argument('--output', default='gain_table.txt', help='the table file to write')
+    parser.add_argument('--check', type=int, default=200, help='number of random check points')
+    parser.add_argument('--seed', type=int, default=305, help='seed of the random check points')
+    args = parser.parse_args(argv[1:])
+    if args.num_radius < 2 or args.num_speed < 2:
+        parser.error('the table needs at least two grid points in radius and in speed')
+
+    radius_step = args.radius_max/(args.num_radius - 1)
+    speed_step = args.speed_max/(args.num_speed - 1)
+    grid = [(i*radius_step/1000, j*speed_step) for i in range(args.num_radius) for j in range(args.num_speed)]
+    gain = solve([p[0] for p in grid], [p[1] for p in grid], args.weights, args.period_us/1000000)[0]
+    gain = gain*lqr_gains.FIRMWARE_SCALE
+    write_table(args.output, args.num_radius, args.num_speed, radius_step, speed_step/1000,
+                gain*args.signs_x, gain*args.signs_y)
+    print('Wrote {:} gain vectors per axis to {:}'.format(len(grid), args.output))
+    spread = np.abs(gain - gain[0]).max(axis=0)/np.abs(gain[0])
+    print('Largest change from the center gains: ' + ', '.join('{:.1%}'.format(value) for value in spread))
+
+    schedule, state_vect = load(args.output)
+    return check(schedule, state_vect, args, args.check, random.Random(args.seed))
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,86 @@
+'''@file        load_report.py
+   @brief       Summarizes CPU load reports captured from the Nucleo serial port.
+   @details     Reads a serial log containing the output of the 'u' command of
+                Task_User, which prints the CPU load from profiler.LoadMonitor.
+                For every task it prints the mean and peak load over all reports
+                in the log, followed by the overall load and the remaining idle
+                headroom. Given the run time of a task that is being considered,
+                it also prints the highest rate at which that task would fit in
+                the worst observed headroom. Run with
+                python host/load_report.py serial_log.txt [run time in us]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import re
+import sys
+
+_HEADER = re.compile(r'CPU load over ([\d.]+) s: ([\d.]+)% tasks, (-?[\d.]+)% overhead, ([\d.]+)% idle')
+_TASK = re.compile(r'^\s+(.+): ([\d.]+)%$')
+
+def parse(lines):
+    ''' @brief          Extracts every load report from a serial log
+        @param lines    The lines of the serial log
+        @return         A list of reports, each a dictionary with the keys tasks,
+                        overhead, idle, and per_task, the last mapping task names to percent load
+    '''
+    reports = []
+    report = None
+    for line in lines:
+        line = line.rstrip()
+        match = _HEADER.search(line)
+        if match:
+            report = {'tasks': float(match.group(2)),
+                      'overhead': float(match.group(3)),
+                      'idle': float(match.group(4)),
+                      'per_task': {}}
+            reports.append(report)
+            continue
+        match = _TASK.match(line)
+        if match and report is not None:
+            report['per_task'][match.group(1)] = float(match.group(2))
+        else:
+            report = None
+    return reports
+
+def summarize(reports, run_time=None):
+    ''' @brief          Prints the mean and peak load of every task and the overall headroom
+        @param reports  Reports returned by parse()
+        @param run_time Optional run time, in microseconds, of a task being considered
+    '''
+    names = []
+    for report in reports:
+        for name in report['per_task']:
+            if name not in names:
+                names.append(name)
+    print('{:} load reports'.format(len(reports)))
+    print('{:<16}{:>10}{:>10}'.format('task', 'mean %', 'peak %'))
+    for name in names:
+        values = [report['per_task'].get(name, 0.0) for report in reports]
+        print('{:<16}{:>10.1f}{:>10.1f}'.format(name, sum(values)/len(values), max(values)))
+    for key in ('tasks', 'overhead', 'idle'):
+        values = [report[key] for report in reports]
+        print('{:<16}{:>10.1f}{:>10.1f}'.format(key, sum(values)/len(values), max(values)))
+    worst_idle = min(report['idle'] for report in reports)
+    print('worst-case headroom: {:.1f}% of the CPU'.format(worst_idle))
+    if run_time:
+        print('a task taking {:.0f} us per run fits at up to {:.0f} Hz'.format(run_time, worst_idle/100*1000000/run_time))
+
+def main(argv):
+    ''' @brief      Reads the serial log named on the command line, or standard input
+        @param argv The command line arguments
+    '''
+    if len(argv) > 1 and argv[1] != '-':
+        with open(argv[1]) as f:
+            reports = parse(f)
+    else:
+        reports = parse(sys.stdin)
+    if not reports:
+        print('No CPU load reports found')
+        return 1
+    summarize(reports, float(argv[2]) if len(argv) > 2 else None)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
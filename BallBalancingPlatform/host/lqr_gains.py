@@ -0,0 +1,276 @@
+'''@file        lqr_gains.py
+   @brief       Synthesizes the controller gains of the term project by LQR.
+   @details     Builds the nonlinear ball-on-plate model of one platform axis,
+                linearizes it about the balanced state, discretizes it with a
+                zero-order hold at the control rate, and solves the discrete
+                algebraic Riccati equation for the state feedback gain that
+                minimizes the quadratic cost with weights Q and R. The state is
+                [x, theta_y, x_dot, theta_y_dot] and the input is the motor torque,
+                as in closedloop.py. The gains are converted from SI units to the
+                units the tasks write into the state vectors, millimeters, degrees,
+                millimeters per microsecond, and radians per second, and printed
+                as gain_1 and gain_2 lines ready to paste into main.py. Both axes
+                use the same model; the sign of every element of each axis can be
+                flipped with --signs-x and --signs-y to match how the panel and the
+                IMU are mounted. By default the signs are those of the hand-tuned
+                gain_1 and gain_2 of main.py, SIGNS_X and SIGNS_Y.
+
+                Every weight accepts a comma separated list of values or a
+                logarithmic range lo:hi:count. All combinations are solved at once
+                as a batch and simulated from a ball offset with the duty cycle
+                limits of main.py. Stable gain sets that stay within the limits
+                come first, ranked by settling time and then by peak duty cycle.
+                Run from the BallBalancingPlatform directory with
+                python host/lqr_gains.py [--qx 1:1000:5 --r 1,10,100] [--top 10]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import itertools
+import math
+import time
+import numpy as np
+import closedloop
+
+## @brief     Physical parameters of one axis of the platform, in SI units
+#  @details   r_m motor lever arm, l_r push rod length, r_B ball radius, r_G
+#             height of the platform center of gravity, l_P lever arm of the push
+#             rod about the platform pivot, r_C height of the platform surface,
+#             m_B and m_P ball and platform mass, I_P platform moment of inertia,
+#             b viscous friction at the pivot
+PLANT = {'r_m': 0.060,
+         'l_r': 0.050,
+         'r_B': 0.0105,
+         'r_G': 0.042,
+         'l_P': 0.110,
+         'r_C': 0.050,
+         'm_B': 0.030,
+         'm_P': 0.400,
+         'I_P': 1.88e-3,
+         'b': 0.010,
+         'g': 9.81}
+
+## @brief     Control period in microseconds
+#  @details   period_motor in main.py, also 1/freq_control for TIMER_CONTROL
+CONTROL_PERIOD_US = 2000
+
+## @brief     Duty cycle limit of the controllers in main.py, in percent
+DUTY_LIMIT = 80
+
+## @brief     Factors converting a gain on [x, theta, x_dot, theta_dot] in SI units to the state vector units
+#  @details   The state vectors hold mm, degrees, mm/us, and rad/s
+FIRMWARE_SCALE = np.array([1e-3, math.pi/180, 1e3, 1.0])
+
+## @brief     Default weights on x, theta, x_dot, theta_dot, and the torque
+WEIGHTS = (400.0, 100.0, 25.0, 1.0, 20.0)
+
+## @brief     Ball position and platform angle within which the response counts as settled, in m and rad
+SETTLED = (0.002, math.radians(1))
+
+## @brief     Default signs of the x axis state elements
+#  @details   The signs of the hand-tuned gain_1 of main.py relative to the LQR gain
+SIGNS_X = (1.0, 1.0, 1.0, -1.0)
+
+## @brief     Default signs of the y axis state elements
+#  @details   The signs of the hand-tuned gain_2 of main.py relative to the LQR gain. The
+#             position, angle, and angular velocity have the opposite sign from x.
+SIGNS_Y = (-1.0, -1.0, 1.0, 1.0)
+
+def dynamics(state, torque, plant=PLANT):
+    ''' @brief          Nonlinear equations of motion of one axis
+        @param state    [x, theta, x_dot, theta_dot] in m, rad, m/s, and rad/s
+        @param torque   The motor torque in N*m
+        @param plant    The physical parameters
+        @return         The time derivative of the state
+    '''
+    x, theta, x_dot, theta_dot = state
+    p = plant
+    I_B = 2/5*p['m_B']*p['r_B']**2
+    r_B, r_C, m_B = p['r_B'], p['r_C'], p['m_B']
+    M = np.array([[-(m_B*r_B**2 + m_B*r_C*r_B + I_B)/r_B,
+                   -(I_B*r_B + p['I_P']*r_B + m_B*r_B**3 + m_B*r_B*r_C**2 + 2*m_B*r_B**2*r_C
+                     + p['m_P']*r_B*p['r_G']**2 + m_B*r_B*x**2)/r_B],
+                  [-(m_B*r_B**2 + I_B)/r_B,
+                   -(m_B*r_B**3 + m_B*r_C*r_B**2 + I_B*r_B)/r_B]])
+    f = np.array([p['b']*theta_dot - p['g']*m_B*(math.sin(theta)*(r_C + r_B) + x*math.cos(theta))
+                  + torque*p['l_P']/p['r_m'] + 2*m_B*theta_dot*x*x_dot - p['g']*p['m_P']*p['r_G']*math.sin(theta),
+                  -m_B*r_B*x*theta_dot**2 - p['g']*m_B*r_B*math.sin(theta)])
+    x_ddot, theta_ddot = np.linalg.solve(M, f)
+    return np.array([x_dot, theta_dot, x_ddot, theta_ddot])
+
+def linearize(plant=PLANT, step=1e-6, point=None):
+    ''' @brief          Linearizes the equations of motion about the balanced state
+        @details        Uses central differences, so changes to dynamics() carry over.
+        @param point    Optional state to linearize about instead, with zero torque
+        @return         The continuous-time A (4x4) and B (4x1) matrices
+    '''
+    if point is None:
+        point = np.zeros(4)
+    A = np.zeros((4, 4))
+    for n in range(4):
+        delta = np.zeros(4)
+        delta[n] = step
+        A[:, n] = (dynamics(point + delta, 0, plant) - dynamics(point - delta, 0, plant))/(2*step)
+    B = ((dynamics(point, step, plant) - dynamics(point, -step, plant))/(2*step)).reshape(4, 1)
+    return A, B
+
+def expm(M):
+    ''' @brief      Matrix exponential by scaling and squaring of a Taylor series
+        @param M    A square matrix
+    '''
+    norm = np.abs(M).sum(axis=1).max()
+    squarings = max(0, int(math.ceil(math.log2(norm))) + 1) if norm > 0 else 0
+    scaled = M/2**squarings
+    result = np.eye(len(M))
+    term = np.eye(len(M))
+    for n in range(1, 20):
+        term = term @ scaled/n
+        result = result + term
+    for n in range(squarings):
+        result = result @ result
+    return result
+
+def discretize(A, B, period):
+    ''' @brief          Zero-order hold discretization
+        @param period   The sample period in seconds
+        @return         The discrete-time matrices Ad and Bd
+    '''
+    n, m = B.shape
+    augmented = np.zeros((n + m, n + m))
+    augmented[:n, :n] = A
+    augmented[:n, n:] = B
+    Phi = expm(augmented*period)
+    return Phi[:n, :n], Phi[:n, n:]
+
+def dare(Ad, Bd, Q, R, tolerance=1e-10, iterations=60):
+    ''' @brief          Solves a batch of discrete algebraic Riccati equations
+        @details        Uses the structure-preserving doubling algorithm, which
+                        converges quadratically and only needs batched solves, so a
+                        stack of weightings is solved in a handful of NumPy calls.
+        @param Ad       The discrete state matrix, n x n, or a stack of them, N x n x n
+        @param Bd       The discrete input matrix, n x m, or a stack of them, N x n x m
+        @param Q        A stack of state weights, N x n x n
+        @param R        A stack of input weights, N x m x m
+        @return         The stack of solutions P, N x n x n
+    '''
+    I = np.eye(Q.shape[-1])
+    A_k = np.broadcast_to(Ad, Q.shape).copy()
+    Bd = np.broadcast_to(Bd, Q.shape[:-1] + Bd.shape[-1:])
+    G_k = Bd @ np.linalg.solve(R, np.swapaxes(Bd, -1, -2))
+    H_k = Q.copy()
+    for n in range(iterations):
+        W = I + G_k @ H_k
+        A_W = A_k @ np.linalg.inv(W)
+        H_next = H_k + np.swapaxes(A_k, -1, -2) @ H_k @ np.linalg.solve(W, A_k)
+        G_k = G_k + A_W @ G_k @ np.swapaxes(A_k, -1, -2)
+        A_k = A_W @ A_k
+        change = np.abs(H_next - H_k).max()
+        H_k = H_next
+        if change <= tolerance*max(1.0, np.abs(H_k).max()):
+            break
+    return H_k
+
+def lqr(Ad, Bd, Q, R):
+    ''' @brief      Discrete LQR gains for a batch of weightings, and optionally of plants
+        @return     The stack of gains K, N x m x n, for the control law u = -K x
+    '''
+    P = dare(Ad, Bd, Q, R)
+    BtP = np.swapaxes(Bd, -1, -2) @ P
+    return np.linalg.solve(R + BtP @ Bd, BtP @ Ad)
+
+def simulate(Ad, Bd, K, x0, steps, torque_limit):
+    ''' @brief              Simulates the discrete closed loops of a batch of gains
+        @param K            The stack of gains, N x 1 x n
+        @param x0           The initial state in SI units
+        @param steps        The number of control periods to simulate
+        @param torque_limit The largest torque magnitude the duty cycle limit allows
+        @return             The settling step, or steps if the response never settles,
+                            and the peak unsaturated torque, both per gain
+    '''
+    count = len(K)
+    x = np.tile(x0, (count, 1))
+    settle = np.zeros(count, dtype=int)
+    peak = np.zeros(count)
+    for n in range(steps):
+        u = -np.einsum('kj,kj->k', K[:, 0, :], x)
+        peak = np.maximum(peak, np.abs(u))
+        u = np.clip(u, -torque_limit, torque_limit)
+        x = x @ Ad.T + np.outer(u, Bd[:, 0])
+        outside = (np.abs(x[:, 0]) > SETTLED[0]) | (np.abs(x[:, 1]) > SETTLED[1]) | ~np.isfinite(x).all(axis=1)
+        settle[outside] = n + 1
+    return settle, peak
+
+def parse_values(text):
+    ''' @brief      Parses a weight given on the command line
+        @param text A comma separated list of values or a logarithmic range lo:hi:count
+        @return     The list of values
+    '''
+    if ':' in text:
+        lo, hi, count = text.split(':')
+        return list(np.logspace(math.log10(float(lo)), math.log10(float(hi)), int(count)))
+    return [float(value) for value in text.split(',')]
+
+def parse_signs(text):
+    ''' @brief      Parses the signs of the four state elements of an axis
+    '''
+    signs = np.array([float(value) for value in text.split(',')])
+    if len(signs) != 4:
+        raise argparse.ArgumentTypeError('four signs are needed')
+    return signs
+
+def main(argv):
+    ''' @brief      Solves, ranks, and prints the gains for every combination of weights
+        @param argv The command line arguments
+    '''
+    parser = argparse.ArgumentParser(description='Synthesizes the ball balancing gains by LQR.')
+    parser.add_argument('--qx', type=parse_values, default=[WEIGHTS[0]], help='weight on the ball position')
+    parser.add_argument('--qtheta', type=parse_values, default=[WEIGHTS[1]], help='weight on the platform angle')
+    parser.add_argument('--qxd', type=parse_values, default=[WEIGHTS[2]], help='weight on the ball velocity')
+    parser.add_argument('--qthetad', type=parse_values, default=[WEIGHTS[3]], help='weight on the platform angular velocity')
+    parser.add_argument('--r', type=parse_values, default=[WEIGHTS[4]], help='weight on the motor torque')
+    parser.add_argument('--period-us', type=int, default=CONTROL_PERIOD_US, help='control period in microseconds')
+    parser.add_argument('--x0-mm', type=float, default=50.0, help='initial ball offset of the ranking simulation')
+    parser.add_argument('--seconds', type=float, default=3.0, help='length of the ranking simulation')
+    parser.add_argument('--top', type=int, default=5, help='number of ranked gain sets to print')
+    parser.add_argument('--signs-x', type=parse_signs, default=np.array(SIGNS_X), help='signs of the x axis state elements')
+    parser.add_argument('--signs-y', type=parse_signs, default=np.array(SIGNS_Y), help='signs of the y axis state elements')
+    args = parser.parse_args(argv[1:])
+
+    period = args.period_us/1000000
+    A, B = linearize()
+    Ad, Bd = discretize(A, B, period)
+    print('Open loop poles [1/s]: ' + ', '.join('{:.3g}'.format(pole) for pole in np.linalg.eigvals(A)))
+
+    weights = list(itertools.product(args.qx, args.qtheta, args.qxd, args.qthetad, args.r))
+    Q = np.array([np.diag(weight[:4]) for weight in weights])
+    R = np.array([[[weight[4]]] for weight in weights])
+    start = time.perf_counter()
+    K = lqr(Ad, Bd, Q, R)
+    radius = np.abs(np.linalg.eigvals(Ad - Bd @ K)).max(axis=1)
+    steps = int(args.seconds/period)
+    torque_limit = DUTY_LIMIT/closedloop.DUTY_PER_TORQUE
+    settle, peak = simulate(Ad, Bd, K, np.array([args.x0_mm/1000, 0, 0, 0]), steps, torque_limit)
+    elapsed = time.perf_counter() - start
+    print('Solved and simulated {:} gain sets in {:.2f} s at {:} us'.format(len(weights), elapsed, args.period_us))
+
+    peak_duty = peak*closedloop.DUTY_PER_TORQUE
+    ranking = sorted(range(len(weights)), key=lambda k: (radius[k] >= 1, peak_duty[k] > DUTY_LIMIT, settle[k], peak_duty[k]))
+    for rank, k in enumerate(ranking[:args.top]):
+        settled = 'never' if settle[k] >= steps else '{:.3f} s'.format(settle[k]*period)
+        print()
+        print('#{:} qx {:.4g} qtheta {:.4g} qxd {:.4g} qthetad {:.4g} r {:.4g}'.format(rank + 1, *weights[k]))
+        print('   settles {:}, peak duty {:.0f}%, closed loop spectral radius {:.4f}'.format(
+              settled, peak_duty[k], radius[k]))
+        gain = K[k, 0, :]*FIRMWARE_SCALE
+        print('    gain_1 = np.array([{:}])   #X-GAINS'.format(', '.join('{:.4g}'.format(g) for g in gain*args.signs_x)))
+        print('    gain_2 = np.array([{:}])   #Y-GAINS'.format(', '.join('{:.4g}'.format(g) for g in gain*args.signs_y)))
+
+if __name__ == '__main__':
+    main(sys.argv)
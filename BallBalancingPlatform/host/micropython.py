@@ -0,0 +1,67 @@
+'''@file        micropython.py
+   @brief       Host stand-in for the MicroPython micropython module.
+   @details     Provides const(), the code emitter decorators, and schedule().
+                Scheduled callbacks are queued and run from the utime sleep
+                functions or from run_pending(), which mirrors how MicroPython
+                runs them between bytecodes of the main program.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import utime
+
+## @brief     The maximum number of callbacks that may be pending at once
+#  @details   Matches MICROPY_SCHEDULER_DEPTH on the STM32 port
+SCHEDULER_DEPTH = 8
+
+_pending = []
+
+## @brief     True while a scheduled callback runs
+#  @details   Like on the board, scheduled callbacks do not interrupt each other
+_running = False
+
+def const(value):
+    ''' @brief  Returns value unchanged, as const() does at run time on the board
+    '''
+    return value
+
+def native(function):
+    ''' @brief  Stand-in for the native code emitter decorator
+    '''
+    return function
+
+def viper(function):
+    ''' @brief  Stand-in for the viper code emitter decorator
+    '''
+    return function
+
+def alloc_emergency_exception_buf(size):
+    ''' @brief  Stand-in for reserving memory for exceptions raised in interrupts
+    '''
+    pass
+
+def schedule(function, arg):
+    ''' @brief          Schedules a function to be called soon from the main program
+        @param function The function to call
+        @param arg      The argument passed to the function
+    '''
+    if len(_pending) >= SCHEDULER_DEPTH:
+        raise RuntimeError('schedule queue full')
+    _pending.append((function, arg))
+
+def run_pending():
+    ''' @brief  Runs every scheduled callback. Host only.
+    '''
+    global _running
+    if _running:
+        return
+    _running = True
+    try:
+        while _pending:
+            function, arg = _pending.pop(0)
+            function(arg)
+    finally:
+        _running = False
+
+utime.add_idle_hook(run_pending)
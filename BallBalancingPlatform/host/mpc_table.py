@@ -0,0 +1,364 @@
+'''@file        mpc_table.py
+   @brief       Generates and verifies the explicit model predictive control tables.
+   @details     Poses the model predictive control problem of one axis on the
+                discrete model of lqr_gains.py: a quadratic cost on the predicted
+                states and torques over a horizon of 245 control periods, with the
+                LQR cost-to-go as the terminal cost and the duty cycle limits as
+                constraints. The torque is held constant over blocks of periods
+                that grow along the horizon, so the problem only has a handful of
+                decision variables. Its solution is piecewise affine in the state:
+                every combination of blocks at the upper limit, the lower limit, or
+                free defines a region of the state space bounded by linear
+                inequalities, and inside a region the first torque is an affine
+                function of the state. The regions that occur for states sampled
+                over the range the platform can reach are kept, ordered by how
+                often they occurred, and written in the state vector units with the
+                duty cycle in percent to mpc_table.txt, the file read by
+                closedloop.load_explicit_mpc() when MPC_CONTROL is set in main.py.
+                Copy the file to the Nucleo next to main.py.
+
+                The written table is then checked with closedloop.ExplicitMPC
+                itself. At random states, including some beyond the sampled range,
+                its duty cycle is compared with the solution of the quadratic
+                program by an independent projected gradient solver, and the
+                fraction of states that are outside every region is reported.
+                Finally the nonlinear model is simulated from a few hard initial
+                states under the table, under saturated LQR with the same weights,
+                and under saturated LQR with the default weights of lqr_gains.py.
+
+                The constraints only change the control where saturated LQR would
+                ask for more than the motors can give. With the weights of
+                lqr_gains.py that hardly happens and the table reduces to LQR. The
+                default weights here are much more aggressive on the ball position
+                and the platform angle, so the duty cycle limits are active in the
+                hard initial states, where saturated LQR with the same weights lets
+                the ball travel up to 10 mm further than the table. Exits with
+                status 1 if the duty cycles of the table differ from the quadratic
+                program, or if in a simulation the table does not settle or lets
+                the ball travel further than saturated LQR with the same weights,
+                or if the table keeps the ball closer than it by less than
+                MIN_IMPROVEMENT from every initial state, which means the
+                constraints do not change the control and the table is only
+                saturated LQR at a higher cost. Run from the BallBalancingPlatform
+                directory with
+                python host/mpc_table.py [--weights 40000,2000,25,1,0.2] [--output mpc_table.txt]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import itertools
+import math
+import numpy as np
+import lqr_gains
+import observer_gains
+import shares
+import closedloop
+
+## @brief     Default weights on x, theta, x_dot, theta_dot, and the torque
+#  @details   One hundred times the position weight, twenty times the angle weight,
+#             and a hundredth of the torque weight of lqr_gains.WEIGHTS, so that the
+#             duty cycle limits are active
+MPC_WEIGHTS = (40000.0, 2000.0, 25.0, 1.0, 0.2)
+
+## @brief     Smallest reduction, in mm, of the largest ball position below saturated LQR
+#             with the same weights that the table must reach from one of INITIAL_STATES
+MIN_IMPROVEMENT = 1.0
+
+## @brief     Default lengths, in control periods, of the blocks of constant torque along the horizon
+BLOCKS = (1, 4, 16, 32, 64, 128)
+
+## @brief     Half the range of x, theta, x_dot, and theta_dot sampled for the regions, in SI units
+SAMPLE_RANGE = np.array([0.09, math.radians(15), 0.5, 6.0])
+
+## @brief     Largest duty cycle difference from the quadratic program allowed inside a region, in percent
+DUTY_TOLERANCE = 0.05
+
+## @brief     Initial states [x, theta, x_dot, theta_dot] of the check simulations, in SI units
+#  @details   A large offset at rest, a ball rolling outward, and a ball rolling across the center
+INITIAL_STATES = ((0.06, 0.0, 0.0, 0.0), (0.03, 0.0, 0.25, 0.0), (0.0, 0.0, 0.4, 0.0))
+
+## @brief     Half the width of the panel in mm, beyond which the ball has left it
+PANEL_EDGE = 88
+
+def prediction(Ad, Bd, weights, blocks):
+    ''' @brief          Builds the quadratic program of the blocked horizon
+        @details        The cost of the torques u of the blocks from the state x is
+                        u'Hu/2 + x'F'u plus a term that does not depend on u.
+        @param weights  The weights on x, theta, x_dot, theta_dot, and the torque
+        @param blocks   The number of control periods of every block
+        @return         H, N x N, and F, N x 4, for N blocks
+    '''
+    Q = np.diag(weights[:4])
+    R = np.array([[weights[4]]])
+    P = lqr_gains.dare(Ad, Bd, Q[np.newaxis], R[np.newaxis])[0]
+    N = len(blocks)
+    Phi = np.eye(4)
+    Gamma = np.zeros((4, N))
+    H = np.zeros((N, N))
+    F = np.zeros((N, 4))
+    k = 0
+    for i, length in enumerate(blocks):
+        for n in range(length):
+            Gamma = Ad @ Gamma
+            Gamma[:, i] += Bd[:, 0]
+            Phi = Ad @ Phi
+            k += 1
+            weight = P if k == sum(blocks) else Q
+            H += Gamma.T @ weight @ Gamma
+            F += Gamma.T @ weight @ Phi
+        H[i, i] += weights[4]*length
+    return H, F
+
+def region(H, F, limit, active):
+    ''' @brief          Finds the region and the control law of a combination of active limits
+        @param limit    The torque limit
+        @param active   For every block 1 at the upper limit, -1 at the lower limit, or 0 free
+        @return         The rows and bounds of the inequalities rows x <= bounds, and the gain
+                        and offset of the first torque gain x + offset
+    '''
+    a = np.array(active, dtype=float)
+    free = np.flatnonzero(a == 0)
+    fixed = np.flatnonzero(a != 0)
+    G = np.zeros((len(a), 4))
+    c = a*limit
+    if len(free):
+        H_inv = np.linalg.inv(H[np.ix_(free, free)])
+        G[free] = -H_inv @ F[free]
+        c[free] = -H_inv @ H[np.ix_(free, fixed)] @ c[fixed]
+    # A free torque stays within the limits, and the cost decreases toward an active limit
+    gradient = H @ G + F
+    gradient_offset = H @ c
+    rows = [G[free], -G[free], a[fixed, np.newaxis]*gradient[fixed]]
+    bounds = [limit - c[free], limit + c[free], -a[fixed]*gradient_offset[fixed]]
+    return np.concatenate(rows), np.concatenate(bounds), G[0], c[0]
+
+def critical_regions(H, F, limit, states):
+    ''' @brief          Finds the regions that contain the sampled states
+        @param states   The sampled states, one row each
+        @return         The regions as (rows, bounds, gain, offset, count), by decreasing count
+    '''
+    regions = []
+    for active in itertools.product((0, 1, -1), repeat=len(H)):
+        rows, bounds, gain, offset = region(H, F, limit, active)
+        count = int(np.all(states @ rows.T <= bounds + 1e-9, axis=1).sum())
+        if count:
+            regions.append((rows, bounds, gain, offset, count))
+    return sorted(regions, key=lambda r: -r[4])
+
+def to_firmware(regions, signs):
+    ''' @brief          Converts the regions to the state vector units and the law to the duty cycle
+        @details        Every inequality is scaled so that its largest coefficient times the
+                        sampled range of its state element is one, which makes the residuals
+                        comparable to closedloop.MPC_TOLERANCE. Inequalities that hold over the
+                        whole sampled range are dropped.
+        @param signs    The signs of the state elements of the axis
+        @return         The regions as (rows, bounds, gain, offset)
+    '''
+    scale = lqr_gains.FIRMWARE_SCALE*signs
+    span = SAMPLE_RANGE/lqr_gains.FIRMWARE_SCALE
+    table = []
+    for rows, bounds, gain, offset, count in regions:
+        rows = rows*scale
+        size = (np.abs(rows)*span).max(axis=1)
+        keep = size > 1e-12
+        rows = rows[keep]/size[keep, np.newaxis]
+        bounds = bounds[keep]/size[keep]
+        keep = np.abs(rows) @ span > bounds
+        table.append((rows[keep], bounds[keep], closedloop.DUTY_PER_TORQUE*gain*scale,
+                      closedloop.DUTY_PER_TORQUE*offset))
+    return table
+
+def write_table(filename, tables):
+    ''' @brief          Writes the tables in the format read by closedloop.load_explicit_mpc()
+        @param tables   The regions of the x axis and of the y axis, from to_firmware()
+    '''
+    with open(filename, 'w') as f:
+        for table in tables:
+            start = np.cumsum([0] + [len(bounds) for rows, bounds, gain, offset in table])
+            f.write('{:},{:}\n'.format(len(table), start[-1]))
+            f.write(','.join(str(value) for value in start) + '\n')
+            for rows, bounds, gain, offset in table:
+                for row, bound in zip(rows, bounds):
+                    f.write(','.join('{:.9g}'.format(value) for value in list(row) + [bound]) + '\n')
+            for rows, bounds, gain, offset in table:
+                f.write(','.join('{:.9g}'.format(value) for value in list(gain) + [offset]) + '\n')
+
+def load(filename):
+    ''' @brief      Reads the tables back with the code that runs on the Nucleo
+        @return     The controller of the x axis, with a StampedShare as its duty cycle
+    '''
+    state_vect = shares.StateVector(8)
+    directory, name = os.path.split(os.path.abspath(filename))
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        controllers = closedloop.load_explicit_mpc(80, -80, shares.StampedShare(0), shares.StampedShare(0),
+                                                   state_vect.sub(0, 4), state_vect.sub(4, 4), name)
+    finally:
+        os.chdir(cwd)
+    return controllers[0]
+
+def solve(H, F, limit, states, iterations=5000):
+    ''' @brief          Solves the quadratic program of a batch of states
+        @details        Accelerated projected gradient steps find which torques are at a
+                        limit, then the free torques are solved exactly and the limits
+                        are updated from the signs of the gradient until they agree. The
+                        projected gradient alone converges slowly because the blocks
+                        make H badly conditioned.
+        @param states   The states, one row each
+        @return         The first torque of every state
+    '''
+    step = 1/np.linalg.eigvalsh(H).max()
+    linear = states @ F.T
+    u = np.zeros_like(linear)
+    y = u
+    t = 1.0
+    for n in range(iterations):
+        u_next = np.clip(y - step*(y @ H + linear), -limit, limit)
+        t_next = (1 + math.sqrt(1 + 4*t*t))/2
+        y = u_next + (t - 1)/t_next*(u_next - u)
+        u = u_next
+        t = t_next
+    for k in range(len(u)):
+        active = np.sign(u[k])*(np.abs(u[k]) >= limit*(1 - 1e-6))
+        for n in range(len(H)):
+            free = active == 0
+            u[k] = active*limit
+            if free.any():
+                u[k, free] = np.linalg.solve(H[np.ix_(free, free)], -linear[k, free] - H[np.ix_(free, ~free)] @ u[k, ~free])
+            gradient = H @ u[k] + linear[k]
+            update = np.where(free, np.sign(u[k])*(np.abs(u[k]) > limit), active*(active*gradient < 0))
+            if np.array_equal(update, active):
+                break
+            active = update
+    return u[:, 0]
+
+def run(controller, state):
+    ''' @brief          Runs the firmware controller on a state in the state vector units
+        @return         The duty cycle and whether the state was outside every region
+    '''
+    outside = controller.outside_count
+    controller.state_vect.write(state)
+    controller.run()
+    return controller.L.read(), controller.outside_count != outside
+
+def check(controller, H, F, limit, signs, count, rng):
+    ''' @brief          Compares the duty cycles of the table with the quadratic program at random states
+        @param count    The number of random states within the sampled range, and again beyond it
+        @return         The exit status, 1 if a duty cycle inside a region differs
+    '''
+    status = 0
+    T = lqr_gains.FIRMWARE_SCALE*signs
+    for name, reach in (('sampled range', 1.0), ('1.5x beyond', 1.5)):
+        states = rng.uniform(-reach, reach, (count, 4))*SAMPLE_RANGE
+        duty = closedloop.DUTY_PER_TORQUE*solve(H, F, limit, states)
+        errors = {False: [], True: []}
+        for state, expected in zip(states, duty):
+            value, outside = run(controller, state/T)
+            errors[outside].append(abs(value - max(-lqr_gains.DUTY_LIMIT, min(lqr_gains.DUTY_LIMIT, expected))))
+        print('{:<14}{:} states, largest duty cycle error {:.2g}% inside a region, {:.1%} outside every region{:}'.format(
+              name, count, max(errors[False], default=0), len(errors[True])/count,
+              ', largest error there {:.2g}%'.format(max(errors[True])) if errors[True] else ''))
+        if errors[False] and max(errors[False]) > DUTY_TOLERANCE:
+            print('FAIL: the table differs from the quadratic program inside a region')
+            status = 1
+    return status
+
+def simulate(control, x0, period, steps):
+    ''' @brief          Simulates the nonlinear model of one axis from an initial state
+        @param control  A function from the state in SI units to the duty cycle
+        @return         The largest ball position and overshoot in mm and the settling time,
+                        or None if the response does not settle
+    '''
+    state = np.array(x0, dtype=float)
+    positions = []
+    settle = 0
+    for n in range(steps):
+        duty = max(-lqr_gains.DUTY_LIMIT, min(lqr_gains.DUTY_LIMIT, control(state)))
+        state = observer_gains.step(state, duty/closedloop.DUTY_PER_TORQUE, period, substeps=1)
+        if not np.all(np.isfinite(state)) or abs(state[0]) > 1:
+            return max(abs(p) for p in positions)*1000, 0, None
+        positions.append(state[0])
+        if abs(state[0]) > lqr_gains.SETTLED[0] or abs(state[1]) > lqr_gains.SETTLED[1]:
+            settle = n + 1
+    overshoot = max(0, -min(p*math.copysign(1, x0[0] or x0[2]) for p in positions))
+    return max(abs(p) for p in positions)*1000, overshoot*1000, settle*period if settle < steps else None
+
+def main(argv):
+    ''' @brief      Generates, writes, and checks the explicit MPC tables
+        @param argv The command line arguments
+        @return     The exit status, 1 if a check failed
+    '''
+    parser = argparse.ArgumentParser(description='Generates and verifies the explicit model predictive control tables.')
+    parser.add_argument('--weights', type=lambda text: [float(value) for value in text.split(',')],
+                        default=list(MPC_WEIGHTS), help='qx,qtheta,qxd,qthetad,r')
+    parser.add_argument('--blocks', type=lambda text: [int(value) for value in text.split(',')],
+                        default=list(BLOCKS), help='control periods of every block of constant torque')
+    parser.add_argument('--period-us', type=int, default=lqr_gains.CONTROL_PERIOD_US, help='control period in microseconds')
+    parser.add_argument('--signs-x', type=lqr_gains.parse_signs, default=np.array(lqr_gains.SIGNS_X), help='signs of the x axis state elements')
+    parser.add_argument('--signs-y', type=lqr_gains.parse_signs, default=np.array(lqr_gains.SIGNS_Y), help='signs of the y axis state elements')
+    parser.add_argument('--samples', type=int, default=20000, help='number of sampled states that select the regions')
+    parser.add_argument('--output', default='mpc_table.txt', help='the table file to write')
+    parser.add_argument('--check', type=int, default=2000, help='number of random check states')
+    parser.add_argument('--seconds', type=float, default=3.0, help='length of the check simulations')
+    parser.add_argument('--seed', type=int, default=305, help='seed of the sampled and random check states')
+    args = parser.parse_args(argv[1:])
+
+    period = args.period_us/1000000
+    Ad, Bd = lqr_gains.discretize(*lqr_gains.linearize(), period)
+    limit = lqr_gains.DUTY_LIMIT/closedloop.DUTY_PER_TORQUE
+    H, F = prediction(Ad, Bd, args.weights, args.blocks)
+    rng = np.random.default_rng(args.seed)
+    regions = critical_regions(H, F, limit, rng.uniform(-1, 1, (args.samples, 4))*SAMPLE_RANGE)
+    tables = [to_firmware(regions, signs) for signs in (args.signs_x, args.signs_y)]
+    write_table(args.output, tables)
+    print('Wrote {:} regions with {:} inequalities per axis to {:}, horizon {:} ms in {:} blocks'.format(
+          len(regions), sum(len(r[1]) for r in tables[0]), args.output, sum(args.blocks)*args.period_us/1000, len(args.blocks)))
+    print('Share of the sampled states in the 5 most common regions: ' +
+          ', '.join('{:.1%}'.format(r[4]/args.samples) for r in regions[:5]))
+    unconstrained = -np.linalg.solve(H, F)[0]
+    print('Closed loop spectral radius of the unconstrained law {:.4f}'.format(
+          np.abs(np.linalg.eigvals(Ad + Bd @ unconstrained[np.newaxis])).max()))
+
+    controller = load(args.output)
+    status = check(controller, H, F, limit, args.signs_x, args.check, rng)
+
+    gains = []
+    for weights in (args.weights, lqr_gains.WEIGHTS):
+        gains.append(lqr_gains.lqr(Ad, Bd, np.diag(weights[:4])[np.newaxis], np.array([[[weights[4]]]]))[0, 0])
+    T = lqr_gains.FIRMWARE_SCALE*args.signs_x
+    controls = (('MPC table', lambda state: run(controller, state/T)[0]),
+                ('saturated LQR, same weights', lambda state: -closedloop.DUTY_PER_TORQUE*float(gains[0] @ state)),
+                ('saturated LQR, lqr_gains.WEIGHTS', lambda state: -closedloop.DUTY_PER_TORQUE*float(gains[1] @ state)))
+    steps = int(args.seconds/period)
+    improvement = 0
+    for x0 in INITIAL_STATES:
+        print('From x {:.0f} mm, x_dot {:.2f} m/s:'.format(x0[0]*1000, x0[2]))
+        results = []
+        for name, control in controls:
+            largest, overshoot, settle = simulate(control, x0, period, steps)
+            results.append(largest)
+            print('    {:<34}largest position {:6.1f} mm{:}, overshoot {:5.1f} mm, {:}'.format(
+                  name, largest, ' off the panel' if largest > PANEL_EDGE else '', overshoot,
+                  'settles in {:.2f} s'.format(settle) if settle is not None else 'does not settle'))
+            if control is controls[0][1] and settle is None:
+                print('FAIL: the MPC table does not settle')
+                status = 1
+        if results[0] > results[1] + 0.05:
+            print('FAIL: the MPC table lets the ball travel further than saturated LQR with the same weights')
+            status = 1
+        improvement = max(improvement, results[1] - results[0])
+    if improvement < MIN_IMPROVEMENT:
+        print('FAIL: the constraints do not change the control, the MPC table is saturated LQR with the same weights')
+        status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,223 @@
+'''@file        observer_gains.py
+   @brief       Computes and verifies the steady-state Kalman filters of observer.py.
+   @details     Discretizes the ball-on-plate model of lqr_gains.py at the control
+                period and converts it to the units of the state vectors, with the
+                duty cycle in percent as the input. Solves the filter Riccati
+                equation for the given process and measurement noise and combines
+                the prediction and the correction of each tick into the 4x8 matrix
+                used by observer.Observer. Ticks without a panel sample use the
+                correction of the angle and angular velocity alone, with the same
+                prior covariance. The matrices of both axes are written to
+                observer_gains.txt, the file read by observer.load_observers() when
+                OBSERVER and FUSED_CONTROL are set in main.py. Copy the file to the
+                Nucleo next to main.py.
+
+                The written file is then checked with observer.Observer itself.
+                The nonlinear model is simulated under the LQR gains of
+                lqr_gains.py, once controlled from the raw measurements and
+                finite-difference velocity like Task_Control and once from the
+                observer. The measurements are noisy and quantized, the IMU angle
+                only updates at 100 Hz, and panel samples drop out at random and
+                in one longer burst. The RMS error of every state vector element is
+                printed for both. Exits with status 1 if the observer does not
+                estimate the ball velocity better than the finite difference or
+                the ball leaves the panel. Run from the BallBalancingPlatform
+                directory with
+                python host/observer_gains.py [--panel-std 1.0] [--output observer_gains.txt]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import numpy as np
+import lqr_gains
+import shares
+import closedloop
+import observer
+
+## @brief     Rows of the state that the panel and the IMU measure: position, angle, angular velocity
+MEASURED = (0, 1, 3)
+
+## @brief     Half the width of the panel in mm, beyond which the ball has left it
+PANEL_EDGE = 88
+
+def firmware_model(period, signs):
+    ''' @brief          The discrete model in state vector units with the duty cycle as input
+        @param period   The control period in seconds
+        @param signs    The signs of the state elements of the axis
+        @return         Ad (4x4), Bd (4x1), and the diagonal matrix T from SI to state vector units
+    '''
+    Ad, Bd = lqr_gains.discretize(*lqr_gains.linearize(), period)
+    T = np.diag(signs/lqr_gains.FIRMWARE_SCALE)
+    return T @ Ad @ np.linalg.inv(T), T @ Bd/closedloop.DUTY_PER_TORQUE, T
+
+def observer_matrices(Ad, Bd, T, args):
+    ''' @brief      Solves the steady-state Kalman filter and builds the update matrices
+        @return     The 4x8 matrices with and without a panel sample
+    '''
+    period = args.period_us/1000000
+    # Process noise enters as random ball and platform accelerations over one period
+    Q = T @ np.diag([0, 0, (args.accel_std*period)**2, (args.alpha_std*period)**2]) @ T
+    R = np.diag([args.panel_std**2, args.angle_std**2, args.rate_std**2])
+    C = np.eye(4)[list(MEASURED)]
+    P = lqr_gains.dare(Ad.T, C.T, Q[np.newaxis], R[np.newaxis])[0]
+    # P is the covariance of the prediction, from which the correction gains follow
+    matrices = []
+    for rows in ((0, 1, 2), (1, 2)):
+        C_k = C[list(rows)]
+        R_k = R[np.ix_(rows, rows)]
+        M = P @ C_k.T @ np.linalg.inv(C_k @ P @ C_k.T + R_k)
+        correct = np.eye(4) - M @ C_k
+        H = np.zeros((4, 8))
+        H[:, 0:4] = correct @ Ad
+        H[:, 4:5] = correct @ Bd
+        for column, row in enumerate(rows):
+            H[:, 5 + row] = M[:, column]
+        matrices.append(H)
+    return matrices
+
+def write_gains(filename, matrices):
+    ''' @brief          Writes the matrices in the format read by observer.load_observers()
+        @param matrices The four 4x8 matrices, x axis with and without a panel sample, then y axis
+    '''
+    with open(filename, 'w') as f:
+        for H in matrices:
+            for row in H:
+                f.write(','.join('{:.9g}'.format(value) for value in row) + '\n')
+
+def load(filename):
+    ''' @brief      Reads the matrices back with the code that runs on the Nucleo
+        @return     The observer of the x axis and its state vector
+    '''
+    state_vect = shares.StateVector(8)
+    directory, name = os.path.split(os.path.abspath(filename))
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        observers = observer.load_observers(state_vect.sub(0, 4), state_vect.sub(4, 4), name)
+    finally:
+        os.chdir(cwd)
+    return observers[0], observers[0].state_vect
+
+def step(state, torque, period, substeps=5):
+    ''' @brief      Integrates the nonlinear model over one period with the Runge-Kutta method
+    '''
+    h = period/substeps
+    for n in range(substeps):
+        k1 = lqr_gains.dynamics(state, torque)
+        k2 = lqr_gains.dynamics(state + h/2*k1, torque)
+        k3 = lqr_gains.dynamics(state + h/2*k2, torque)
+        k4 = lqr_gains.dynamics(state + h*k3, torque)
+        state = state + h/6*(k1 + 2*k2 + 2*k3 + k4)
+    return state
+
+def simulate(args, T, gain, use_observer, rng):
+    ''' @brief              Simulates the x axis controlled from the raw measurements or the observer
+        @param T            The diagonal matrix from SI to state vector units
+        @param gain         The controller gain vector in state vector units
+        @param use_observer True to control from the observer estimate
+        @return             The RMS error of every state vector element, the largest ball
+                            position in mm, and the number of ticks without a panel sample
+    '''
+    period = args.period_us/1000000
+    steps = int(args.seconds/period)
+    burst = range(steps//2, steps//2 + args.burst)
+    obs, obs_vect = load(args.output)
+    state = np.array([args.x0_mm/1000, 0, 0, 0])
+    estimate = np.zeros(4)
+    previous = None
+    angle = 0
+    duty = 0
+    squared = np.zeros(4)
+    largest = 0
+    missing = 0
+    for n in range(steps):
+        true = T @ state
+        if n % (10000//args.period_us) == 0:
+            # The BNO055 fusion outputs update at 100 Hz, in steps of 1/16 degree
+            angle = round((true[1] + rng.gauss(0, args.angle_std))*16)/16
+        rate = round((true[3] + rng.gauss(0, args.rate_std))*900)/900
+        detected = n not in burst and rng.random() >= args.dropout
+        position = true[0] + rng.gauss(0, args.panel_std) if detected else 0
+        missing += not detected
+
+        obs.update(duty, position, angle, rate, detected)
+        if use_observer:
+            estimate = obs_vect.view().copy()
+        else:
+            estimate[0] = position
+            estimate[1] = angle
+            if previous is not None:
+                estimate[2] = (position - previous)/args.period_us
+            estimate[3] = rate
+            previous = position
+        squared += (estimate - true)**2
+        largest = max(largest, abs(true[0]))
+
+        duty = -closedloop.DUTY_PER_TORQUE*float(gain @ estimate)
+        duty = max(-lqr_gains.DUTY_LIMIT, min(lqr_gains.DUTY_LIMIT, duty))
+        state = step(state, duty/closedloop.DUTY_PER_TORQUE, period)
+    return np.sqrt(squared/steps), largest, missing
+
+def main(argv):
+    ''' @brief      Computes, writes, and checks the observer matrices
+        @param argv The command line arguments
+        @return     The exit status, 1 if a check failed
+    '''
+    parser = argparse.ArgumentParser(description='Computes and verifies the steady-state Kalman filters.')
+    parser.add_argument('--panel-std', type=float, default=1.0, help='panel position noise in mm')
+    parser.add_argument('--angle-std', type=float, default=0.1, help='IMU angle noise in degrees')
+    parser.add_argument('--rate-std', type=float, default=0.01, help='IMU angular velocity noise in rad/s')
+    parser.add_argument('--accel-std', type=float, default=1.0, help='process noise on the ball acceleration in m/s^2')
+    parser.add_argument('--alpha-std', type=float, default=20.0, help='process noise on the platform angular acceleration in rad/s^2')
+    parser.add_argument('--period-us', type=int, default=lqr_gains.CONTROL_PERIOD_US, help='control period in microseconds')
+    parser.add_argument('--signs-x', type=lqr_gains.parse_signs, default=np.array(lqr_gains.SIGNS_X),
+                        help='signs of the x axis state elements')
+    parser.add_argument('--signs-y', type=lqr_gains.parse_signs, default=np.array(lqr_gains.SIGNS_Y),
+                        help='signs of the y axis state elements')
+    parser.add_argument('--output', default='observer_gains.txt', help='the file to write')
+    parser.add_argument('--seconds', type=float, default=3.0, help='length of the check simulation')
+    parser.add_argument('--x0-mm', type=float, default=50.0, help='initial ball offset of the check simulation')
+    parser.add_argument('--dropout', type=float, default=0.05, help='probability of a missing panel sample')
+    parser.add_argument('--burst', type=int, default=20, help='ticks of the longer panel dropout')
+    parser.add_argument('--seed', type=int, default=305, help='seed of the simulated noise')
+    args = parser.parse_args(argv[1:])
+
+    period = args.period_us/1000000
+    matrices = []
+    for signs in (args.signs_x, args.signs_y):
+        Ad, Bd, T = firmware_model(period, signs)
+        matrices += observer_matrices(Ad, Bd, T, args)
+    write_gains(args.output, matrices)
+    print('Wrote the observer matrices of both axes to {:}'.format(args.output))
+    print('Observer poles: ' + ', '.join('{:.4f}'.format(pole) for pole in np.linalg.eigvals(matrices[0][:, 0:4])))
+
+    Ad, Bd, T = firmware_model(period, args.signs_x)
+    K = lqr_gains.lqr(*lqr_gains.discretize(*lqr_gains.linearize(), period),
+                      np.diag(lqr_gains.WEIGHTS[:4])[np.newaxis], np.array([[[lqr_gains.WEIGHTS[4]]]]))
+    gain = K[0, 0]*lqr_gains.FIRMWARE_SCALE*args.signs_x
+    results = {}
+    print('RMS error of [position mm, angle deg, velocity mm/us, angular velocity rad/s]')
+    for name, use_observer in (('raw', False), ('observer', True)):
+        rms, largest, missing = simulate(args, T, gain, use_observer, random.Random(args.seed))
+        results[name] = (rms, largest)
+        print('    {:<9}{:}, largest ball position {:.1f} mm, {:} ticks without a panel sample'.format(
+              name, ', '.join('{:.3g}'.format(value) for value in rms), largest, missing))
+    status = 0
+    if results['observer'][0][2] >= results['raw'][0][2]:
+        print('FAIL: the observer does not improve the velocity estimate')
+        status = 1
+    if results['observer'][1] > PANEL_EDGE:
+        print('FAIL: the ball left the panel under observer feedback')
+        status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,156 @@
+'''@file        panel_noise_bench.py
+   @brief       Measures the noise and the scan time of the oversampled touch panel readings.
+   @details     First checks touch_pan.BurstADC against the median and trimmed mean
+                computed by NumPy for random bursts of every length used below.
+
+                Then scans a ball at rest on a simulated panel whose ADC samples
+                carry Gaussian noise and occasional spikes, with every sample count
+                and filter in turn, and reads the samples either in a loop or with
+                ADC.read_timed() paced by a timer. For every setting the table shows
+                the RMS and the largest error of the calibrated x position, the RMS
+                noise of the velocity Task_Panel and Task_Control compute by finite
+                difference over the 2 ms control period, and the modeled time of a
+                full scan on the Nucleo, on the virtual clock with the peripheral and
+                interpreted code costs of host/sim.py. Exits with status 1 if a
+                filter differs from NumPy. Run from the BallBalancingPlatform
+                directory with
+                python host/panel_noise_bench.py [--noise 6] [--spike-rate 0.02] [--spike 400] [--scans 2000]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import array
+import random
+import numpy as np
+import utime
+import pyb
+import sim
+import touch_pan
+
+## @brief     Sample counts of the x and y readings compared in the table
+SAMPLES = (1, 3, 5, 9, 15)
+
+## @brief     The x calibration coefficient, in mm per count, of host/fixedpoint_check.py
+MM_PER_COUNT = 0.0489
+
+## @brief     The control period in seconds, over which the velocity is a finite difference
+PERIOD = 0.002
+
+## @brief     The sample rate of ADC.read_timed() in the table, in Hz
+TIMED_FREQ = 200000
+
+class NoisyADC:
+    ''' @brief  Supplies ADC samples of a fixed count with Gaussian noise and random spikes
+    '''
+    def __init__(self, count, args, rng):
+        self.count = count
+        self.args = args
+        self.rng = rng
+
+    def __call__(self):
+        value = self.count + self.rng.gauss(0, self.args.noise)
+        if self.rng.random() < self.args.spike_rate:
+            value += self.rng.choice((-1, 1))*self.args.spike
+        return min(4095, max(0, int(round(value))))
+
+def check_filters(rng):
+    ''' @brief      Compares BurstADC with the NumPy median and trimmed mean
+        @return     The number of differences
+    '''
+    failures = 0
+    for samples in SAMPLES + (2, 4, 16):
+        for sample_filter in (touch_pan.MEDIAN, touch_pan.TRIMMED_MEAN):
+            burst = touch_pan.BurstADC(pyb.ADC('A0'), samples, sample_filter)
+            for n in range(200):
+                values = [rng.randint(0, 4095) for k in range(samples)]
+                pyb.ADC.values['A0'] = iter(values).__next__
+                if sample_filter == touch_pan.MEDIAN:
+                    expected = np.median(values)
+                else:
+                    trim = samples//4
+                    expected = np.mean(sorted(values)[trim:samples - trim])
+                result = burst.read()
+                # The filters round halves up to a whole count
+                if result != int(np.floor(expected + 0.5)):
+                    failures += 1
+                    if failures <= 5:
+                        print('MISMATCH {:} samples, filter {:}: {:} gives {:}, expected {:}'.format(
+                              samples, sample_filter, values, result, expected))
+    print('Filters checked against NumPy, {:} differences'.format(failures))
+    return failures
+
+def charge(cls, name, cost):
+    ''' @brief  Charges the modeled interpreted cost of a method to the virtual clock, like host/sim.py
+    '''
+    method = getattr(cls, name)
+    def charged(obj, *args):
+        utime.spend_us(cost(obj) if callable(cost) else cost)
+        return method(obj, *args)
+    setattr(cls, name, charged)
+
+def measure(samples, sample_filter, timer, args, rng):
+    ''' @brief      Scans the ball at rest with one setting
+        @return     The RMS and largest position error in mm, the RMS velocity noise
+                    in mm/s, and the mean time of a scan in us
+    '''
+    x_count = 2100
+    pyb.ADC.values['A0'] = NoisyADC(x_count, args, rng)
+    pyb.ADC.values['A7'] = NoisyADC(2600, args, rng)
+    panel = touch_pan.Touch_Pan(pyb.Pin.cpu.A7, pyb.Pin.cpu.A1, pyb.Pin.cpu.A6, pyb.Pin.cpu.A0,
+                                fast=True, samples=(samples, samples, 1), sample_filter=sample_filter, timer=timer)
+    counts = array.array('i', 3*[0])
+    errors = np.zeros(args.scans)
+    start = utime.ticks_us()
+    for n in range(args.scans):
+        panel.scan_counts_into(counts)
+        errors[n] = (counts[0] - x_count)*MM_PER_COUNT
+    scan_us = utime.ticks_diff(utime.ticks_us(), start)/args.scans
+    velocity = np.diff(errors)/PERIOD
+    return np.sqrt(np.mean(errors**2)), np.abs(errors).max(), np.sqrt(np.mean(velocity**2)), scan_us
+
+def main(argv):
+    ''' @brief      Checks the filters and prints the noise and scan time of every setting
+        @param argv The command line arguments
+        @return     The exit status, 1 if a filter differs from NumPy
+    '''
+    parser = argparse.ArgumentParser(description='Measures the noise and scan time of the oversampled panel readings.')
+    parser.add_argument('--noise', type=float, default=6.0, help='standard deviation of the ADC noise in counts')
+    parser.add_argument('--spike-rate', type=float, default=0.02, help='fraction of samples with a spike')
+    parser.add_argument('--spike', type=float, default=400.0, help='size of a spike in counts')
+    parser.add_argument('--scans', type=int, default=2000, help='scans per setting')
+    parser.add_argument('--seed', type=int, default=305, help='seed of the noise')
+    args = parser.parse_args(argv[1:])
+
+    utime.use_virtual_clock()
+    rng = random.Random(args.seed)
+    failures = check_filters(rng)
+
+    pyb.COSTS.update(sim.NUCLEO_COSTS)
+    for cls, name, cost in sim.TASK_COSTS:
+        if cls in (touch_pan.Touch_Pan, touch_pan.BurstADC) and name in ('scan_counts_into', 'read'):
+            charge(cls, name, cost)
+    timer = pyb.Timer(7, freq=TIMED_FREQ)
+    print('Ball at rest, ADC noise {:} counts RMS, {:.0%} of samples with {:.0f} count spikes, {:} scans per setting'.format(
+          args.noise, args.spike_rate, args.spike, args.scans))
+    print('{:<8}{:<14}{:<14}{:>14}{:>14}{:>18}{:>12}'.format(
+          'samples', 'filter', 'reads', 'x RMS [mm]', 'x max [mm]', 'velocity [mm/s]', 'scan [us]'))
+    for samples in SAMPLES:
+        for filter_name, sample_filter in (('median', touch_pan.MEDIAN), ('trimmed mean', touch_pan.TRIMMED_MEAN)):
+            for reads, burst_timer in (('loop', None), ('{:} kHz'.format(TIMED_FREQ//1000), timer)):
+                if samples == 1 and (sample_filter != touch_pan.MEDIAN or burst_timer is not None):
+                    continue
+                rms, largest, velocity, scan_us = measure(samples, sample_filter, burst_timer, args, rng)
+                print('{:<8}{:<14}{:<14}{:>14.3f}{:>14.2f}{:>18.0f}{:>12.0f}'.format(
+                      samples, filter_name if samples > 1 else '-', reads if samples > 1 else 'single read',
+                      rms, largest, velocity, scan_us))
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,209 @@
+'''@file        panel_scan_bench.py
+   @brief       Checks the fast touch panel scans against the normal scan and compares their time.
+   @details     Reads a simulated resistive panel with the scans of touch_pan.py.
+                The panel only gives a position reading when the pins are driven
+                the right way for the scan: for x, x_p high and x_m low with y_m
+                read by its ADC and y_p floating, for y, y_p high and y_m low with
+                x_p read and x_m floating, and for z, y_p high and x_m low with x_p
+                read and y_m floating. Any other drive reads as 4095, so a pin left
+                in the wrong mode shows up as a difference. Both scans of
+                Touch_Pan(fast=True) and Touch_Pan(fast=False) must give the same
+                counts and positions for the same ball positions, with and without
+                contact. The contact-first scan without debouncing must give the
+                same positions and contact flags, and the same counts while the ball
+                is on the panel. Its debouncing is checked on a fixed sequence of
+                contact and no contact.
+
+                The scans are then timed on the virtual clock with the peripheral
+                costs of host/sim.py, and the host time of each scan on CPython is
+                printed as a measure of the interpreted work. Touch_Pan.scan_time_us(),
+                the measurement printed by the 't' command of the user interface,
+                must give the time of the full fast scan on a contact-first panel
+                without a ball and leave its contact state alone. Exits with status 1
+                if the scans differ, the debouncing is wrong, or scan_time_us() is.
+                Run from the BallBalancingPlatform directory with
+                python host/panel_scan_bench.py [scans]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import array
+import random
+import time
+import utime
+import pyb
+import sim
+import touch_pan
+
+## @brief     The panel pins of main.py, x_p, x_m, y_p, y_m
+PINS = ('A7', 'A1', 'A6', 'A0')
+
+## @brief     The count read when the pins are not driven the way any scan drives them
+INVALID = 4095
+
+## @brief     Contact in successive scans of the debounce check, and the z_ADC_flag expected
+#             with press_scans and release_scans of 2
+DEBOUNCE = ((0, 0), (1, 0), (0, 0), (1, 0), (1, 1), (1, 1), (0, 1), (1, 1), (1, 1), (0, 1), (0, 0), (0, 0))
+
+class Panel:
+    ''' @brief  A resistive panel whose ADC readings follow the drive of its pins
+    '''
+    def __init__(self):
+        self.x = 2048
+        self.y = 2048
+        self.contact = True
+        pyb.ADC.values['A0'] = self.read_y_m
+        pyb.ADC.values['A7'] = self.read_x_p
+
+    def drive(self, name):
+        ''' @brief      Returns 'high' or 'low' for a push-pull output, or the mode of an input
+        '''
+        mode, value = pyb.Pin.pins[name]
+        if mode == pyb.Pin.OUT_PP:
+            return 'high' if value else 'low'
+        return 'analog' if mode == pyb.Pin.ANALOG else 'input'
+
+    def state(self):
+        return tuple(self.drive(name) for name in PINS)
+
+    def read_y_m(self):
+        if self.state() == ('high', 'low', 'input', 'analog'):
+            return self.x if self.contact else 0
+        return INVALID
+
+    def read_x_p(self):
+        state = self.state()
+        if state == ('analog', 'input', 'high', 'low'):
+            return self.y if self.contact else 0
+        if state == ('analog', 'low', 'high', 'input'):
+            return 2600 if self.contact else 90
+        return INVALID
+
+def make_panel(fast, contact_first=False, press_scans=1, release_scans=1):
+    panel = touch_pan.Touch_Pan(pyb.Pin.cpu.A7, pyb.Pin.cpu.A1, pyb.Pin.cpu.A6, pyb.Pin.cpu.A0, fast=fast,
+                                contact_first=contact_first, press_scans=press_scans, release_scans=release_scans)
+    for n, value in enumerate((0.0489, 0.0004, -0.0003, 0.0303, -99.7, -61.2)):
+        panel.beta[n] = value
+    panel.calibrate_flag = 1
+    return panel
+
+def scan(panel):
+    ''' @brief      Scans with get_coords() and scan_counts_into()
+        @return     The position, the counts, and the contact flag of both
+    '''
+    position = panel.get_coords()
+    flag = panel.z_ADC_flag
+    counts = array.array('i', 3*[0])
+    panel.scan_counts_into(counts)
+    return position, (panel.x_ADC, panel.y_ADC, panel.z_ADC), flag, list(counts), panel.z_ADC_flag
+
+def check(rng, count):
+    ''' @brief      Compares both scans at random ball positions
+        @return     The number of differences
+    '''
+    model = Panel()
+    panels = (make_panel(False), make_panel(True), make_panel(True, True))
+    failures = 0
+    for n in range(count):
+        model.x = rng.randint(150, 3950)
+        model.y = rng.randint(450, 3750)
+        model.contact = rng.random() >= 0.2
+        normal, fast, first = [scan(panel) for panel in panels]
+        # Without contact the contact-first scan keeps the previous x and y counts
+        same = (first[0] == normal[0] and first[2] == normal[2] and first[4] == normal[4]
+                and first[3][2] == normal[3][2] and (first[3] == normal[3] or not model.contact))
+        if normal != fast or not same or INVALID in normal[3]:
+            failures += 1
+            if failures <= 5:
+                print('MISMATCH at x {:}, y {:}, contact {:}: normal {:}, fast {:}, contact-first {:}'.format(
+                      model.x, model.y, model.contact, normal, fast, first))
+    print('{:} scans compared, {:} differences'.format(count, failures))
+    return failures
+
+def check_debounce():
+    ''' @brief      Runs the contact-first scan through DEBOUNCE
+        @return     The number of wrong contact flags or counts
+    '''
+    model = Panel()
+    panel = make_panel(True, True, 2, 2)
+    counts = array.array('i', 3*[0])
+    failures = 0
+    for n, (contact, expected) in enumerate(DEBOUNCE):
+        model.contact = contact == 1
+        model.x = 1000 + n
+        panel.scan_counts_into(counts)
+        # x is only scanned while the contact counts and is not being released
+        scanned = panel.contact_state == touch_pan.TOUCHING
+        if panel.z_ADC_flag != expected or (counts[0] == model.x) != scanned:
+            failures += 1
+            print('DEBOUNCE scan {:}: contact {:}, z_ADC_flag {:} expected {:}, x count {:}'.format(
+                  n, contact, panel.z_ADC_flag, expected, counts[0]))
+    print('Debounce sequence of {:} scans, {:} wrong'.format(len(DEBOUNCE), failures))
+    return failures
+
+def time_scan(panel, scans):
+    ''' @brief      Times scan_counts_into() on the virtual clock
+        @return     The mean time of one scan in us
+    '''
+    counts = array.array('i', 3*[0])
+    start = utime.ticks_us()
+    for n in range(scans):
+        panel.scan_counts_into(counts)
+    return utime.ticks_diff(utime.ticks_us(), start)/scans
+
+def check_scan_time(model, fast_us):
+    ''' @brief          Checks scan_time_us() on a contact-first panel without a ball
+        @param fast_us  The time of the full fast scan
+        @return         The number of failures, 0 or 1
+    '''
+    model.contact = False
+    panel = make_panel(True, True, 2, 2)
+    counts = array.array('i', 3*[0])
+    panel.scan_counts_into(counts)
+    state = (panel.contact_state, panel._debounce, panel.z_ADC_flag)
+    scan_us = panel.scan_time_us()
+    print('scan_time_us() of a contact-first panel without a ball {:.0f} us, full fast scan {:.0f} us'.format(scan_us, fast_us))
+    if abs(scan_us - fast_us) > 0.5 or (panel.contact_state, panel._debounce, panel.z_ADC_flag) != state:
+        print('FAIL: scan_time_us() does not time the full scan or changes the contact state')
+        return 1
+    return 0
+
+def main(argv):
+    ''' @brief      Runs the equivalence check and the timing
+        @param argv The command line arguments
+        @return     The exit status, 1 if the scans differ, the debouncing is wrong, or
+                    scan_time_us() is
+    '''
+    scans = int(argv[1]) if len(argv) > 1 else 1000
+    utime.use_virtual_clock()
+    failures = check(random.Random(305), scans)
+    failures += check_debounce()
+
+    pyb.COSTS.update(sim.NUCLEO_COSTS)
+    model = Panel()
+    print('Time of one scan{:>44}{:>12}'.format('peripheral calls', 'host'))
+    times = {}
+    for name, contact, args in (('normal', True, (False,)),
+                                ('fast', True, (True,)),
+                                ('contact-first, ball on the panel', True, (True, True)),
+                                ('contact-first, no ball', False, (True, True))):
+        model.contact = contact
+        panel = make_panel(*args)
+        times[name] = time_scan(panel, scans)
+        counts = array.array('i', 3*[0])
+        start = time.perf_counter()
+        for n in range(scans):
+            panel.scan_counts_into(counts)
+        host = (time.perf_counter() - start)/scans*1e6
+        print('    {:<40}{:>12.0f} us{:>9.1f} us'.format(name, times[name], host))
+    failures += check_scan_time(model, times['fast'])
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
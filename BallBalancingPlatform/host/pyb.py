@@ -0,0 +1,324 @@
+'''@file        pyb.py
+   @brief       Host stand-in for the parts of the MicroPython pyb module used by the term project.
+   @details     Provides Pin, ADC, I2C, Timer, ExtInt and USB_VCP classes that run
+                on CPython. Peripheral values can be set from a host script, for
+                example ADC.values or I2C.regs, and timer callbacks fire at their
+                programmed rate while the program sleeps in utime, or when fire()
+                is called directly. Every peripheral operation charges its cost
+                from COSTS to the utime virtual clock, which is how the simulator
+                models the time spent in peripheral calls on the Nucleo. Also
+                runs on the MicroPython unix port, without the virtual clock.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import utime
+
+## @brief     Modeled cost, in microseconds, of each peripheral operation
+#  @details   Charged with utime.spend_us(), which only has an effect on the virtual
+#             clock. All zero by default; host/sim.py fills in costs for the Nucleo.
+COSTS = {'Pin': 0,
+         'Pin.init': 0,
+         'Pin.value': 0,
+         'ADC': 0,
+         'ADC.read': 0,
+         'ADC.read_timed': 0,
+         'I2C.transfer': 0,
+         'I2C.byte': 0,
+         'pulse_width_percent': 0}
+
+try:
+    _spend_us = utime.spend_us
+except AttributeError:
+    # The MicroPython unix port has its own utime without a virtual clock
+    def _spend_us(us):
+        pass
+
+def _spend(operation):
+    _spend_us(COSTS[operation])
+
+class _PinNames:
+    ''' @brief  Returns the attribute name for any pin name, e.g. Pin.cpu.A15
+    '''
+    def __getattr__(self, name):
+        return name
+
+class Pin:
+    ''' @brief  Host stand-in for pyb.Pin
+        @details Like on the board, every Pin object and ADC of a pin shares its mode
+                 and output level, which are kept in Pin.pins by pin name.
+    '''
+    IN = 0
+    OUT_PP = 1
+    OUT_OD = 17
+    ANALOG = 3
+    PULL_NONE = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+    cpu = _PinNames()
+    board = _PinNames()
+    ## @brief  Mode and output level of every pin, [mode, value], keyed by pin name
+    pins = {}
+
+    def __init__(self, pin_id, mode=IN, pull=PULL_NONE):
+        if isinstance(pin_id, Pin):
+            pin_id = pin_id.pin_id
+        self.pin_id = pin_id
+        self._state = Pin.pins.setdefault(pin_id, [mode, 0])
+        self._state[0] = mode
+        self.pull = pull
+        _spend('Pin')
+
+    @property
+    def mode(self):
+        return self._state[0]
+
+    def init(self, mode=IN, pull=PULL_NONE):
+        self._state[0] = mode
+        self.pull = pull
+        _spend('Pin.init')
+
+    def high(self):
+        self._state[1] = 1
+        _spend('Pin.value')
+
+    def low(self):
+        self._state[1] = 0
+        _spend('Pin.value')
+
+    def value(self, value=None):
+        _spend('Pin.value')
+        if value is None:
+            return self._state[1]
+        self._state[1] = 1 if value else 0
+
+class ADC:
+    ''' @brief  Host stand-in for pyb.ADC
+        @details The 12-bit value returned by read() is looked up in ADC.values by
+                 pin name, so a host script can set what each pin reads. A value
+                 may also be a function taking no arguments, called on every read.
+    '''
+    ## @brief  Values read by ADC objects, keyed by pin name
+    values = {}
+
+    def __init__(self, pin):
+        if isinstance(pin, Pin):
+            pin = pin.pin_id
+        self.pin_id = pin
+        Pin.pins.setdefault(pin, [Pin.ANALOG, 0])[0] = Pin.ANALOG
+        _spend('ADC')
+
+    def read(self):
+        _spend('ADC.read')
+        value = ADC.values.get(self.pin_id, 0)
+        if callable(value):
+            return value()
+        return value
+
+    def read_timed(self, buf, timer):
+        ''' @brief  Fills buf with one sample per period of the timer, which takes len(buf) periods
+        '''
+        _spend('ADC.read_timed')
+        for n in range(len(buf)):
+            value = ADC.values.get(self.pin_id, 0)
+            buf[n] = value() if callable(value) else value
+            _spend_us(1000000//timer.freq())
+
+class I2C:
+    ''' @brief  Host stand-in for pyb.I2C
+        @details Register contents of every device are kept in regs, keyed by
+                 (device address, register address). I2C objects on the same bus
+                 share their registers, and buses holds them by bus number.
+    '''
+    MASTER = 0
+    SLAVE = 1
+    ## @brief  Register contents of each bus, keyed by bus number
+    buses = {}
+
+    def __init__(self, bus, mode=MASTER, baudrate=400000):
+        self.bus = bus
+        self.mode = mode
+        self.regs = I2C.buses.setdefault(bus, {})
+
+    def mem_read(self, data, addr, memaddr):
+        if isinstance(data, int):
+            data = bytearray(data)
+        _spend_us(COSTS['I2C.transfer'] + len(data)*COSTS['I2C.byte'])
+        for n in range(len(data)):
+            data[n] = self.regs.get((addr, memaddr + n), 0)
+        return data
+
+    def mem_write(self, data, addr, memaddr):
+        if isinstance(data, int):
+            data = bytes((data,))
+        _spend_us(COSTS['I2C.transfer'] + len(data)*COSTS['I2C.byte'])
+        for n in range(len(data)):
+            self.regs[(addr, memaddr + n)] = data[n]
+
+class TimerChannel:
+    ''' @brief  Host stand-in for a pyb.Timer channel
+    '''
+    def __init__(self, timer, channel, mode, pin):
+        self.timer = timer
+        self.channel_num = channel
+        self.mode = mode
+        self.pin = pin
+        self.percent = 0
+
+    def pulse_width_percent(self, value=None):
+        if value is None:
+            return self.percent
+        self.percent = value
+        _spend('pulse_width_percent')
+
+class Timer:
+    ''' @brief  Host stand-in for pyb.Timer
+        @details A timer with a callback fires it once for every elapsed period,
+                 checked whenever the host program sleeps in utime.
+    '''
+    PWM = 0
+    ENC_AB = 1
+    _active = []
+
+    def __init__(self, timer_num, freq=None, prescaler=None, period=None):
+        self.timer_num = timer_num
+        self._callback = None
+        self._freq = None
+        self._counter = 0
+        self.channels = {}
+        self.init(freq=freq, prescaler=prescaler, period=period)
+
+    def init(self, freq=None, prescaler=None, period=None):
+        self._freq = freq
+        self._period = period
+        if freq:
+            self._period_us = int(1000000 / freq)
+            self._next = utime.ticks_add(utime.ticks_us(), self._period_us)
+
+    def deinit(self):
+        self.callback(None)
+
+    def freq(self):
+        return self._freq
+
+    def counter(self, value=None):
+        if value is None:
+            return self._counter
+        self._counter = value
+
+    def channel(self, channel, mode=None, pin=None):
+        if mode is None:
+            return self.channels.get(channel)
+        self.channels[channel] = TimerChannel(self, channel, mode, pin)
+        return self.channels[channel]
+
+    def callback(self, function):
+        self._callback = function
+        if function is None:
+            if self in Timer._active:
+                Timer._active.remove(self)
+        elif self not in Timer._active:
+            self._next = utime.ticks_add(utime.ticks_us(), self._period_us)
+            Timer._active.append(self)
+
+    def fire(self):
+        ''' @brief  Calls the timer callback once. Host only.
+        '''
+        if self._callback is not None:
+            self._callback(self)
+
+    def service(self):
+        ''' @brief  Fires the callback once for every period elapsed since the last call. Host only.
+        '''
+        while utime.ticks_diff(utime.ticks_us(), self._next) >= 0:
+            self._next = utime.ticks_add(self._next, self._period_us)
+            self.fire()
+
+def _service_timers():
+    for timer in list(Timer._active):
+        timer.service()
+
+if hasattr(utime, 'add_idle_hook'):
+    utime.add_idle_hook(_service_timers)
+
+class ExtInt:
+    ''' @brief  Host stand-in for pyb.ExtInt
+    '''
+    IRQ_RISING = 0
+    IRQ_FALLING = 1
+    IRQ_RISING_FALLING = 2
+
+    def __init__(self, pin, mode, pull, callback):
+        self.pin = pin
+        self.mode = mode
+        self.pull = pull
+        self._callback = callback
+        self.enabled = True
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def swint(self):
+        ''' @brief  Triggers the callback as if the pin had changed
+        '''
+        if self.enabled:
+            self._callback(0)
+
+class USB_VCP:
+    ''' @brief  Host stand-in for pyb.USB_VCP
+        @details Characters typed by a host script are queued with feed(). Like
+                 on the board, every USB_VCP object refers to the same port.
+    '''
+    _rx = bytearray()
+    _event = None
+
+    def feed(self, data):
+        ''' @brief  Queues characters as if they were typed on the serial port. Host only.
+        '''
+        if isinstance(data, str):
+            data = data.encode()
+        self._rx.extend(data)
+        if USB_VCP._event is not None:
+            USB_VCP._event.set()
+
+    def stream(self):
+        ''' @brief  Returns an asyncio reader for the port, standing in for
+                    uasyncio.StreamReader(pyb.USB_VCP()). Host only.
+        '''
+        import asyncio
+        USB_VCP._event = asyncio.Event()
+        return _VCPStream(self)
+
+    def any(self):
+        return len(self._rx) > 0
+
+    def read(self, nbytes=None):
+        if nbytes is None:
+            nbytes = len(self._rx)
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data
+
+    def write(self, data):
+        return len(data)
+
+class _VCPStream:
+    ''' @brief  asyncio reader for the host USB_VCP stand-in
+    '''
+    def __init__(self, vcp):
+        self.vcp = vcp
+
+    async def read(self, nbytes=-1):
+        while not self.vcp.any():
+            self.vcp._event.clear()
+            await self.vcp._event.wait()
+        return self.vcp.read(None if nbytes < 0 else nbytes)
+
+def wfi():
+    ''' @brief  Stand-in for waiting for an interrupt
+    '''
+    utime.sleep_us(0)
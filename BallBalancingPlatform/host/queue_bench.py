@@ -0,0 +1,78 @@
+'''@file        queue_bench.py
+   @brief       Compares the list-based Queue with the ring buffer RingQueue.
+   @details     For several queue depths, fills each queue to that depth and then
+                times steady-state put() and get() pairs, the access pattern of a
+                telemetry producer and consumer. Also counts the memory allocated
+                during the same operations. Integers above 256 are boxed on CPython,
+                so the allocations of RingQueue come from the items themselves.
+                Run from the BallBalancingPlatform directory with
+                python host/queue_bench.py [operations]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import tracemalloc
+import shares
+
+def bench(make_queue, depth, operations):
+    ''' @brief              Times put() and get() pairs on a queue holding depth items
+        @details            Allocations are counted in a separate pass, since tracing
+                            them slows every operation down.
+        @param make_queue   A function that creates an empty queue
+        @param depth        The number of items kept in the queue
+        @param operations   The number of put() and get() pairs
+        @return             The time per pair in nanoseconds and the peak bytes allocated
+    '''
+    queue = make_queue()
+    for n in range(depth):
+        queue.put(n)
+    start = time.perf_counter_ns()
+    for n in range(operations):
+        queue.put(n)
+        queue.get()
+    elapsed = time.perf_counter_ns() - start
+
+    queue = make_queue()
+    for n in range(depth):
+        queue.put(n)
+    tracemalloc.start()
+    for n in range(1000):
+        queue.put(n)
+        queue.get()
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed/operations, allocated
+
+def main(argv):
+    ''' @brief      Prints the timing of both queues for several depths
+        @param argv The command line arguments
+    '''
+    operations = int(argv[1]) if len(argv) > 1 else 100000
+    print('{:>6}  {:>16}  {:>16}  {:>16}'.format('depth', 'Queue [ns]', "RingQueue [ns]", "RingQueue('l')"))
+    for depth in (10, 100, 1000, 10000):
+        results = [bench(lambda: shares.Queue(), depth, operations),
+                   bench(lambda: shares.RingQueue(depth + 1), depth, operations),
+                   bench(lambda: shares.RingQueue(depth + 1, 'l'), depth, operations)]
+        print('{:>6}  '.format(depth) + '  '.join('{:>8.0f} ({:>5} B)'.format(t, b) for t, b in results))
+
+    # Overflow behavior and counters
+    queue = shares.RingQueue(4, 'l', shares.DROP_NEWEST)
+    for n in range(6):
+        queue.put(n)
+    items = [queue.get() for n in range(queue.num_in())]
+    print('DROP_NEWEST kept {:}, dropped {:}, high water {:}'.format(items, queue.dropped, queue.high_water))
+    queue = shares.RingQueue(4, 'l', shares.DROP_OLDEST)
+    for n in range(6):
+        queue.put(n)
+    items = [queue.get() for n in range(queue.num_in())]
+    print('DROP_OLDEST kept {:}, dropped {:}, high water {:}'.format(items, queue.dropped, queue.high_water))
+
+if __name__ == '__main__':
+    main(sys.argv)
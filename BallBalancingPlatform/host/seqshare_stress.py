@@ -0,0 +1,127 @@
+'''@file        seqshare_stress.py
+   @brief       Stress test for torn reads of multi-field shared variables.
+   @details     Runs a foreground loop and, between randomly chosen bytecodes of
+                it, a simulated interrupt, much like an interrupt on the Nucleo
+                can fire between any two bytecodes. Every write stores the same
+                number in all four fields of a state vector, so a read that finds
+                different numbers in its fields is torn. Two cases are checked,
+                each with a plain list of four Share objects and with SeqShare:
+                an interrupt writer with a foreground reader, like a timer
+                callback updating the state vector, and a foreground writer with
+                an interrupt reader. The list of Shares is expected to tear and
+                SeqShare never should. Exits with status 1 if SeqShare tears.
+                Run from the BallBalancingPlatform directory with
+                python host/seqshare_stress.py [iterations] [seed]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import shares
+
+## @brief     Probability of an interrupt between two bytecodes of the foreground
+IRQ_PROBABILITY = 0.05
+
+class ShareList:
+    ''' @brief  A state vector made of four separate Share objects, as in main.py
+    '''
+    def __init__(self):
+        self.shares = [shares.Share(0), shares.Share(0), shares.Share(0), shares.Share(0)]
+
+    def write(self, values):
+        for n in range(4):
+            self.shares[n].write(values[n])
+
+    def read_into(self, out):
+        for n in range(4):
+            out[n] = self.shares[n].read()
+
+def interleave(foreground, isr, iterations, rng):
+    ''' @brief              Calls foreground() repeatedly with isr() injected between bytecodes
+        @details            The interrupt runs inside the trace function, which is
+                            itself never traced, so like a real interrupt it runs to
+                            completion without being interrupted by the foreground.
+        @param foreground   The foreground function, called with the iteration number
+        @param isr          The interrupt function, taking no arguments
+        @param iterations   How many times to call the foreground function
+        @param rng          The random number generator that decides when interrupts fire
+    '''
+    def trace_opcodes(frame, event, arg):
+        if event == 'opcode' and rng.random() < IRQ_PROBABILITY:
+            isr()
+        return trace_opcodes
+
+    def trace_calls(frame, event, arg):
+        frame.f_trace_opcodes = True
+        return trace_opcodes
+
+    sys.settrace(trace_calls)
+    try:
+        for n in range(iterations):
+            foreground(n)
+    finally:
+        sys.settrace(None)
+
+def isr_writer(share, iterations, rng):
+    ''' @brief  Counts torn foreground reads while an interrupt writes
+        @return The number of torn reads
+    '''
+    counter = [0]
+    out = [0, 0, 0, 0]
+    torn = [0]
+
+    def isr():
+        counter[0] += 1
+        value = counter[0]
+        share.write((value, value, value, value))
+
+    def foreground(n):
+        share.read_into(out)
+        if out[0] != out[1] or out[0] != out[2] or out[0] != out[3]:
+            torn[0] += 1
+
+    interleave(foreground, isr, iterations, rng)
+    return torn[0]
+
+def isr_reader(share, iterations, rng):
+    ''' @brief  Counts torn interrupt reads while the foreground writes
+        @return The number of torn reads
+    '''
+    out = [0, 0, 0, 0]
+    torn = [0]
+
+    def isr():
+        share.read_into(out)
+        if out[0] != out[1] or out[0] != out[2] or out[0] != out[3]:
+            torn[0] += 1
+
+    def foreground(n):
+        share.write((n, n, n, n))
+
+    interleave(foreground, isr, iterations, rng)
+    return torn[0]
+
+def main(argv):
+    ''' @brief      Runs every case and reports the torn reads
+        @param argv The command line arguments
+        @return     The exit status, 1 if SeqShare returned a torn read
+    '''
+    iterations = int(argv[1]) if len(argv) > 1 else 10000
+    seed = int(argv[2]) if len(argv) > 2 else 305
+    status = 0
+    for case in (isr_writer, isr_reader):
+        for name, make_share in (('Share list', ShareList), ('SeqShare', lambda: shares.SeqShare(4, 'l'))):
+            torn = case(make_share(), iterations, random.Random(seed))
+            print('{:<12}{:<12}{:>8} torn reads in {:} iterations'.format(case.__name__, name, torn, iterations))
+            if name == 'SeqShare' and torn:
+                status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,343 @@
+'''@file        sim.py
+   @brief       Deterministic simulation of the term project on a virtual clock.
+   @details     Runs the unmodified main.main() and Task classes on CPython with
+                the host stand-ins, but with utime following a virtual clock.
+                The clock does not move while host code runs. Instead, every
+                peripheral operation, task body, and printed character charges
+                its modeled cost on the Nucleo from NUCLEO_COSTS and TASK_COSTS,
+                and sleeping moves the clock straight to the next deadline. A
+                simulated run is therefore reproducible, runs faster than real
+                time, and starts close to the 2**30 tick wraparound by default so
+                that tick arithmetic errors show up early.
+
+                The touch panel sees a ball circling the center of the panel and
+                the keys given on the command line are typed into the user
+                interface, one every half second, starting with 'b' to balance.
+                At the end of the run the script prints, per scheduled task, the
+                start latency and run time and the number of missed deadlines,
+                followed by the age of the newest panel and IMU samples at every
+                motor duty cycle write, which is the sensor-to-actuator delay.
+                Run from the BallBalancingPlatform directory with
+                python host/sim.py [--mode tasks|timer|fused] [--seconds 5] [--keys b]
+                Thresholds given with --max-delay, on the panel and the IMU sample
+                age, and --max-missed make the script exit with status 1 when
+                exceeded, for use in CI.
+
+                The costs are estimates for the STM32L476 at 80 MHz and 400 kHz
+                I2C. Calibrate them against the 'p' profiler output of the board.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import builtins
+import math
+import utime
+import pyb
+import micropython
+import scheduler
+import profiler
+import timer_control
+import task_control
+import task_userinterface
+import task_panel
+import task_IMU
+import task_motor
+import closedloop
+import observer
+import touch_pan
+import BNO055
+import DRV8847
+import main
+
+## @brief     Modeled cost, in microseconds, of each peripheral operation on the Nucleo
+#  @details   Installed as pyb.COSTS. One I2C byte at 400 kHz takes 9 bit times.
+NUCLEO_COSTS = {'Pin': 12,
+                'Pin.init': 6,
+                'Pin.value': 2,
+                'ADC': 15,
+                'ADC.read': 8,
+                'ADC.read_timed': 10,
+                'I2C.transfer': 70,
+                'I2C.byte': 23,
+                'pulse_width_percent': 4}
+
+def _controller_cost(cost):
+    ''' @brief      Returns the cost of a controller run, which is small when the controller
+                    returns early because its state vector has not changed
+    '''
+    return lambda loop: cost if loop.state_vect.changed_since(loop.state_seq) else 8
+
+## @brief     Modeled cost, in microseconds, of the interpreted code of each method
+#  @details   Charged on entry to the method, on top of the peripheral costs of its body.
+#             A cost may also be a function of the object the method is called on.
+TASK_COSTS = [(scheduler.Scheduler, 'dispatch', 15),
+              (task_userinterface.Task_User, 'run', 40),
+              (task_panel.Task_Panel, 'run', 50),
+              (task_IMU.Task_IMU, 'run', 40),
+              (task_motor.Task_Motor, 'run', 40),
+              (task_control.Task_Control, 'tick', 90),
+              (task_control.Task_ControlFixed, 'tick', 60),
+              (timer_control.TimerControl, 'step', 60),
+              (closedloop.ClosedLoop, 'run', _controller_cost(180)),
+              (closedloop.MIMOLoop, 'run', _controller_cost(260)),
+              (closedloop.ExplicitMPC, 'run', _controller_cost(250)),
+              (closedloop.GainSchedule, 'duty_gain_into', 60),
+              (closedloop.FixedLoop, 'run', 50),
+              (observer.Observer, 'update', 90),
+              (touch_pan.Touch_Pan, 'get_coords', 120),
+              (touch_pan.Touch_Pan, 'scan_counts_into', 80),
+              (touch_pan.BurstADC, 'read', lambda burst: 10 + 6*burst.samples),
+              (BNO055.BNO055, 'euler_angle', 60),
+              (BNO055.BNO055, 'angular_vel', 60),
+              (BNO055.BNO055, 'euler_angle_into', 30),
+              (BNO055.BNO055, 'angular_vel_into', 30),
+              (BNO055.BNO055, 'euler_angle_raw_into', 20),
+              (BNO055.BNO055, 'angular_vel_raw_into', 20),
+              (DRV8847.Motor, 'set_duty', 10)]
+
+## @brief     Modeled cost, in microseconds, of a call to print
+PRINT_COST = 30
+
+## @brief     Modeled cost, in microseconds, of every printed character
+PRINT_CHAR_COST = 2
+
+## @brief     Microseconds between typed keys
+KEY_INTERVAL = 500000
+
+class Stats:
+    ''' @brief  Collects samples of a duration in microseconds
+    '''
+    def __init__(self):
+        self.samples = []
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def summary(self):
+        ''' @brief  Returns min, mean, 99th percentile, and max as a string
+        '''
+        if not self.samples:
+            return 'no samples'
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(0.99*len(ordered)))]
+        return 'n {:} min {:} mean {:.0f} p99 {:} max {:}'.format(
+            len(ordered), ordered[0], sum(ordered)/len(ordered), p99, ordered[-1])
+
+class Simulation:
+    ''' @brief  Instruments the stand-ins and the task classes and runs main.main()
+    '''
+    def __init__(self, seconds, keys, start_us, quiet):
+        ''' @brief          Prepares a simulation
+            @param seconds  Virtual seconds to run
+            @param keys     Command characters typed into the user interface
+            @param start_us Initial virtual time in microseconds
+            @param quiet    True to hide the output of the program
+        '''
+        self.seconds = seconds
+        self.keys = keys
+        self.start_us = start_us
+        self.quiet = quiet
+        self.next_key = 0
+        self.schedulers = []
+        self.controls = []
+        self.late = {}
+        self.run_time = {}
+        self.panel_time = None
+        self.IMU_time = None
+        self.panel_age = Stats()
+        self.IMU_age = Stats()
+        self.output_chars = 0
+
+    def _charge(self, cls, name, cost):
+        method = getattr(cls, name)
+        def charged(obj, *args, **kwargs):
+            utime.spend_us(cost(obj) if callable(cost) else cost)
+            return method(obj, *args, **kwargs)
+        setattr(cls, name, charged)
+
+    def _record_instances(self, cls, instances):
+        init = cls.__init__
+        def recording_init(obj, *args, **kwargs):
+            init(obj, *args, **kwargs)
+            instances.append(obj)
+        cls.__init__ = recording_init
+
+    def _timestamp(self, cls, name, attr):
+        method = getattr(cls, name)
+        sim = self
+        def timestamped(obj, *args, **kwargs):
+            setattr(sim, attr, utime.ticks_us())
+            return method(obj, *args, **kwargs)
+        setattr(cls, name, timestamped)
+
+    def instrument(self):
+        ''' @brief  Installs the cost model and the measurement hooks
+        '''
+        pyb.COSTS.update(NUCLEO_COSTS)
+        for cls, name, cost in TASK_COSTS:
+            self._charge(cls, name, cost)
+        self._record_instances(scheduler.Scheduler, self.schedulers)
+        self._record_instances(timer_control.TimerControl, self.controls)
+
+        sim = self
+        record = profiler.Profiler.record
+        def recording(prof, index, late, run_time, period):
+            name = prof.names[index]
+            sim.late.setdefault(name, Stats()).add(max(late, 0))
+            sim.run_time.setdefault(name, Stats()).add(run_time)
+            record(prof, index, late, run_time, period)
+        profiler.Profiler.record = recording
+
+        for name in ('get_coords', 'scan_counts_into'):
+            self._timestamp(touch_pan.Touch_Pan, name, 'panel_time')
+        for name in ('euler_angle', 'euler_angle_into', 'euler_angle_raw_into'):
+            self._timestamp(BNO055.BNO055, name, 'IMU_time')
+        set_duty = DRV8847.Motor.set_duty
+        def actuating(motor, duty):
+            set_duty(motor, duty)
+            now = utime.ticks_us()
+            if sim.panel_time is not None:
+                sim.panel_age.add(utime.ticks_diff(now, sim.panel_time))
+            if sim.IMU_time is not None:
+                sim.IMU_age.add(utime.ticks_diff(now, sim.IMU_time))
+        DRV8847.Motor.set_duty = actuating
+
+        # Ball circling the panel center once per second
+        pyb.ADC.values['A0'] = lambda: int(2048 + 800*math.cos(2*math.pi*self.elapsed()))
+        pyb.ADC.values['A7'] = lambda: int(2048 + 800*math.sin(2*math.pi*self.elapsed()))
+        # Platform tilted by one degree about x and y
+        regs = pyb.I2C.buses.setdefault(1, {})
+        regs[(0x28, 0x1C)] = 16
+        regs[(0x28, 0x1E)] = 16
+        utime.add_idle_hook(self._type_keys)
+
+    def elapsed(self):
+        ''' @brief  Returns the virtual time since the start of the run, in seconds
+        '''
+        return (utime.virtual_time_us() - self.start_us)/1000000
+
+    def _type_keys(self):
+        if self.next_key < len(self.keys) and self.elapsed()*1000000 >= (self.next_key + 1)*KEY_INTERVAL:
+            pyb.USB_VCP().feed(self.keys[self.next_key])
+            self.next_key += 1
+
+    def _print(self, *args, **kwargs):
+        text = kwargs.get('sep', ' ').join(str(arg) for arg in args) + kwargs.get('end', '\n')
+        self.output_chars += len(text)
+        if not self.quiet:
+            self._host_print(*args, **kwargs)
+        utime.spend_us(PRINT_COST + PRINT_CHAR_COST*len(text))
+
+    def run(self):
+        ''' @brief  Runs main.main() until the virtual time is up
+        '''
+        self._host_print = builtins.print
+        builtins.print = self._print
+        utime.use_virtual_clock(self.start_us, self.start_us + int(self.seconds*1000000))
+        try:
+            main.main()
+        finally:
+            builtins.print = self._host_print
+
+    def report(self):
+        ''' @brief      Prints the measured timing and returns the number of missed deadlines
+            @details    A task misses a deadline for every release that has not started when
+                        its following release is due, whether it runs late, the release is
+                        skipped, or the task is starved and never dispatched. Releases still
+                        waiting at the end of the run are counted with ScheduledTask.missed_at().
+        '''
+        print('Simulated {:.3f} s, {:} characters printed'.format(self.elapsed(), self.output_chars))
+        now = utime.ticks_us()
+        missed = 0
+        for sched in self.schedulers:
+            for entry in sorted(sched.task_list, key=lambda entry: entry.index):
+                name = sched.profiler.names[entry.index] if sched.profiler else str(entry.index)
+                task_missed = entry.missed_at(now)
+                print('{:}: period {:} us, runs {:}, missed deadlines {:}'.format(name, entry.period, entry.runs, task_missed))
+                print('    start latency [us]: {:}'.format(self.late.get(name, Stats()).summary()))
+                print('    run time [us]:      {:}'.format(self.run_time.get(name, Stats()).summary()))
+                missed += task_missed
+        for control in self.controls:
+            print('TimerControl: steps {:}, missed interrupts {:}, max interrupt latency {:} us'.format(
+                  control.runs, control.missed, control.max_latency))
+            missed += control.missed
+        print('Sensor-to-actuator delay [us]')
+        print('    panel sample age: {:}'.format(self.panel_age.summary()))
+        print('    IMU sample age:   {:}'.format(self.IMU_age.summary()))
+        return missed
+
+def main_sim(argv):
+    ''' @brief      Parses the command line, runs the simulation, and checks the thresholds
+        @param argv The command line arguments
+        @return     The exit status, 1 if a threshold was exceeded
+    '''
+    parser = argparse.ArgumentParser(description='Simulates the term project on a virtual clock.')
+    parser.add_argument('--mode', choices=('tasks', 'timer', 'fused'), default='tasks',
+                        help='separate tasks, TIMER_CONTROL, or FUSED_CONTROL')
+    parser.add_argument('--mimo', action='store_true', help='use the two-axis controller, MIMO_CONTROL')
+    parser.add_argument('--schedule', action='store_true',
+                        help='use the gain schedule in gain_table.txt, GAIN_SCHEDULE, see host/gain_table.py')
+    parser.add_argument('--observer', action='store_true',
+                        help='use the observers in observer_gains.txt with --mode fused, OBSERVER, see host/observer_gains.py')
+    parser.add_argument('--mpc', action='store_true',
+                        help='use the explicit MPC tables in mpc_table.txt, MPC_CONTROL, see host/mpc_table.py')
+    parser.add_argument('--fast-scan', action='store_true', help='use the fast touch panel scan, FAST_SCAN')
+    parser.add_argument('--contact-first', action='store_true',
+                        help='scan z first and skip x and y without contact, CONTACT_FIRST')
+    parser.add_argument('--panel-samples', type=lambda text: tuple(int(value) for value in text.split(',')), default=(1, 1, 1),
+                        help='ADC samples of the panel x, y, and z readings, PANEL_SAMPLES')
+    parser.add_argument('--panel-filter', choices=('median', 'trimmed-mean'), default='median',
+                        help='filter of the oversampled panel readings, PANEL_FILTER')
+    parser.add_argument('--panel-sample-freq', type=int, default=0,
+                        help='sample rate of the oversampled panel readings in Hz, 0 for a loop, PANEL_SAMPLE_FREQ')
+    parser.add_argument('--panel-settle-us', type=int, default=4,
+                        help='wait after switching the panel pins before each read in us, PANEL_SETTLE_US')
+    parser.add_argument('--fixed', action='store_true', help='use the fixed-point path with --mode fused, FIXED_POINT')
+    parser.add_argument('--seconds', type=float, default=5.0, help='virtual seconds to run')
+    parser.add_argument('--keys', default='b', help='commands typed every 0.5 s')
+    parser.add_argument('--start-us', type=int, default=utime.TICKS_PERIOD - 1000000,
+                        help='initial virtual time, by default 1 s before the ticks wrap')
+    parser.add_argument('--max-delay', type=int, help='largest allowed panel or IMU sample age at actuation, in us')
+    parser.add_argument('--max-missed', type=int, help='largest allowed number of missed deadlines')
+    parser.add_argument('--quiet', action='store_true', help='hide the output of the program')
+    args = parser.parse_args(argv[1:])
+
+    main.TIMER_CONTROL = args.mode == 'timer'
+    main.FUSED_CONTROL = args.mode == 'fused'
+    main.MIMO_CONTROL = args.mimo
+    main.GAIN_SCHEDULE = args.schedule
+    main.OBSERVER = args.observer
+    main.FIXED_POINT = args.fixed
+    main.MPC_CONTROL = args.mpc
+    main.FAST_SCAN = args.fast_scan
+    main.CONTACT_FIRST = args.contact_first
+    main.PANEL_SAMPLES = args.panel_samples
+    main.PANEL_FILTER = touch_pan.MEDIAN if args.panel_filter == 'median' else touch_pan.TRIMMED_MEAN
+    main.PANEL_SAMPLE_FREQ = args.panel_sample_freq
+    main.PANEL_SETTLE_US = args.panel_settle_us
+    main.ASYNC_RUNTIME = False
+
+    sim = Simulation(args.seconds, args.keys, args.start_us, args.quiet)
+    sim.instrument()
+    sim.run()
+    missed = sim.report()
+
+    status = 0
+    if args.max_missed is not None and missed > args.max_missed:
+        print('FAIL: {:} missed deadlines, at most {:} allowed'.format(missed, args.max_missed))
+        status = 1
+    for name, age in (('panel', sim.panel_age), ('IMU', sim.IMU_age)):
+        if args.max_delay is not None and age.samples and max(age.samples) > args.max_delay:
+            print('FAIL: {:} sample age {:} us at actuation, at most {:} us allowed'.format(name, max(age.samples), args.max_delay))
+            status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main_sim(sys.argv))
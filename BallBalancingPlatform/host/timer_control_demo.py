@@ -0,0 +1,69 @@
+'''@file        timer_control_demo.py
+   @brief       Runs the timer-driven control path on the host.
+   @details     Uses the host stand-ins for pyb, utime, and micropython to run
+                timer_control.TimerControl at its programmed rate for a few
+                seconds while the foreground sleeps, as Task_User and
+                Task_Panel would. Prints the number of control steps, dropped
+                timer interrupts, interrupt-to-step latency, and the final duty
+                cycles. Run from the BallBalancingPlatform directory with
+                python host/timer_control_demo.py [seconds] [freq]
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import os
+import sys
+import struct
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyb
+import utime
+import shares
+import DRV8847
+import BNO055
+import closedloop
+import timer_control
+from ulab import numpy as np
+
+def main(seconds=2.0, freq=500):
+    ''' @brief          Runs the control path and prints its statistics
+        @param seconds  How long to run the control path
+        @param freq     The control rate in Hz
+    '''
+    L_1 = shares.StampedShare(0)
+    L_2 = shares.StampedShare(0)
+    balance_flag = shares.Share(1)
+    calib_IMU_flag = shares.Share(0)
+    disable_flag = shares.Share(0)
+    state_vect_x = shares.StateVector(4)
+    state_vect_y = shares.StateVector(4)
+
+    i2c = pyb.I2C(1, pyb.I2C.MASTER)
+    # Platform tilted by 2 degrees of roll and -1 degree of pitch, at rest
+    for n, byte in enumerate(struct.pack('<hhh', 0, 32, -16)):
+        i2c.regs[(0x28, 0x1A + n)] = byte
+    IMU_obj = BNO055.BNO055(i2c, calib_IMU_flag)
+
+    motor_drv = DRV8847.DRV8847(pyb.Pin.cpu.A15, pyb.Pin.cpu.B2, 3)
+    motor_1 = motor_drv.motor(pyb.Pin.cpu.B4, pyb.Pin.cpu.B5, 1, 2)
+    motor_2 = motor_drv.motor(pyb.Pin.cpu.B0, pyb.Pin.cpu.B1, 3, 4)
+    closedloop_1 = closedloop.ClosedLoop(80, -80, L_1, state_vect_x, np.array([-0.026, -0.026, -0.005, 0.006]))
+    closedloop_2 = closedloop.ClosedLoop(80, -80, L_2, state_vect_y, np.array([0.0099, 0.027, -0.001, -0.005]))
+
+    control = timer_control.TimerControl(pyb.Timer(6), IMU_obj, calib_IMU_flag, state_vect_x, state_vect_y,
+                                         closedloop_1, closedloop_2, motor_1, motor_2, balance_flag, disable_flag)
+    control.start(freq)
+    utime.sleep(seconds)
+    control.stop()
+
+    print('control steps: {:} (expected about {:})'.format(control.runs, int(seconds*freq)))
+    print('dropped interrupts: {:}'.format(control.missed))
+    print('max interrupt to step latency: {:} us'.format(control.max_latency))
+    print('last step run time: {:} us'.format(control.run_time))
+    print('theta_y {:.2f} deg, theta_x {:.2f} deg'.format(state_vect_x.read(1), state_vect_y.read(1)))
+    print('duty 1 {:.2f} %, duty 2 {:.2f} %'.format(L_1.read(), L_2.read()))
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,6 @@
+'''@file        __init__.py
+   @brief       Host stand-in for the ulab package.
+   @details     ulab.numpy follows the NumPy API, so on the host it is provided by NumPy itself.
+'''
+
+import numpy
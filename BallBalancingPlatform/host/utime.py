@@ -0,0 +1,139 @@
+'''@file        utime.py
+   @brief       Host stand-in for the MicroPython utime module.
+   @details     Provides ticks_us(), ticks_ms(), ticks_add(), ticks_diff() and the
+                sleep functions on CPython. Tick values wrap at 2**30 like they do
+                on the Nucleo, so code that forgets ticks_diff() fails on the host
+                too. While sleeping, the functions registered with add_idle_hook()
+                are called so that host timers can fire and scheduled callbacks
+                can run, just like they would on the board.
+
+                By default the ticks follow the host's monotonic clock. After
+                use_virtual_clock() they follow a virtual clock instead, which only
+                moves when the program sleeps or when spend_us() charges the
+                modeled cost of an operation. A program run on the virtual clock
+                is deterministic and runs as fast as the host allows.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import time
+
+## @brief     The value at which tick counts wrap around
+#  @details   Matches MICROPY_PY_UTIME_TICKS_PERIOD on the STM32 port
+TICKS_PERIOD = 1 << 30
+
+## @brief     Largest step, in microseconds, the virtual clock takes while sleeping
+#  @details   Idle hooks, and therefore host timers, are serviced at least this often
+SLEEP_STEP_US = 20
+
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = TICKS_PERIOD >> 1
+
+## @brief     Functions called repeatedly while sleeping
+#  @details   Used by the host pyb and micropython stand-ins to service timers and scheduled callbacks
+_idle_hooks = []
+
+## @brief     The virtual time in microseconds, or None when following the host clock
+_virtual_us = None
+
+## @brief     Virtual time at which KeyboardInterrupt is raised, or None
+_stop_us = None
+
+def _clock_us():
+    ''' @brief  Returns the current time in microseconds, from the virtual clock if it is in use
+    '''
+    if _virtual_us is not None:
+        return _virtual_us
+    return time.perf_counter_ns() // 1000
+
+def _advance(us):
+    ''' @brief  Moves the virtual clock forward, interrupting the program once at the stop time
+    '''
+    global _virtual_us, _stop_us
+    _virtual_us += us
+    if _stop_us is not None and _virtual_us >= _stop_us:
+        _stop_us = None
+        raise KeyboardInterrupt
+
+def add_idle_hook(hook):
+    ''' @brief      Registers a function to call while sleeping
+        @param hook A function taking no arguments
+    '''
+    if hook not in _idle_hooks:
+        _idle_hooks.append(hook)
+
+def use_virtual_clock(start_us=0, stop_us=None):
+    ''' @brief          Switches the ticks to a virtual clock. Host only.
+        @param start_us The initial virtual time in microseconds. Starting close to
+                        TICKS_PERIOD exercises tick wraparound early in the run.
+        @param stop_us  Optional virtual time at which to raise KeyboardInterrupt once,
+                        which ends the main loop the same way Ctrl-C does on the board
+    '''
+    global _virtual_us, _stop_us
+    _virtual_us = start_us
+    _stop_us = stop_us
+
+def virtual_time_us():
+    ''' @brief  Returns the virtual time in microseconds without wrapping. Host only.
+    '''
+    return _virtual_us
+
+def spend_us(us):
+    ''' @brief      Charges the modeled cost of an operation to the virtual clock. Host only.
+        @details    Does nothing on the host clock, where operations take real time.
+                    Timers that expire during the operation fire afterwards, as an
+                    interrupt would at the end of a blocking peripheral call.
+        @param us   The cost in microseconds
+    '''
+    if _virtual_us is None or us <= 0:
+        return
+    _advance(us)
+    for hook in _idle_hooks:
+        hook()
+
+def ticks_us():
+    ''' @brief  Returns an increasing microsecond counter with an arbitrary reference point
+    '''
+    return _clock_us() & _TICKS_MAX
+
+def ticks_ms():
+    ''' @brief  Returns an increasing millisecond counter with an arbitrary reference point
+    '''
+    return (_clock_us() // 1000) & _TICKS_MAX
+
+def ticks_add(ticks, delta):
+    ''' @brief  Offsets a tick value by a given number, which can be positive or negative
+    '''
+    return (ticks + delta) & _TICKS_MAX
+
+def ticks_diff(ticks1, ticks2):
+    ''' @brief  Signed difference between two tick values, accounting for wraparound
+    '''
+    diff = (ticks1 - ticks2) & _TICKS_MAX
+    return ((diff + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+def sleep_us(us):
+    ''' @brief  Waits the given number of microseconds while servicing the idle hooks
+    '''
+    deadline = _clock_us() + us
+    while True:
+        for hook in _idle_hooks:
+            hook()
+        remaining = deadline - _clock_us()
+        if remaining <= 0:
+            return
+        if _virtual_us is not None:
+            _advance(min(remaining, SLEEP_STEP_US))
+        else:
+            time.sleep(min(remaining, 1000) / 1000000)
+
+def sleep_ms(ms):
+    ''' @brief  Waits the given number of milliseconds
+    '''
+    sleep_us(ms * 1000)
+
+def sleep(seconds):
+    ''' @brief  Waits the given number of seconds, which may be a float
+    '''
+    sleep_us(int(seconds * 1000000))
@@ -25,8 +25,81 @@ import BNO055
 import task_panel
 import task_IMU
 import closedloop
+import scheduler
+import profiler
+import timer_control
+import async_runtime
+import task_control
+import observer
+import micropython
 from ulab import numpy as np
 
+## @brief     Selects the timer-driven control path
+#  @details   When True, the IMU reads, controllers, and motor duty writes run from
+#             a hardware timer callback instead of from Task_IMU and Task_Motor.
+TIMER_CONTROL = False
+## @brief     Selects the uasyncio runtime
+#  @details   When True, the tasks run as coroutines from async_runtime.py instead of from the scheduler.
+ASYNC_RUNTIME = False
+## @brief     Selects the fused control tick
+#  @details   When True, Task_Control scans the panel, reads the IMU, and runs both
+#             controllers in one ordered pass in place of Task_Panel, Task_IMU, and
+#             Task_Motor. Takes precedence over TIMER_CONTROL.
+FUSED_CONTROL = False
+## @brief     Selects the two-axis controller
+#  @details   When True, one closedloop.MIMOLoop computes both motor duty cycles from
+#             the state of both axes in a single pass, in place of two ClosedLoop objects.
+MIMO_CONTROL = False
+## @brief     Selects the gain-scheduled controllers
+#  @details   When True, the gain vectors of both controllers are interpolated from
+#             the table in gain_table.txt by ball radius and speed. The fixed gains
+#             are used if the file does not exist or MIMO_CONTROL is True.
+GAIN_SCHEDULE = False
+## @brief     Selects the state observers
+#  @details   When True and FUSED_CONTROL is True, Task_Control estimates both state
+#             vectors with the steady-state Kalman filters in observer_gains.txt
+#             instead of using the raw measurements. The raw measurements are used
+#             if the file does not exist.
+OBSERVER = False
+## @brief     Selects the fixed-point control path
+#  @details   When True and FUSED_CONTROL is True, Task_ControlFixed runs the fused
+#             tick with integer sensor readings, state vectors, gains, and duty
+#             cycles, using closedloop.FixedLoop with gain_1 and gain_2. Takes
+#             precedence over MIMO_CONTROL, GAIN_SCHEDULE, and OBSERVER. Uses the
+#             fast touch panel scan whether or not FAST_SCAN is True.
+FIXED_POINT = False
+## @brief     Selects the explicit model predictive controllers
+#  @details   When True, both motors are controlled by closedloop.ExplicitMPC with the
+#             region tables in mpc_table.txt, which plan the duty cycles within the
+#             saturation limits. The fixed gains are used if the file does not exist.
+#             Takes precedence over MIMO_CONTROL and GAIN_SCHEDULE.
+MPC_CONTROL = False
+## @brief     Selects the fast touch panel scan
+#  @details   When True, the touch panel creates its pin and ADC objects once and
+#             switches the pin modes in place on every scan, see Touch_Pan.scan_fast_into().
+FAST_SCAN = False
+## @brief     Selects the contact-first touch panel scan
+#  @details   When True, the touch panel scans z first and only scans x and y while
+#             the debounced contact holds, see Touch_Pan.scan_contact_first_into().
+#             Uses the fast scan whether or not FAST_SCAN is True.
+CONTACT_FIRST = False
+## @brief     Number of ADC samples of the touch panel x, y, and z readings
+#  @details   Readings of more than one sample are read in a burst and filtered by
+#             PANEL_FILTER, see touch_pan.BurstADC. Uses the fast scan.
+PANEL_SAMPLES = (1, 1, 1)
+## @brief     Filter of the oversampled touch panel readings
+#  @details   touch_pan.MEDIAN or touch_pan.TRIMMED_MEAN
+PANEL_FILTER = touch_pan.MEDIAN
+## @brief     Sample rate, in Hz, of the oversampled touch panel readings
+#  @details   Timer 7 paces the samples with ADC.read_timed(). 0 reads them in a loop as fast as possible.
+PANEL_SAMPLE_FREQ = 0
+## @brief     Time, in microseconds, the fast touch panel scans wait after switching the pins before each read
+#  @details   Lets the panel voltage settle before the ADC samples it. With 4 us the
+#             fast scan takes 106 us of peripheral calls in host/panel_scan_bench.py
+#             instead of 94 us, and the contact-first scan with the ball on the panel
+#             98 us instead of 86 us. Without a ball the contact-first scan does not
+#             switch the pins and does not wait.
+PANEL_SETTLE_US = 4
         
 def main():
     ''' @brief The main program
@@ -35,19 +108,26 @@ def main():
     ## @brief     The period (in us) of the task
     #  @details   Specifies the largest number that can be stored in the timer, also known as the "Auto Reload" value
     period = 50000 # Number of microseconds between each desired interval
-    period_pan = 500
-    period_motor = 80
-    period_IMU = 80
+    # CPU budget under rate-monotonic priority, from the run times in host/sim.py:
+    # Task_Panel about 360 us per 1 ms (36%), Task_Motor 1 and 2 about 220 us each
+    # per 2 ms (22%), Task_IMU about 760 us per 10 ms (8%), and Task_User and the
+    # dispatches a few percent, about 70% in total. A 500 us panel period needs 72%
+    # for the panel alone, and Task_IMU and Task_User starve once balancing starts.
+    period_pan = 1000
+    period_motor = 2000
+    period_IMU = 10000 # The BNO055 fusion outputs update at 100 Hz
+    freq_control = 500 # Control rate in Hz used when TIMER_CONTROL is True
     gain_1 = np.array([-0.026, -0.026, -0.005, 0.006])   #X-GAINS
     gain_2 = np.array(([0.0099, 0.027, -0.001, -0.005])) #Y-GAINS
-    L_1 = shares.Share(0)
-    L_2 = shares.Share(0)
+    L_1 = shares.StampedShare(0)
+    L_2 = shares.StampedShare(0)
     balance_flag = shares.Share(0)
     calib_pan_flag = shares.Share(0)
     calib_IMU_flag = shares.Share(0)
     disable_flag = shares.Share(0)
-    state_vect_x = [shares.Share(0), shares.Share(0), shares.Share(0), shares.Share(0)] #[x, th_y, xd, th_yd]
-    state_vect_y = [shares.Share(0), shares.Share(0), shares.Share(0), shares.Share(0)]  #[y, th_x, yd, th_xd]
+    state_vect = shares.StateVector(8) #[x, th_y, xd, th_yd, y, th_x, yd, th_xd]
+    state_vect_x = state_vect.sub(0, 4) #[x, th_y, xd, th_yd]
+    state_vect_y = state_vect.sub(4, 4)  #[y, th_x, yd, th_xd]
     
     ## @brief     The motor driver object that calls the DRV8847 Dual H-Bridge Motor Driver 
     #  @details   This motor driver object was created in the DRV8847.py file
@@ -58,32 +138,86 @@ def main():
     ## @brief     The motor object that calls motor 2
     #  @details   This motor object was defined in main.py
     motor_2 = motor_drv.motor(Pin.cpu.B0, Pin.cpu.B1, 3, 4) 
+    ## @brief     Table of gain vectors by ball radius and speed, written by host/gain_table.py
+    #  @details   None uses the fixed gains
+    schedule = None
+    if GAIN_SCHEDULE:
+        schedule = closedloop.load_gain_schedule(state_vect)
+        if schedule == None:
+            print('No gain_table.txt, using fixed gains')
     ## @brief     The controller object that calls controller for motor 1
     #  @details   This motor object was defined in main.py
-    closedloop_1 = closedloop.ClosedLoop(80, -80, L_1, state_vect_x, gain_1)
+    closedloop_1 = closedloop.ClosedLoop(80, -80, L_1, state_vect_x, gain_1, schedule=schedule, axis=0)
     ## @brief     The controller object that calls controller for motor 2
     #  @details   This motor object was defined in main.py    
-    closedloop_2 = closedloop.ClosedLoop(80, -80, L_2, state_vect_y, gain_2)
+    closedloop_2 = closedloop.ClosedLoop(80, -80, L_2, state_vect_y, gain_2, schedule=schedule, axis=1)
+    if MIMO_CONTROL:
+        gain = np.zeros((2, 8))
+        gain[0, 0:4] = gain_1
+        gain[1, 4:8] = gain_2
+        ## @brief     The controller object that computes the duty cycles of both motors
+        #  @details   Its axes stand in for the controllers of motor 1 and motor 2
+        mimo = closedloop.MIMOLoop(80, -80, L_1, L_2, state_vect, gain)
+        closedloop_1 = mimo.axis(0)
+        closedloop_2 = mimo.axis(1)
+    if MPC_CONTROL:
+        ## @brief     The explicit model predictive controllers of motor 1 and motor 2, written by host/mpc_table.py
+        #  @details   None uses the fixed gains
+        mpc = closedloop.load_explicit_mpc(80, -80, L_1, L_2, state_vect_x, state_vect_y)
+        if mpc == None:
+            print('No mpc_table.txt, using fixed gains')
+        else:
+            closedloop_1, closedloop_2 = mpc
     ## @brief      This is a placeholder for the motor driver object for task 5
     #  @details    This is used so we call the motor driver once in all of our tasks
     motor_none = None   
     ## @brief     Touch panel object
     #  @details   Used to interface with touch panel task
-    panel_obj = touch_pan.Touch_Pan(Pin.cpu.A7, Pin.cpu.A1, Pin.cpu.A6, Pin.cpu.A0)
+    panel_obj = touch_pan.Touch_Pan(Pin.cpu.A7, Pin.cpu.A1, Pin.cpu.A6, Pin.cpu.A0, fast=FAST_SCAN or (FUSED_CONTROL and FIXED_POINT),
+                                    contact_first=CONTACT_FIRST,
+                                    samples=PANEL_SAMPLES, sample_filter=PANEL_FILTER,
+                                    timer=pyb.Timer(7, freq=PANEL_SAMPLE_FREQ) if PANEL_SAMPLE_FREQ else None,
+                                    settle_us=PANEL_SETTLE_US)
     ## @brief     IMU object
     #  @details   Used to interface with IMU task
     IMU_obj = BNO055.BNO055(pyb.I2C(1, pyb.I2C.MASTER), calib_IMU_flag)
 
     
+    ## @brief        Records the run time and start jitter of every task
+    #  @details      Statistics are printed and cleared from the user interface
+    task_profiler = profiler.Profiler(5)
+    ## @brief        Accounts for the CPU time spent in each task and idling
+    #  @details      Reports the load over the last ten one-second windows
+    task_load = profiler.LoadMonitor(5)
+    task6 = None
+    ## @brief        The observers of the x and y axes, written by host/observer_gains.py
+    #  @details      None uses the raw measurements
+    observers = None
+    if FUSED_CONTROL and OBSERVER:
+        observers = observer.load_observers(state_vect_x, state_vect_y)
+        if observers == None:
+            print('No observer_gains.txt, using raw measurements')
+    if FUSED_CONTROL and FIXED_POINT:
+        ## @brief        Creates a parameterized task constructor for the fixed-point task in task_control.py
+        #  @details      Uses integer controllers built from the same gains
+        task6 = task_control.Task_ControlFixed(period_motor, panel_obj, IMU_obj, state_vect_x, state_vect_y,
+                                               closedloop.FixedLoop(80, -80, L_1, gain_1, period_motor),
+                                               closedloop.FixedLoop(80, -80, L_2, gain_2, period_motor),
+                                               motor_1, motor_2, balance_flag, disable_flag, calib_pan_flag, calib_IMU_flag)
+    elif FUSED_CONTROL:
+        ## @brief        Creates a parameterized task constructor for task_control.py
+        #  @details      The fused control task replaces the panel, IMU, and motor tasks
+        task6 = task_control.Task_Control(period_motor, panel_obj, IMU_obj, state_vect_x, state_vect_y, closedloop_1, closedloop_2,
+                                          motor_1, motor_2, balance_flag, disable_flag, calib_pan_flag, calib_IMU_flag, observers)
     ## @brief        Creates a parameterized task constructor for task_userinterface.py
     #  @details      The constructor takes input arguments and objects and passes them into user task
-    task1 = task_userinterface.Task_User(period, L_1, L_2, balance_flag, calib_pan_flag, calib_IMU_flag, disable_flag, state_vect_x, state_vect_y)
+    task1 = task_userinterface.Task_User(period, balance_flag, calib_pan_flag, calib_IMU_flag, disable_flag, state_vect_x, state_vect_y, L_1, L_2, task_profiler, task_load, task6, panel_obj)
     ## @brief        Creates a parameterized task constructor for task_panel.py
     #  @details      The constructor takes input arguments and objects and passes them into touch panel task   
     task2 = task_panel.Task_Panel(period_pan, panel_obj, state_vect_x, state_vect_y, calib_pan_flag)
     ## @brief        Creates a parameterized task constructor for task_IMU.py
     #  @details      The constructor takes input arguments and objects and passes them into IMU task
-    task3 = task_IMU.Task_IMU(period_IMU, IMU_obj, state_vect_x, calib_IMU_flag, state_vect_y)    
+    task3 = task_IMU.Task_IMU(period_IMU, IMU_obj, state_vect_x, calib_IMU_flag, state_vect_y, not TIMER_CONTROL)    
     ## @brief        Creates a parameterized task constructor for task_motor.py corresponding to motor 1
     #  @details      The constructor takes input arguments and objects and passes them into user task
     task4 = task_motor.Task_Motor(period_motor, motor_1, motor_drv, L_1, balance_flag, state_vect_x, state_vect_y, disable_flag, closedloop_1)
@@ -91,18 +225,44 @@ def main():
     #  @details      The constructor takes input arguments and objects and passes them into user task
     task5 = task_motor.Task_Motor(period_motor, motor_2, motor_none, L_2, balance_flag, state_vect_x, state_vect_y, disable_flag, closedloop_2)
                                   
-    task_list = [task1, task2, task3, task4, task5]
-    
-
-    
+    ## @brief        Scheduler that dispatches each task when it is due
+    #  @details      Tasks are prioritized by period, so the control tasks always run before the user interface
+    sched = scheduler.Scheduler(task_profiler, task_load)
+    sched.add_task(task1, period, policy=scheduler.RESYNC, name='Task_User')
+    control = None
+    if FUSED_CONTROL:
+        sched.add_task(task6, period_motor, name='Task_Control')
+    else:
+        sched.add_task(task2, period_pan, policy=scheduler.RESYNC, name='Task_Panel')
+        sched.add_task(task3, period_IMU, name='Task_IMU')
+        if TIMER_CONTROL:
+            micropython.alloc_emergency_exception_buf(100)
+            ## @brief     Control path driven by timer 6
+            #  @details   Replaces task 4 and task 5 and the IMU readings of task 3
+            control = timer_control.TimerControl(pyb.Timer(6), IMU_obj, calib_IMU_flag, state_vect_x, state_vect_y,
+                                                 closedloop_1, closedloop_2, motor_1, motor_2, balance_flag, disable_flag,
+                                                 task_load, len(sched.task_list))
+            control.start(freq_control)
+        else:
+            sched.add_task(task4, period_motor, name='Task_Motor 1')
+            sched.add_task(task5, period_motor, name='Task_Motor 2')
     
     while(True):
         try:
-            
-            for task in task_list:
-                task.run()
+            if ASYNC_RUNTIME:
+                if FUSED_CONTROL:
+                    async_runtime.asyncio.run(async_runtime.run(task1, None, [(task6, period_motor)]))
+                else:
+                    async_task_list = [(task3, period_IMU)]
+                    if control == None:
+                        async_task_list += [(task4, period_motor), (task5, period_motor)]
+                    async_runtime.asyncio.run(async_runtime.run(task1, task2, async_task_list))
+            else:
+                sched.run_once()
                 
         except KeyboardInterrupt:
+            if control != None:
+                control.stop()
             break
         
     print('Program Terminating')
@@ -0,0 +1,108 @@
+'''@file        observer.py
+   @brief       Steady-state Kalman filter that estimates the state vector of one axis.
+   @details     Fuses the touch panel position with the IMU angle and angular
+                velocity. Every control tick predicts the state from the
+                previous estimate and the duty cycle applied since, and corrects
+                the prediction with the new measurements. The filter gains do not
+                change at run time, so the prediction and the correction are
+                combined into a single 4x8 matrix computed on the host by
+                host/observer_gains.py, and every update is one matrix-vector
+                product of fixed cost. A second matrix is used for ticks without
+                a panel sample, which only correct the angle and angular velocity
+                and predict the ball position and velocity from the model.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+from ulab import numpy as np
+import os
+
+class Observer:
+    ''' @brief   A steady-state Kalman filter for one axis of the platform
+        @details The estimate of [position, angle, velocity, angular velocity] is
+                 written to a state vector in place of the raw measurements, in the
+                 same units, mm, degrees, mm/us, and rad/s.
+    '''
+
+    def __init__ (self, state_vect, gain, gain_missing, max_missing=50):
+        ''' @brief              Constructs an observer
+            @param state_vect   The shares.StateVector of the axis that receives the estimate
+            @param gain         The 4x8 matrix that maps the previous estimate, the duty cycle, and
+                                the position, angle, and angular velocity measurements to the new estimate
+            @param gain_missing The 4x8 matrix used instead when the ball was not detected. Its
+                                column of the position measurement is zero.
+            @param max_missing  Number of ticks without a panel sample after which the ball is
+                                considered gone and its position and velocity estimates are cleared
+        '''
+        ## @brief     The state vector that receives the estimate
+        self.state_vect = state_vect
+        ## @brief     The update matrix used when the ball is detected
+        self.gain = gain
+        ## @brief     The update matrix used when the ball is not detected
+        self.gain_missing = gain_missing
+        ## @brief     Number of ticks without a panel sample after which the ball is considered gone
+        self.max_missing = max_missing
+        ## @brief     The previous estimate followed by the inputs of the current update
+        #  @details   [position, angle, velocity, angular velocity, duty cycle, measured position,
+        #             measured angle, measured angular velocity], updated in place
+        self.inputs = np.zeros(8)
+        ## @brief     Number of consecutive ticks without a panel sample
+        self.missing = 0
+
+    def update (self, duty, position, angle, rate, detected):
+        ''' @brief          Updates the estimate with the measurements of one control tick
+            @param duty     The duty cycle applied since the previous update, in percent
+            @param position The measured ball position in mm
+            @param angle    The measured platform angle in degrees
+            @param rate     The measured platform angular velocity in rad/s
+            @param detected True if the panel detected the ball in this tick
+        '''
+        w = self.inputs
+        if detected:
+            if self.missing > self.max_missing:
+                # The ball has just been placed, start from the measured position at rest
+                w[0] = position
+                w[2] = 0
+            self.missing = 0
+        else:
+            self.missing += 1
+        w[4] = duty
+        w[5] = position
+        w[6] = angle
+        w[7] = rate
+        estimate = np.dot(self.gain if detected else self.gain_missing, w)
+        if self.missing > self.max_missing:
+            estimate[0] = 0
+            estimate[2] = 0
+        w[0] = estimate[0]
+        w[1] = estimate[1]
+        w[2] = estimate[2]
+        w[3] = estimate[3]
+        self.state_vect.write(estimate)
+
+    def reset (self):
+        ''' @brief Clears the estimate, for example after calibrating the sensors
+        '''
+        for n in range(8):
+            self.inputs[n] = 0
+        self.missing = 0
+
+def load_observers (state_vect_x, state_vect_y, filename='observer_gains.txt'):
+    ''' @brief              Reads the observer matrices written by host/observer_gains.py
+        @details            The file holds 16 lines of 8 values: the rows of the x axis
+                            matrix, of the x axis matrix without a panel sample, and the
+                            same two matrices of the y axis.
+        @param state_vect_x The state vector of the x axis
+        @param state_vect_y The state vector of the y axis
+        @param filename     The name of the file
+        @return             The observers of the x and y axes, or None if the file does not exist
+    '''
+    if filename not in os.listdir():
+        return None
+    with open(filename, 'r') as f:
+        rows = [[float(value) for value in line.strip().split(',')] for line in f if line.strip()]
+    if len(rows) != 16 or any(len(row) != 8 for row in rows):
+        raise ValueError('observer gains need 16 rows of 8 values')
+    return (Observer(state_vect_x, np.array(rows[0:4]), np.array(rows[4:8])),
+            Observer(state_vect_y, np.array(rows[8:12]), np.array(rows[12:16])))
@@ -0,0 +1,269 @@
+'''@file        profiler.py
+   @brief       Per-task execution time, period jitter, and CPU load instrumentation.
+   @details     Records how long each task's run() takes, how late each run
+                starts relative to its deadline, and how the CPU time is split
+                between tasks and idling. All statistics are kept in arrays
+                allocated once at construction so recording a run does not
+                allocate on the heap.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import array
+import utime
+
+## @brief     The total run time above which the run time sum and run count of a task are halved
+#  @details   Keeps run_sum below 2**30, the largest small integer on the MicroPython heap
+RUN_SUM_CAP = 0x1FFFFFFF
+
+class Profiler:
+    ''' @brief      Execution time and jitter statistics for a fixed number of tasks
+        @details    For each task this keeps the minimum, maximum, and total run time,
+                    a histogram of start time jitter with fixed-width bins, and a
+                    count of overruns, i.e. runs that finished after the task's
+                    next deadline. Once the total run time of a task passes
+                    RUN_SUM_CAP, it is halved together with the number of runs it
+                    sums, which keeps the mean and keeps the total a small integer
+                    on the MicroPython heap however long dump() is not called.
+    '''
+
+    def __init__(self, num_tasks, bin_width=100, num_bins=10):
+        ''' @brief              Constructs a profiler
+            @param num_tasks    The number of tasks to keep statistics for
+            @param bin_width    The width, in microseconds, of each jitter histogram bin
+            @param num_bins     The number of jitter histogram bins. The last bin also
+                                counts every start later than the histogram range.
+        '''
+        ## @brief     The number of tasks statistics are kept for
+        #  @details   Task indices run from 0 to num_tasks - 1
+        self.num_tasks = num_tasks
+        ## @brief     The width, in microseconds, of each jitter histogram bin
+        #  @details   Bin n counts starts that were between n*bin_width and (n+1)*bin_width late
+        self.bin_width = bin_width
+        ## @brief     The number of jitter histogram bins per task
+        #  @details   The last bin collects every start beyond the histogram range
+        self.num_bins = num_bins
+        ## @brief     Names printed for each task in dump()
+        #  @details   Defaults to the task index until set_name() is called
+        self.names = [str(n) for n in range(num_tasks)]
+        ## @brief     Number of recorded runs for each task
+        self.count = array.array('l', num_tasks*[0])
+        ## @brief     Number of runs summed in run_sum for each task
+        #  @details   Used with run_sum to compute the mean run time
+        self.sum_count = array.array('l', num_tasks*[0])
+        ## @brief     Shortest run time, in microseconds, of each task
+        self.run_min = array.array('l', num_tasks*[0])
+        ## @brief     Longest run time, in microseconds, of each task
+        self.run_max = array.array('l', num_tasks*[0])
+        ## @brief     Total run time, in microseconds, of each task
+        #  @details   Cleared by every dump() and halved with sum_count once it passes
+        #             RUN_SUM_CAP, so that it stays a small integer and updating it
+        #             does not allocate
+        self.run_sum = array.array('l', num_tasks*[0])
+        ## @brief     Number of runs of each task that finished after its next deadline
+        self.overruns = array.array('l', num_tasks*[0])
+        ## @brief     Start time jitter histograms for all tasks
+        #  @details   The histogram of task n occupies indices n*num_bins to (n+1)*num_bins - 1
+        self.hist = array.array('l', num_tasks*num_bins*[0])
+        self.reset()
+
+    def set_name(self, index, name):
+        ''' @brief          Sets the name printed for a task
+            @param index    The index of the task
+            @param name     The name of the task
+        '''
+        self.names[index] = name
+
+    def reset(self):
+        ''' @brief      Clears all statistics
+        '''
+        for n in range(self.num_tasks):
+            self.count[n] = 0
+            self.sum_count[n] = 0
+            self.run_min[n] = 0x3FFFFFFF
+            self.run_max[n] = 0
+            self.run_sum[n] = 0
+            self.overruns[n] = 0
+        for n in range(self.num_tasks*self.num_bins):
+            self.hist[n] = 0
+
+    def record(self, index, late, run_time, period):
+        ''' @brief          Records one run of a task
+            @param index    The index of the task
+            @param late     How late, in microseconds, the run started relative to its deadline
+            @param run_time How long, in microseconds, the run took
+            @param period   The period, in microseconds, of the task
+        '''
+        self.count[index] += 1
+        self.sum_count[index] += 1
+        self.run_sum[index] += run_time
+        if self.run_sum[index] > RUN_SUM_CAP:
+            self.run_sum[index] >>= 1
+            self.sum_count[index] >>= 1
+        if run_time < self.run_min[index]:
+            self.run_min[index] = run_time
+        if run_time > self.run_max[index]:
+            self.run_max[index] = run_time
+        if late + run_time > period:
+            self.overruns[index] += 1
+        if late < 0:
+            late = 0
+        bin_num = late // self.bin_width
+        if bin_num >= self.num_bins:
+            bin_num = self.num_bins - 1
+        self.hist[index*self.num_bins + bin_num] += 1
+
+    def dump(self):
+        ''' @brief      Prints the statistics of every task and then clears them
+        '''
+        for n in range(self.num_tasks):
+            count = self.count[n]
+            if count == 0:
+                print('{:}: no runs'.format(self.names[n]))
+                continue
+            print('{:}: runs {:}, run time min {:} max {:} mean {:} [us], overruns {:}'.format(
+                  self.names[n], count, self.run_min[n], self.run_max[n], self.run_sum[n]//self.sum_count[n], self.overruns[n]))
+            start = n*self.num_bins
+            print('    jitter histogram ({:} us bins): {:}'.format(
+                  self.bin_width, ' '.join(str(self.hist[start + b]) for b in range(self.num_bins))))
+        self.reset()
+
+class LoadMonitor:
+    ''' @brief      CPU utilization accounting over a sliding window
+        @details    Time is split into windows of a fixed length. Within each window
+                    the time spent in each task body and the time spent sleeping
+                    while no task is due are accumulated. The last num_windows
+                    completed windows are kept in ring buffers, so report() shows
+                    the load over the most recent num_windows*window microseconds.
+                    Time that is neither in a task nor asleep is scheduler overhead.
+                    Work run from an interrupt, such as the control steps of
+                    timer_control.py, is accounted with interrupt_time() under its own
+                    entry and taken out of the task run or sleep it interrupted.
+    '''
+
+    def __init__(self, num_tasks, window=1000000, num_windows=10):
+        ''' @brief              Constructs a load monitor
+            @param num_tasks    The number of tasks to account for
+            @param window       The length, in microseconds, of each window
+            @param num_windows  The number of completed windows kept for report()
+        '''
+        ## @brief     The number of tasks accounted for
+        self.num_tasks = num_tasks
+        ## @brief     The length, in microseconds, of each window
+        #  @details   Must stay below 2**30 so the window totals remain small integers
+        self.window = window
+        ## @brief     The number of completed windows kept in the ring buffers
+        self.num_windows = num_windows
+        ## @brief     Names printed for each task in report()
+        #  @details   Defaults to the task index until set_name() is called
+        self.names = [str(n) for n in range(num_tasks)]
+        ## @brief     Time, in microseconds, spent in each task during the current window
+        self.busy = array.array('l', num_tasks*[0])
+        ## @brief     Time, in microseconds, spent sleeping during the current window
+        self.idle = 0
+        ## @brief     Total time, in microseconds, of the work accounted by interrupt_time()
+        #  @details   Kept modulo 2**30 like utime.ticks_us(), so that it stays a small integer.
+        #             Only interrupt_time() writes it, so reading it needs no interrupt lock.
+        self.interrupt_total = 0
+        ## @brief     The value of interrupt_total when the task run or sleep being measured started
+        self.interrupt_mark = 0
+        ## @brief     The utime.ticks_us() value at which the current window started
+        #  @details   None until the first call to update()
+        self.window_start = None
+        ## @brief     Time spent in each task during each completed window
+        #  @details   The entries of window n occupy indices n*num_tasks to (n+1)*num_tasks - 1
+        self.busy_hist = array.array('l', num_windows*num_tasks*[0])
+        ## @brief     Time spent sleeping during each completed window
+        self.idle_hist = array.array('l', num_windows*[0])
+        ## @brief     Length, in microseconds, of each completed window
+        self.elapsed_hist = array.array('l', num_windows*[0])
+        ## @brief     Index of the ring buffer entry the next completed window is stored in
+        self.next_window = 0
+
+    def set_name(self, index, name):
+        ''' @brief          Sets the name printed for a task
+            @param index    The index of the task
+            @param name     The name of the task
+        '''
+        self.names[index] = name
+
+    def begin(self):
+        ''' @brief      Marks the start of a task run or a sleep measured for task_time() or idle_time()
+        '''
+        self.interrupt_mark = self.interrupt_total
+
+    def interrupted(self):
+        ''' @brief      Returns the time of the interrupt work accounted since begin()
+            @return     The time in microseconds
+        '''
+        return (self.interrupt_total - self.interrupt_mark) & 0x3FFFFFFF
+
+    def task_time(self, index, run_time):
+        ''' @brief          Accounts for one run of a task
+            @details        Interrupt work accounted since begin() is taken out of the run time.
+            @param index    The index of the task
+            @param run_time How long, in microseconds, the run took
+        '''
+        self.busy[index] += run_time - self.interrupted()
+
+    def idle_time(self, sleep_time):
+        ''' @brief              Accounts for time spent sleeping
+            @details            Interrupt work accounted since begin() is taken out of the sleep time.
+            @param sleep_time   How long, in microseconds, the scheduler slept
+        '''
+        self.idle += sleep_time - self.interrupted()
+
+    def interrupt_time(self, index, run_time):
+        ''' @brief          Accounts for work run from an interrupt or a micropython.schedule() callback
+            @details        Must not allocate.
+            @param index    The index the work is reported under, one not used by a scheduled task
+            @param run_time How long, in microseconds, the work took
+        '''
+        self.busy[index] += run_time
+        self.interrupt_total = (self.interrupt_total + run_time) & 0x3FFFFFFF
+
+    def update(self, now):
+        ''' @brief          Closes the current window once it is complete
+            @param now      The current utime.ticks_us() value
+        '''
+        if self.window_start is None:
+            self.window_start = now
+            return
+        elapsed = utime.ticks_diff(now, self.window_start)
+        if elapsed < self.window:
+            return
+        start = self.next_window*self.num_tasks
+        for n in range(self.num_tasks):
+            self.busy_hist[start + n] = self.busy[n]
+            self.busy[n] = 0
+        self.idle_hist[self.next_window] = self.idle
+        self.elapsed_hist[self.next_window] = elapsed
+        self.idle = 0
+        self.window_start = now
+        self.next_window = (self.next_window + 1) % self.num_windows
+
+    def report(self):
+        ''' @brief      Prints the load of each task and the overall load over the completed windows
+        '''
+        elapsed = 0
+        for n in range(self.num_windows):
+            elapsed += self.elapsed_hist[n]
+        if elapsed == 0:
+            print('CPU load: no complete window yet')
+            return
+        idle = 0
+        for n in range(self.num_windows):
+            idle += self.idle_hist[n]
+        busy = 0
+        task_busy = []
+        for task in range(self.num_tasks):
+            total = 0
+            for n in range(self.num_windows):
+                total += self.busy_hist[n*self.num_tasks + task]
+            task_busy.append(total)
+            busy += total
+        print('CPU load over {:.1f} s: {:.1f}% tasks, {:.1f}% overhead, {:.1f}% idle'.format(
+              elapsed/1000000, 100*busy/elapsed, 100*(elapsed - busy - idle)/elapsed, 100*idle/elapsed))
+        for task in range(self.num_tasks):
+            print('    {:}: {:.1f}%'.format(self.names[task], 100*task_busy[task]/elapsed))
@@ -0,0 +1,208 @@
+'''@file        scheduler.py
+   @brief       Deadline-driven cooperative scheduler for the term project tasks.
+   @details     Each task object is registered with a period, phase, and priority.
+                The scheduler only calls a task's run() method when its deadline
+                has passed, and sleeps until the earliest upcoming deadline when
+                no task is due instead of polling every task as fast as possible.
+                After every task returns, which is the only point at which a
+                cooperative task gives up the CPU, the highest priority task that
+                is due runs next. Unless a priority is given, tasks are ordered
+                rate-monotonically, so shorter periods run first.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import utime
+
+## @brief     Overrun policy that drops the missed releases of a late task
+#  @details   The task runs once and its next deadline stays on the original period grid
+SKIP = 0
+## @brief     Overrun policy that runs a late task once for every missed release
+#  @details   The task runs back to back until it has caught up with its period grid
+CATCH_UP = 1
+## @brief     Overrun policy that restarts the period of a late task from its actual start time
+#  @details   The next deadline is one period after the late run started
+RESYNC = 2
+
+class ScheduledTask:
+    ''' @brief      Bookkeeping for one task registered with the scheduler
+        @details    Holds the task object together with its period, priority, and
+                    the utime.ticks_us() value of its next release.
+    '''
+
+    def __init__(self, index, task, period, phase, priority, policy, start_time):
+        ''' @brief              Constructs a scheduled task entry
+            @param index        The registration order of the task, used to index profiler statistics
+            @param task         Any object with a run() method, such as Task_Panel or Task_Motor
+            @param period       The period, in microseconds, between runs of the task
+            @param phase        The offset, in microseconds, of the first run from start_time
+            @param priority     Higher numbers are dispatched first when several tasks are due
+            @param policy       What to do when the task starts after its next release: SKIP, CATCH_UP, or RESYNC
+            @param start_time   The utime.ticks_us() value the phase is measured from
+        '''
+        ## @brief     The registration order of the task
+        #  @details   Used to index the statistics arrays of the profiler
+        self.index = index
+        ## @brief     The task object that is dispatched
+        #  @details   Must provide a run() method that executes one iteration of its FSM
+        self.task = task
+        ## @brief     The period, in microseconds, between runs of the task
+        #  @details   Added to next_time each time the task is dispatched
+        self.period = period
+        ## @brief     The dispatch priority of the task
+        #  @details   When several tasks are due at once, higher priority tasks run first
+        self.priority = priority
+        ## @brief     The overrun policy of the task
+        #  @details   One of SKIP, CATCH_UP, or RESYNC
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted for every policy when the task is dispatched. SKIP and RESYNC drop
+        #             those releases, CATCH_UP runs them late. Releases a starved task has not
+        #             reached yet are added by missed_at().
+        self.missed = 0
+        ## @brief     The utime.ticks_us() value associated with the next run of the task
+        #  @details   The task is due once the current time reaches this value
+        self.next_time = utime.ticks_add(start_time, phase)
+        ## @brief     Sets the number of runs to 0
+        #  @details   Defines a variable to keep track of runs
+        self.runs = 0
+
+    def missed_at(self, now):
+        ''' @brief      Returns the number of missed releases of the task up to a given time
+            @details    Adds the releases that are waiting to be dispatched and whose
+                        following release is already due, so that a task that is starved
+                        by higher priority tasks and never dispatched is counted too.
+            @param now  The utime.ticks_us() value to count up to
+            @return     The number of missed releases
+        '''
+        pending = utime.ticks_diff(now, self.next_time)
+        if pending < self.period:
+            return self.missed
+        return self.missed + pending // self.period
+
+class Scheduler:
+    ''' @brief      Cooperative scheduler that dispatches tasks when they are due
+        @details    Tasks are kept sorted by priority. Each call to run_once() runs
+                    the highest priority task whose deadline has passed, checking the
+                    deadlines again after each task, until no task is due, and then
+                    sleeps until the next deadline.
+    '''
+
+    def __init__(self, profiler=None, load=None):
+        ''' @brief              Constructs an empty scheduler
+            @param profiler     An optional profiler.Profiler that records the run time
+                                and start jitter of every dispatched task
+            @param load         An optional profiler.LoadMonitor that accounts for the time
+                                spent in each task and sleeping
+        '''
+        ## @brief     List of registered tasks
+        #  @details   Kept sorted from highest to lowest priority
+        self.task_list = []
+        ## @brief     The utime.ticks_us() value the task phases are measured from
+        #  @details   Set when the scheduler is constructed
+        self.start_time = utime.ticks_us()
+        ## @brief     The optional profiler that records task timing
+        #  @details   When None, tasks are dispatched without timing them
+        self.profiler = profiler
+        ## @brief     The optional load monitor that accounts for CPU time
+        #  @details   When None, no CPU load accounting is done
+        self.load = load
+
+    def add_task(self, task, period, phase=0, priority=None, policy=SKIP, name=None):
+        ''' @brief              Registers a task with the scheduler
+            @param task         Any object with a run() method
+            @param period       The period, in microseconds, between runs of the task
+            @param phase        The offset, in microseconds, of the first run
+            @param priority     Higher numbers are dispatched first when several tasks are due.
+                                Defaults to a rate-monotonic priority, -period.
+            @param policy       What to do when the task starts after its next release: SKIP, CATCH_UP, or RESYNC
+            @param name         The name the profiler prints for the task
+            @return             The ScheduledTask entry created for the task
+        '''
+        if priority is None:
+            priority = -period
+        entry = ScheduledTask(len(self.task_list), task, period, phase, priority, policy, self.start_time)
+        if name is not None:
+            if self.profiler is not None:
+                self.profiler.set_name(entry.index, name)
+            if self.load is not None:
+                self.load.set_name(entry.index, name)
+        self.task_list.append(entry)
+        self.task_list.sort(key=lambda entry: -entry.priority)
+        return entry
+
+    def run_once(self):
+        ''' @brief      Dispatches tasks until none are due, then sleeps until the next deadline
+        '''
+        while self.dispatch():
+            pass
+        self.idle()
+
+    def dispatch(self):
+        ''' @brief      Runs the highest priority task that is due
+            @return     True if a task was run, False if no task was due
+        '''
+        current_time = utime.ticks_us()
+        for entry in self.task_list:
+            late = utime.ticks_diff(current_time, entry.next_time)
+            if late >= 0:
+                break
+        else:
+            return False
+
+        if self.load is not None:
+            self.load.begin()
+        entry.task.run()
+        entry.runs += 1
+        if self.profiler is not None or self.load is not None:
+            run_time = utime.ticks_diff(utime.ticks_us(), current_time)
+            if self.profiler is not None:
+                self.profiler.record(entry.index, late, run_time, entry.period)
+            if self.load is not None:
+                self.load.task_time(entry.index, run_time)
+
+        entry.next_time = utime.ticks_add(entry.next_time, entry.period)
+        if late >= entry.period:
+            if entry.policy == CATCH_UP:
+                # Every release is still run, this one late
+                entry.missed += 1
+            else:
+                missed = late // entry.period
+                entry.missed += missed
+                if entry.policy == RESYNC:
+                    entry.next_time = utime.ticks_add(current_time, entry.period)
+                else:
+                    entry.next_time = utime.ticks_add(entry.next_time, missed*entry.period)
+        return True
+
+    def idle(self):
+        ''' @brief      Sleeps until the earliest upcoming task deadline
+            @details    Whole milliseconds are spent in utime.sleep_ms(), which lets
+                        the MCU wait for interrupts, and the remainder in utime.sleep_us().
+        '''
+        current_time = utime.ticks_us()
+        wait = None
+        for entry in self.task_list:
+            diff = utime.ticks_diff(entry.next_time, current_time)
+            if wait is None or diff < wait:
+                wait = diff
+        if wait is not None and wait > 0:
+            if self.load is not None:
+                self.load.begin()
+            sleep_start = utime.ticks_us()
+            if wait >= 1000:
+                utime.sleep_ms(wait // 1000)
+                wait = wait % 1000
+            if wait > 0:
+                utime.sleep_us(wait)
+            if self.load is not None:
+                self.load.idle_time(utime.ticks_diff(utime.ticks_us(), sleep_start))
+        if self.load is not None:
+            self.load.update(utime.ticks_us())
+
+    def run(self):
+        ''' @brief      Runs the scheduler forever
+        '''
+        while True:
+            self.run_once()
@@ -4,6 +4,18 @@
                 multiple tasks.
 '''
 
+import array
+import utime
+import micropython
+from ulab import numpy as np
+
+## @brief     RingQueue overflow behavior that discards the oldest item to make room
+DROP_OLDEST = 0
+## @brief     RingQueue overflow behavior that discards the item being put
+DROP_NEWEST = 1
+## @brief     RingQueue overflow behavior that raises OverflowError
+ERROR = 2
+
 class Share:
     ''' @brief      A standard shared variable.
         @details    Values can be accessed with read() or changed with write()
@@ -15,18 +27,66 @@ class Share:
         '''
         self._buffer = initial_value
     
+    # emitter: native
     def write(self, item):
         ''' @brief      Updates the value of the shared variable
             @param item The new value for the shared variable
         '''
         self._buffer = item
         
+    # emitter: native
     def read(self):
         ''' @brief      Access the value of the shared variable
             @return    The value of the shared variable
         '''
         return self._buffer
 
+class StampedShare(Share):
+    ''' @brief      A shared variable that records when and how often it was written.
+        @details    Every write stores the utime.ticks_us() time of the write and
+                    increments a sequence number. A consumer keeps the sequence
+                    number of the value it last used and calls changed_since() to
+                    skip work when nothing new was written, and age() tells how old
+                    the value is, so that a stale sensor can be detected.
+    '''
+    def __init__(self, initial_value=None):
+        ''' @brief      Constructs a timestamped shared variable
+            @param      initial_value An optional initial value for the 
+                                      shared variable.
+        '''
+        super().__init__(initial_value)
+        ## @brief     Incremented on every write
+        #  @details   Kept below 2**30 so that it stays a small integer
+        self.seq = 0
+        ## @brief     The utime.ticks_us() value of the latest write
+        self.time = utime.ticks_us()
+
+    # emitter: native
+    def write(self, item):
+        ''' @brief      Updates the value of the shared variable
+            @param item The new value for the shared variable
+        '''
+        self._buffer = item
+        self.time = utime.ticks_us()
+        self.seq = (self.seq + 1) & 0x3FFFFFFF
+
+    # emitter: native
+    def changed_since(self, seq):
+        ''' @brief      Checks whether the variable was written since a given write
+            @param seq  The sequence number seen at the previous check
+            @return     True if the variable was written since then
+        '''
+        return self.seq != seq
+
+    def age(self, now=None):
+        ''' @brief      Finds how long ago the variable was written
+            @param now  The current utime.ticks_us() value, read if not given
+            @return     The age of the value in microseconds
+        '''
+        if now is None:
+            now = utime.ticks_us()
+        return utime.ticks_diff(now, self.time)
+
 class Queue:
     ''' @brief      A queue of shared data.
         @details    Values can be accessed with placed into queue with put() or
@@ -54,4 +114,461 @@ class Queue:
         ''' @brief      Find the number of items in the queue. Call before get().
             @return     The number of items in the queue
         '''
-        return len(self._buffer)
\ No newline at end of file
+        return len(self._buffer)
+
+class RingQueue:
+    ''' @brief      A fixed-capacity queue of shared data backed by a ring buffer.
+        @details    Has the same put(), get(), and num_in() interface as Queue, but
+                    every operation takes constant time and nothing is allocated
+                    after construction. With a typecode the items are stored in an
+                    array, so that numbers are stored without boxing.
+
+                    The producer only moves the write index and the consumer only
+                    moves the read index, so one side may run in an interrupt
+                    callback. Use DROP_NEWEST or ERROR in that case, since
+                    DROP_OLDEST makes put() move the read index as well.
+    '''
+    def __init__(self, size, typecode=None, overflow=DROP_OLDEST):
+        ''' @brief              Constructs an empty queue
+            @param size         The maximum number of items in the queue
+            @param typecode     An optional array typecode, such as 'f' or 'l', for the items
+            @param overflow     What put() does when the queue is full: DROP_OLDEST, DROP_NEWEST, or ERROR
+        '''
+        ## @brief     Storage for the items, with one slot more than the capacity
+        #  @details   The spare slot tells a full queue from an empty one without a shared count
+        if typecode is None:
+            self._buffer = (size + 1)*[None]
+        else:
+            self._buffer = array.array(typecode, (size + 1)*[0])
+        ## @brief     The number of slots in the buffer
+        self._slots = size + 1
+        ## @brief     Index of the next item to get. Only moved by get(), and by put() with DROP_OLDEST.
+        self._read = 0
+        ## @brief     Index of the next slot to put into. Only moved by put().
+        self._write = 0
+        ## @brief     What put() does when the queue is full
+        self.overflow = overflow
+        ## @brief     The number of items discarded because the queue was full
+        self.dropped = 0
+        ## @brief     The largest number of items that have been in the queue at once
+        self.high_water = 0
+
+    def put(self, item):
+        ''' @brief      Adds an item to the end of the queue.
+            @details    When the queue is full the overflow behavior decides whether
+                        the oldest item or the new item is discarded, or whether
+                        OverflowError is raised.
+            @param item The new item to append to the queue.
+            @return     True if the item was added, False if it was discarded
+        '''
+        write = self._write + 1
+        if write == self._slots:
+            write = 0
+        if write == self._read:
+            if self.overflow == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            if self.overflow == ERROR:
+                raise OverflowError('queue full')
+            read = self._read + 1
+            if read == self._slots:
+                read = 0
+            self._read = read
+            self.dropped += 1
+        self._buffer[self._write] = item
+        self._write = write
+        count = self.num_in()
+        if count > self.high_water:
+            self.high_water = count
+        return True
+
+    def get(self):
+        ''' @brief      Remove the first item from the front of the queue
+            @return     The value of the item removed
+        '''
+        read = self._read
+        if read == self._write:
+            raise IndexError('queue empty')
+        item = self._buffer[read]
+        read += 1
+        if read == self._slots:
+            read = 0
+        self._read = read
+        return item
+
+    def num_in(self):
+        ''' @brief      Find the number of items in the queue. Call before get().
+            @return     The number of items in the queue
+        '''
+        count = self._write - self._read
+        if count < 0:
+            count += self._slots
+        return count
+
+    def full(self):
+        ''' @brief      Checks whether the next put() would overflow
+            @return     True if the queue holds its maximum number of items
+        '''
+        return self.num_in() == self._slots - 1
+
+    def clear(self):
+        ''' @brief      Discards every item in the queue
+        '''
+        self._read = self._write
+
+class SeqShare:
+    ''' @brief      A multi-field shared variable that is always read consistently.
+        @details    Holds a fixed number of fields, such as the four elements of a
+                    state vector, in an array with two copies of every field. A
+                    write fills the copy that readers are not using, then switches
+                    readers over to it and increments a sequence counter. A reader
+                    copies the fields of the current copy and retries only if the
+                    sequence counter changed while it was copying.
+
+                    One side may run in an interrupt callback, as long as there is
+                    a single writer. A reader in an interrupt never retries, because
+                    the interrupted writer only touches the copy that is not being
+                    read. A writer in an interrupt makes a foreground reader retry
+                    at most once per interrupt. Interrupts are never disabled. With
+                    an integer typecode neither side allocates memory. With 'f',
+                    floats read from the array are boxed, so read the fields in
+                    the foreground or from a micropython.schedule() callback.
+    '''
+    def __init__(self, size, typecode='f', initial_value=0):
+        ''' @brief                  Constructs a multi-field shared variable
+            @param size             The number of fields
+            @param typecode         The array typecode of the fields
+            @param initial_value    The initial value of every field
+        '''
+        ## @brief     The number of fields
+        self.size = size
+        ## @brief     Two copies of the fields, one after the other
+        self._buffer = array.array(typecode, 2*size*[initial_value])
+        ## @brief     Offset into _buffer of the copy that readers use, 0 or size
+        self._active = 0
+        ## @brief     Incremented after every write
+        #  @details   Kept below 2**30 so that it stays a small integer
+        self.seq = 0
+
+    def _publish(self, base):
+        ''' @brief      Switches readers over to the copy at base
+        '''
+        self._active = base
+        self.seq = (self.seq + 1) & 0x3FFFFFFF
+
+    def write(self, values):
+        ''' @brief          Updates every field at once
+            @param values   A sequence of size values
+        '''
+        base = self.size - self._active
+        buf = self._buffer
+        for n in range(self.size):
+            buf[base + n] = values[n]
+        self._publish(base)
+
+    def write_field(self, index, value):
+        ''' @brief          Updates a single field and keeps the others
+            @param index    The index of the field
+            @param value    The new value of the field
+        '''
+        active = self._active
+        base = self.size - active
+        buf = self._buffer
+        for n in range(self.size):
+            buf[base + n] = buf[active + n]
+        buf[base + index] = value
+        self._publish(base)
+
+    def read(self, index):
+        ''' @brief          Access the latest value of a single field
+            @param index    The index of the field
+            @return         The value of the field
+        '''
+        return self._buffer[self._active + index]
+
+    def read_into(self, out):
+        ''' @brief      Copies every field from the same write into out
+            @param out  A list or array of at least size elements
+            @return     The sequence number of the write that was copied
+        '''
+        buf = self._buffer
+        while True:
+            seq = self.seq
+            active = self._active
+            for n in range(self.size):
+                out[n] = buf[active + n]
+            if self.seq == seq:
+                return seq
+
+class StateVector:
+    ''' @brief      A state vector shared between the sensor and controller tasks.
+        @details    Holds every element of a state vector, such as [x, theta_y,
+                    x_dot, theta_y_dot], in one preallocated ulab array instead of
+                    one Share object per element. Sensor tasks write single elements
+                    with write_field() and controllers use view() in numpy
+                    operations directly, so assembling the state vector for the
+                    controller neither calls a method per element nor allocates.
+                    A single numpy operation on the view runs without interruption
+                    by micropython.schedule() callbacks, so it always sees elements
+                    written by complete callbacks.
+
+                    sub() returns a state vector that is a view of some of the
+                    elements, so that the x and y state vectors can be written on
+                    their own and still be read as one state vector by a controller
+                    for both axes.
+    '''
+    def __init__(self, size=4, initial_value=0, parent=None, offset=0):
+        ''' @brief                  Constructs a state vector
+            @param size             The number of elements
+            @param initial_value    The initial value of every element
+            @param parent           Optional state vector whose elements this one is a view of. Use sub() instead.
+            @param offset           Index of the first element of this state vector in the parent
+        '''
+        ## @brief     The state vector this one is a view of, or None
+        self.parent = parent
+        ## @brief     Index of the first element in the arrays, which are shared with the parent
+        self._offset = offset
+        if parent is None:
+            ## @brief     The elements of the state vector
+            self._buffer = np.zeros(size)
+            for n in range(size):
+                self._buffer[n] = initial_value
+            ## @brief     The utime.ticks_us() value of the latest write of each element
+            self.times = array.array('l', size*[utime.ticks_us()])
+        else:
+            self._offset += parent._offset
+            self._buffer = parent._buffer[offset:offset + size]
+            self.times = parent.times
+        ## @brief     The number of elements
+        self.size = size
+        ## @brief     Incremented on every write
+        #  @details   Kept below 2**30 so that it stays a small integer
+        self.seq = 0
+
+    def sub(self, offset, size):
+        ''' @brief          Creates a state vector that is a view of some of the elements
+            @details        Writes to the new state vector change the elements of this
+                            one and count as writes of this one for changed_since().
+            @param offset   Index of the first element
+            @param size     The number of elements
+            @return         The new state vector
+        '''
+        return StateVector(size, parent=self, offset=offset)
+
+    def _written(self):
+        ''' @brief      Increments the sequence numbers of this state vector and its parents
+        '''
+        vect = self
+        while vect is not None:
+            vect.seq = (vect.seq + 1) & 0x3FFFFFFF
+            vect = vect.parent
+
+    def write(self, values):
+        ''' @brief          Updates every element of the state vector
+            @param values   A sequence of size values
+        '''
+        buf = self._buffer
+        now = utime.ticks_us()
+        for n in range(self.size):
+            buf[n] = values[n]
+            self.times[self._offset + n] = now
+        self._written()
+
+    def write_field(self, index, value):
+        ''' @brief          Updates a single element of the state vector
+            @param index    The index of the element
+            @param value    The new value of the element
+        '''
+        self._buffer[index] = value
+        self.times[self._offset + index] = utime.ticks_us()
+        self._written()
+
+    def changed_since(self, seq):
+        ''' @brief      Checks whether any element was written since a given write
+            @param seq  The sequence number seen at the previous check
+            @return     True if the state vector was written since then
+        '''
+        return self.seq != seq
+
+    def age(self, index, now=None):
+        ''' @brief          Finds how long ago an element was written
+            @param index    The index of the element
+            @param now      The current utime.ticks_us() value, read if not given
+            @return         The age of the element in microseconds
+        '''
+        if now is None:
+            now = utime.ticks_us()
+        return utime.ticks_diff(now, self.times[self._offset + index])
+
+    def max_age(self, now=None):
+        ''' @brief      Finds the age of the oldest element
+            @details    Elements come from different sensors, so the oldest element
+                        shows whether any of them has stopped updating.
+            @param now  The current utime.ticks_us() value, read if not given
+            @return     The age of the oldest element in microseconds
+        '''
+        if now is None:
+            now = utime.ticks_us()
+        oldest = 0
+        for n in range(self._offset, self._offset + self.size):
+            age = utime.ticks_diff(now, self.times[n])
+            if age > oldest:
+                oldest = age
+        return oldest
+
+    def read(self, index):
+        ''' @brief          Access a single element of the state vector
+            @param index    The index of the element
+            @return         The value of the element
+        '''
+        return self._buffer[index]
+
+    def read_into(self, out):
+        ''' @brief      Copies every element of the state vector into out
+            @param out  A list or array of at least size elements
+        '''
+        buf = self._buffer
+        for n in range(self.size):
+            out[n] = buf[n]
+
+    def view(self):
+        ''' @brief      Access the ulab array holding the state vector without copying it
+            @details    The array is updated in place by every write, so it may be
+                        kept and reused. It must not be written to directly.
+            @return     The ulab array of the elements
+        '''
+        return self._buffer
+
+class HistoryShare:
+    ''' @brief      A shared variable that keeps its most recent timestamped samples.
+        @details    Every write stores the value and its utime.ticks_us() time in a
+                    preallocated ring of the last size samples. The finite-difference
+                    derivative, moving average, and exponential filter are computed
+                    from the true time between samples, not from a nominal period,
+                    and each query takes the same time regardless of size. Rates are
+                    returned per microsecond, the unit of the tick counter.
+    '''
+    def __init__(self, size=8, tau=None, typecode='f'):
+        ''' @brief          Constructs a history with no samples
+            @param size     The number of samples kept, at least 2
+            @param tau      Optional time constant, in microseconds, of the exponential filter.
+                            Without it, ema() returns the latest value.
+            @param typecode The array typecode of the values
+        '''
+        ## @brief     The number of samples kept
+        self.size = size
+        ## @brief     Time constant, in microseconds, of the exponential filter
+        self.tau = tau
+        ## @brief     The latest values, oldest first starting at _next once the ring is full
+        self._values = array.array(typecode, size*[0])
+        ## @brief     The utime.ticks_us() times of the values
+        self._times = array.array('l', size*[0])
+        ## @brief     Index of the slot the next write goes to
+        self._next = 0
+        ## @brief     The number of samples in the ring
+        self.count = 0
+        ## @brief     Sum of the values in the ring, for the moving average
+        #  @details   Recomputed every time the ring index wraps so that rounding errors do not build up
+        self._sum = 0
+        ## @brief     Output of the exponential filter
+        self._ema = 0
+        ## @brief     Incremented on every write
+        #  @details   Kept below 2**30 so that it stays a small integer
+        self.seq = 0
+
+    def write(self, value, now=None):
+        ''' @brief          Adds a sample, replacing the oldest one once the ring is full
+            @param value    The new value
+            @param now      The utime.ticks_us() time of the sample, read if not given
+        '''
+        if now is None:
+            now = utime.ticks_us()
+        n = self._next
+        if self.count == 0:
+            self._ema = value
+        elif self.tau is None:
+            self._ema = value
+        else:
+            dt = utime.ticks_diff(now, self._times[n - 1 if n > 0 else self.size - 1])
+            self._ema += (value - self._ema)*dt/(self.tau + dt)
+        if self.count == self.size:
+            self._sum -= self._values[n]
+        else:
+            self.count += 1
+        self._values[n] = value
+        self._times[n] = now
+        self._sum += value
+        n += 1
+        if n == self.size:
+            n = 0
+            total = 0
+            for k in range(self.count):
+                total += self._values[k]
+            self._sum = total
+        self._next = n
+        self.seq = (self.seq + 1) & 0x3FFFFFFF
+
+    def _index(self, back):
+        ''' @brief      Returns the ring index of the sample written back writes ago
+        '''
+        n = self._next - 1 - back
+        if n < 0:
+            n += self.size
+        return n
+
+    def read(self, back=0):
+        ''' @brief      Access a recent value
+            @param back 0 for the latest value, 1 for the one before it, and so on
+            @return     The value
+        '''
+        return self._values[self._index(back)]
+
+    def time(self, back=0):
+        ''' @brief      Access the time of a recent value
+            @param back 0 for the latest value, 1 for the one before it, and so on
+            @return     The utime.ticks_us() time of the value
+        '''
+        return self._times[self._index(back)]
+
+    def derivative(self, lag=1):
+        ''' @brief      Finite-difference derivative over the true time between two samples
+            @details    A lag of 1 uses the last two samples. A larger lag averages the
+                        slope over more samples, which filters out measurement noise at
+                        the cost of delay. It is limited to the samples in the ring.
+            @param lag  How many samples back the earlier sample is
+            @return     The change per microsecond, or 0 with fewer than two samples
+        '''
+        if lag > self.count - 1:
+            lag = self.count - 1
+        if lag < 1:
+            return 0
+        new = self._index(0)
+        old = self._index(lag)
+        dt = utime.ticks_diff(self._times[new], self._times[old])
+        if dt <= 0:
+            return 0
+        return (self._values[new] - self._values[old])/dt
+
+    def average(self):
+        ''' @brief      Moving average of the samples in the ring
+            @return     The average, or 0 without samples
+        '''
+        if self.count == 0:
+            return 0
+        return self._sum/self.count
+
+    def ema(self):
+        ''' @brief      Exponentially filtered value
+            @details    The filter weight of every sample follows from the time since
+                        the previous one, so irregular sampling does not change the
+                        time constant.
+            @return     The filtered value
+        '''
+        return self._ema
+
+    def clear(self):
+        ''' @brief      Discards every sample
+        '''
+        self._next = 0
+        self.count = 0
+        self._sum = 0
@@ -20,14 +20,16 @@ class Task_IMU():
     
 
    
-    def __init__(self, period_IMU, IMU_obj, state_vect_x, calib_IMU_flag, state_vect_y):
+    def __init__(self, period_IMU, IMU_obj, state_vect_x, calib_IMU_flag, state_vect_y, read_IMU=True):
         ''' @brief                  Constructs an IMU task
             @details                Interfaces with IMU attached to top of platform
             @param period_IMU       The period, in microseconds, between runs of the IMU task
             @param IMU_obj          IMU object created to interface with IMU task
             @param calib_IMU_flag   A boolean flag used to enable IMU calibration
-            @param state_vect_x     List used to define state vector x
-            @param state_vect_y     List used to define state vector y
+            @param state_vect_x     State vector share used to define state vector x
+            @param state_vect_y     State vector share used to define state vector y
+            @param read_IMU         When False the task only handles calibration and leaves
+                                    the IMU readings to another task, such as timer_control.py
         '''
         ## @brief     The frequency of the IMU task
         #  @details   Defines variable that specifies timer frequency
@@ -38,12 +40,15 @@ class Task_IMU():
         ## @brief     A boolean flag used to start IMU calibration
         #  @details   Works with the task IMU and user interface to enable IMU calibration
         self.calib_IMU_flag = calib_IMU_flag
-        ## @brief     A shared list used to define state vector x
+        ## @brief     A shared StateVector used to define state vector x
         #  @details   Contains variables for x position, theta y, x velocity, and angular velocity (theta y dot)
         self.state_vect_x = state_vect_x
-        ## @brief     A shared list used to define state vector y
+        ## @brief     A shared StateVector used to define state vector y
         #  @details   Contains variables for y position, theta x, y velocity, and angular velocity (theta x dot)
         self.state_vect_y = state_vect_y
+        ## @brief     A boolean used to enable IMU readings
+        #  @details   Cleared when the IMU is read from the control timer callback instead
+        self.read_IMU = read_IMU
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -55,16 +60,17 @@ class Task_IMU():
         ''' @brief Runs one iteration of the FSM
         '''
         if self.state == S0_INIT:
-            #Constantly updating euler angle and angular velocity readings to state vector arrays
-            angle = self.IMU_obj.euler_angle()
-            
-            self.state_vect_x[1].write(angle[2])
-            self.state_vect_y[1].write(angle[1])
-
-            
-            angular_velocity = self.IMU_obj.angular_vel()
-            self.state_vect_x[3].write(angular_velocity[2])
-            self.state_vect_y[3].write(angular_velocity[1])
+            if self.read_IMU:
+                #Constantly updating euler angle and angular velocity readings to state vector arrays
+                angle = self.IMU_obj.euler_angle()
+                
+                self.state_vect_x.write_field(1, angle[2])
+                self.state_vect_y.write_field(1, angle[1])
+    
+                
+                angular_velocity = self.IMU_obj.angular_vel()
+                self.state_vect_x.write_field(3, angular_velocity[2])
+                self.state_vect_y.write_field(3, angular_velocity[1])
             
             if self.calib_IMU_flag.read() == 1:
                 self.state = S1_CALIBRATE
@@ -0,0 +1,353 @@
+'''@file        task_control.py
+   @brief       Fused sense, estimate, and control task.
+   @details     Implements a finite state machine that scans the touch panel,
+                reads the IMU, assembles both state vectors, runs both
+                controllers, and writes both motor duty cycles in one ordered
+                pass. Every controller output is therefore computed from panel
+                and IMU samples taken in the same tick. Each pass is timestamped
+                and the sensor-to-actuator latency, from the start of the panel
+                scan to the last duty cycle write, is recorded. Optionally, steady-state
+                Kalman filters from observer.py estimate the state vectors in place
+                of the raw measurements and finite-difference velocities.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import utime
+import array
+import shares
+import closedloop
+import touch_pan
+
+## @brief     State 0 of the control task
+#  @details   Creates an initial state condition for state 0. State 0 runs the control tick.
+S0_RUN = 0
+
+## @brief     State 1 of the control task
+#  @details   Creates an initial state condition for state 1. State 1 calibrates the touch panel.
+S1_CALIBRATE_PANEL = 1
+
+## @brief     State 2 of the control task
+#  @details   Creates an initial state condition for state 2. State 2 calibrates the IMU.
+S2_CALIBRATE_IMU = 2
+
+## @brief     Fastest ball speed, in mm/s, that Task_ControlFixed passes on as a velocity
+#  @details   Bounds the velocity state so that its product with the duty cycle gain
+#             stays far below the 2**31 limit of the viper closedloop.FixedLoop.run()
+MAX_BALL_SPEED = 2000
+
+class Task_Control():
+    ''' @brief      Control task that replaces the panel, IMU, and motor tasks with one ordered pass
+        @details    Implements a finite state machine for the fused control tick
+    '''
+
+    def __init__(self, period, panel_obj, IMU_obj, state_vect_x, state_vect_y, closedloop_1, closedloop_2, motor_1, motor_2,
+                 balance_flag, disable_flag, calib_pan_flag, calib_IMU_flag, observers=None):
+        ''' @brief                  Constructs a control task
+            @details                The control task is implemented as a finite state machine.
+            @param period           The period, in microseconds, between runs of the task
+            @param panel_obj        The panel object of the touch panel driver class
+            @param IMU_obj          IMU object used to read angles and angular velocities
+            @param state_vect_x     State vector share used to define state vector x
+            @param state_vect_y     State vector share used to define state vector y
+            @param closedloop_1     The controller object for motor 1
+            @param closedloop_2     The controller object for motor 2
+            @param motor_1          The motor object that calls motor 1
+            @param motor_2          The motor object that calls motor 2
+            @param balance_flag     A boolean flag used to start balancing the platform and/or ball
+            @param disable_flag     A boolean flag used to disable the motors
+            @param calib_pan_flag   A boolean flag used to enable touch panel calibration
+            @param calib_IMU_flag   A boolean flag used to enable IMU calibration
+            @param observers        Optional observer.Observer objects of the x and y axes that
+                                    estimate the state vectors from the panel and IMU measurements
+        '''
+        ## @brief     The period, in microseconds, of the task
+        self.period = period
+        ## @brief     The panel driver object
+        #  @details   This panel driver was defined in the main.py file
+        self.panel_obj = panel_obj
+        ## @brief     The IMU object
+        #  @details   This IMU driver was defined in the main.py file
+        self.IMU_obj = IMU_obj
+        ## @brief     A shared StateVector used to define state vector x
+        #  @details   Contains variables for x position, theta y, x velocity, and angular velocity (theta y dot)
+        self.state_vect_x = state_vect_x
+        ## @brief     A shared StateVector used to define state vector y
+        #  @details   Contains variables for y position, theta x, y velocity, and angular velocity (theta x dot)
+        self.state_vect_y = state_vect_y
+        ## @brief     The controller object for motor 1
+        self.closedloop_1 = closedloop_1
+        ## @brief     The controller object for motor 2
+        self.closedloop_2 = closedloop_2
+        ## @brief     The motor object that calls motor 1
+        self.motor_1 = motor_1
+        ## @brief     The motor object that calls motor 2
+        self.motor_2 = motor_2
+        ## @brief     A boolean flag used to start balancing the platform and/or ball
+        self.balance_flag = balance_flag
+        ## @brief     A boolean flag used to disable motors
+        #  @details   Cleared once both motors have been stopped
+        self.disable_flag = disable_flag
+        ## @brief     A boolean flag used to start touch panel calibration
+        self.calib_pan_flag = calib_pan_flag
+        ## @brief     A boolean flag used to start IMU calibration
+        self.calib_IMU_flag = calib_IMU_flag
+        ## @brief     The observer of the x axis, or None to use the raw measurements
+        self.observer_x = None
+        ## @brief     The observer of the y axis, or None to use the raw measurements
+        self.observer_y = None
+        if observers != None:
+            self.observer_x, self.observer_y = observers
+        ## @brief     Sets initial state to State 0
+        self.state = S0_RUN
+        ## @brief     Sets the number of runs to 0
+        #  @details   Velocities are only computed once a previous panel sample exists
+        self.runs = 0
+        ## @brief     Preallocated array for the euler angle readings
+        self.angle = array.array('f', 3*[0])
+        ## @brief     Preallocated array for the angular velocity readings
+        self.angular_velocity = array.array('f', 3*[0])
+        ## @brief     Recent x positions and the times they were read
+        self.x_hist = shares.HistoryShare(2)
+        ## @brief     Recent y positions and the times they were read
+        self.y_hist = shares.HistoryShare(2)
+        ## @brief     The utime.ticks_us() value at the start of the latest panel scan
+        #  @details   Timestamp of the position samples in the state vectors
+        self.panel_time = 0
+        ## @brief     The utime.ticks_us() value at the start of the latest IMU read
+        #  @details   Timestamp of the angle samples in the state vectors
+        self.IMU_time = 0
+        ## @brief     The utime.ticks_us() value of the latest duty cycle write
+        self.actuate_time = 0
+        ## @brief     Shortest sensor-to-actuator latency, in microseconds
+        self.latency_min = 0x3FFFFFFF
+        ## @brief     Longest sensor-to-actuator latency, in microseconds
+        self.latency_max = 0
+        ## @brief     Sum of the sensor-to-actuator latencies, in microseconds
+        #  @details   Cleared by print_latency() so that it stays a small integer
+        self.latency_sum = 0
+        ## @brief     Number of latencies summed in latency_sum
+        self.latency_count = 0
+        # The _into readers do not switch the BNO055 out of config mode the way
+        # euler_angle() and angular_vel() do, so it is put in operating mode once here
+        self.IMU_obj.set_operating()
+
+    def run(self):
+        ''' @brief Runs one iteration of the FSM
+        '''
+        if self.state == S0_RUN:
+            if self.calib_pan_flag.read() == 1:
+                self.transition_to(S1_CALIBRATE_PANEL)
+            elif self.calib_IMU_flag.read() == 1:
+                self.transition_to(S2_CALIBRATE_IMU)
+            else:
+                self.tick()
+
+        if self.state == S1_CALIBRATE_PANEL:
+            self.panel_obj.calibrate()
+            self.calib_pan_flag.write(0)
+            self.reset_estimate()
+            self.transition_to(S0_RUN)
+
+        if self.state == S2_CALIBRATE_IMU:
+            self.IMU_obj.set_calib_coef()
+            self.IMU_obj.set_operating()
+            self.transition_to(S0_RUN)
+
+    def reset_estimate(self):
+        ''' @brief Discards the sensor history after the touch panel has been calibrated
+        '''
+        self.x_hist.clear()
+        self.y_hist.clear()
+        if self.observer_x != None:
+            self.observer_x.reset()
+            self.observer_y.reset()
+        self.runs = 0
+
+    def tick(self):
+        ''' @brief Runs one ordered sense, estimate, and control pass
+        '''
+        #Sense: panel first, then IMU
+        panel_time = utime.ticks_us()
+        positions = self.panel_obj.get_coords()
+        self.IMU_time = utime.ticks_us()
+        self.IMU_obj.euler_angle_into(self.angle)
+        self.IMU_obj.angular_vel_into(self.angular_velocity)
+
+        #Estimate: the observers fuse the panel and IMU measurements with the
+        #duty cycles applied since the previous tick
+        if self.observer_x != None:
+            balancing = self.balance_flag.read() == 1
+            detected = self.panel_obj.z_ADC_flag == 1
+            self.observer_x.update(self.closedloop_1.L.read() if balancing else 0,
+                                   positions[0], self.angle[2], self.angular_velocity[2], detected)
+            self.observer_y.update(self.closedloop_2.L.read() if balancing else 0,
+                                   positions[1], self.angle[1], self.angular_velocity[1], detected)
+        else:
+            self.estimate(positions, panel_time)
+        self.panel_time = panel_time
+        self.runs += 1
+        self.actuate(panel_time)
+
+    def actuate(self, panel_time):
+        ''' @brief            Runs both controllers and writes both motor duty cycles
+            @param panel_time The utime.ticks_us() value at the start of the panel scan, for the latency
+        '''
+        if self.disable_flag.read() == 1:
+            self.motor_1.set_duty(0)
+            self.motor_2.set_duty(0)
+            self.balance_flag.write(0)
+            self.disable_flag.write(0)
+
+        elif self.balance_flag.read() == 1:
+            self.closedloop_1.run()
+            self.closedloop_2.run()
+            self.motor_1.set_duty(self.closedloop_1.L.read())
+            self.motor_2.set_duty(self.closedloop_2.L.read())
+            self.actuate_time = utime.ticks_us()
+            latency = utime.ticks_diff(self.actuate_time, panel_time)
+            if latency < self.latency_min:
+                self.latency_min = latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+            self.latency_sum += latency
+            self.latency_count += 1
+
+    def estimate(self, positions, panel_time):
+        ''' @brief            Writes the raw measurements and finite-difference velocities to the state vectors
+            @details          Velocities use the measured time between panel samples,
+                              in the same units as Task_Panel (position per microsecond)
+            @param positions  The x and y positions of the latest panel scan
+            @param panel_time The utime.ticks_us() value at the start of the panel scan
+        '''
+        self.x_hist.write(positions[0], panel_time)
+        self.y_hist.write(positions[1], panel_time)
+        self.state_vect_x.write_field(0, positions[0])
+        self.state_vect_y.write_field(0, positions[1])
+        self.state_vect_x.write_field(1, self.angle[2])
+        self.state_vect_y.write_field(1, self.angle[1])
+        if self.runs > 0:
+            self.state_vect_x.write_field(2, self.x_hist.derivative())
+            self.state_vect_y.write_field(2, self.y_hist.derivative())
+        self.state_vect_x.write_field(3, self.angular_velocity[2])
+        self.state_vect_y.write_field(3, self.angular_velocity[1])
+
+    def print_latency(self):
+        ''' @brief Prints the sensor-to-actuator latency statistics and then clears them
+        '''
+        if self.latency_count == 0:
+            print('Sensor-to-actuator latency: no control ticks while balancing')
+        else:
+            print('Sensor-to-actuator latency over {:} ticks: min {:} max {:} mean {:} [us]'.format(
+                  self.latency_count, self.latency_min, self.latency_max, self.latency_sum//self.latency_count))
+        self.latency_min = 0x3FFFFFFF
+        self.latency_max = 0
+        self.latency_sum = 0
+        self.latency_count = 0
+
+    def transition_to(self, new_state):
+        ''' @brief            Transitions the FSM to a new state
+            @details          A function that transitions the FSM to a new state
+            @param new_state  The state to transition to
+        '''
+        self.state = new_state
+
+class Task_ControlFixed(Task_Control):
+    ''' @brief      Fused control task that keeps the state vectors in integer sensor units
+        @details    Scans the touch panel into raw ADC counts and reads the raw BNO055
+                    registers, assembles the integer state vectors of two
+                    closedloop.FixedLoop controllers with fixed-point calibration
+                    coefficients, and writes their integer duty cycles. No floats are
+                    created during a tick. The float state vectors are not updated.
+    '''
+
+    def __init__(self, period, panel_obj, IMU_obj, state_vect_x, state_vect_y, closedloop_1, closedloop_2, motor_1, motor_2,
+                 balance_flag, disable_flag, calib_pan_flag, calib_IMU_flag):
+        ''' @brief                  Constructs a fixed-point control task
+            @details                The arguments are those of Task_Control, except that
+                                    closedloop_1 and closedloop_2 are closedloop.FixedLoop objects
+                                    and panel_obj must be created with fast=True, because only the
+                                    fast scans read the panel without creating objects.
+        '''
+        if not panel_obj.fast:
+            raise ValueError('Task_ControlFixed needs a Touch_Pan created with fast=True')
+        Task_Control.__init__(self, period, panel_obj, IMU_obj, state_vect_x, state_vect_y, closedloop_1, closedloop_2,
+                              motor_1, motor_2, balance_flag, disable_flag, calib_pan_flag, calib_IMU_flag)
+        ## @brief     Preallocated array for the x, y, and z ADC counts of the panel
+        self.counts = array.array('i', 3*[0])
+        ## @brief     Preallocated array for the raw euler angle registers
+        self.angle_raw = array.array('i', 3*[0])
+        ## @brief     Preallocated array for the raw angular velocity registers
+        self.rate_raw = array.array('i', 3*[0])
+        ## @brief     Fixed-point panel calibration coefficients
+        #  @details   Refreshed whenever the panel is calibrated
+        self.coeffs = array.array('i', 6*[0])
+        self.panel_obj.fixed_coefficients_into(self.coeffs, closedloop.POSITION_SCALE)
+        ## @brief     The contact flag of the previous panel scan
+        self.contact = 0
+        ## @brief     Largest change of position per period passed on as a velocity
+        #  @details   MAX_BALL_SPEED in the position units of the state vector
+        self.max_step = MAX_BALL_SPEED*closedloop.POSITION_SCALE*period//1000000
+
+    def reset_estimate(self):
+        ''' @brief Refreshes the fixed-point calibration and discards the previous position
+        '''
+        self.panel_obj.fixed_coefficients_into(self.coeffs, closedloop.POSITION_SCALE)
+        self.runs = 0
+
+    def tick(self):
+        ''' @brief Runs one ordered sense, estimate, and control pass in integer arithmetic
+            @details The velocity is the change of position scaled from the measured
+                     time between panel scans to the nominal period, so a late run
+                     does not inflate it. It is zero when the contact changed since the
+                     previous scan, where the position steps to or from zero.
+        '''
+        panel_time = utime.ticks_us()
+        counts = self.counts
+        self.panel_obj.scan_counts_into(counts)
+        self.IMU_time = utime.ticks_us()
+        self.IMU_obj.euler_angle_raw_into(self.angle_raw)
+        self.IMU_obj.angular_vel_raw_into(self.rate_raw)
+
+        c = self.coeffs
+        if self.panel_obj.calibrate_flag == 1 and self.panel_obj.z_ADC_flag == 0:
+            x = 0
+            y = 0
+        else:
+            x = (c[0]*counts[0] + c[1]*counts[1] + c[4]) >> touch_pan.CAL_SHIFT
+            y = (c[2]*counts[0] + c[3]*counts[1] + c[5]) >> touch_pan.CAL_SHIFT
+        s_x = self.closedloop_1.state
+        s_y = self.closedloop_2.state
+        contact = self.panel_obj.z_ADC_flag
+        if self.runs > 0:
+            dt = utime.ticks_diff(panel_time, self.panel_time)
+            if contact != self.contact or dt <= 0:
+                s_x[2] = 0
+                s_y[2] = 0
+            else:
+                s_x[2] = self.period_step(x - s_x[0], dt)
+                s_y[2] = self.period_step(y - s_y[0], dt)
+        self.contact = contact
+        s_x[0] = x
+        s_y[0] = y
+        s_x[1] = self.angle_raw[2]
+        s_y[1] = self.angle_raw[1]
+        s_x[3] = self.rate_raw[2]
+        s_y[3] = self.rate_raw[1]
+        self.panel_time = panel_time
+        self.runs += 1
+        self.actuate(panel_time)
+
+    def period_step(self, step, dt):
+        ''' @brief      Scales a change of position to one nominal period
+            @param step The change of position between two panel scans
+            @param dt   The time between the scans in microseconds
+            @return     The change per period, limited to max_step
+        '''
+        step = step*self.period//dt
+        if step > self.max_step:
+            return self.max_step
+        if step < -self.max_step:
+            return -self.max_step
+        return step
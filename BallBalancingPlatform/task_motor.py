@@ -35,7 +35,7 @@ class Task_Motor():
             @param motor_drv         The motor driver object that calls DRV8847
             @param enable_flag       A boolean flag used to enable a corresponding motor
             @param step_flag         A boolean flag used to start step response
-            @param L                 Variable used to define actuation level
+            @param L                 Timestamped share used to define actuation level
     '''
     
         ## @brief     The motor object that calls motors 1 or 2
@@ -53,10 +53,10 @@ class Task_Motor():
         ## @brief     A boolean flag used to disable motors
         #  @details   Works with the motor task and user interface to halt motor movement
         self.disable_flag = disable_flag
-        ## @brief     A shared list used to define state vector x
+        ## @brief     A shared StateVector used to define state vector x
         #  @details   Contains variables for x position, theta y, x velocity, and angular velocity (theta y dot)
         self.state_vect_x = state_vect_x
-        ## @brief     A shared list used to define state vector y
+        ## @brief     A shared StateVector used to define state vector y
         #  @details   Contains variables for y position, theta x, y velocity, and angular velocity (theta x dot)
         self.state_vect_y = state_vect_y
         ## @brief     The frequency of the task
@@ -71,6 +71,9 @@ class Task_Motor():
         ## @brief     The controller object that refers to closedloop.py
         #  @details   Creates the controller object used to perform closed loop speed control of the motors
         self.closedloop = closedloop
+        ## @brief     Sequence number of the actuation level last sent to the motor
+        #  @details   The duty cycle is only written again when the controller has written a new actuation level
+        self.L_seq = -1
 
         
     def run(self):
@@ -80,6 +83,7 @@ class Task_Motor():
         if self.state == S1_RUN:                                         
                                                          
                 if self.balance_flag.read() == 1:
+                   self.L_seq = -1
                    self.transition_to(S2_BALANCE)     
                       
                    
@@ -88,11 +92,15 @@ class Task_Motor():
             
               self.closedloop.run()      
               if self.motor_drv == None:
-                 self.motor_obj.set_duty(self.L.read())                   
+                 if self.L.changed_since(self.L_seq):
+                     self.L_seq = self.L.seq
+                     self.motor_obj.set_duty(self.L.read())                   
 
                   
               else:
-                  self.motor_obj.set_duty(self.L.read())
+                  if self.L.changed_since(self.L_seq):
+                      self.L_seq = self.L.seq
+                      self.motor_obj.set_duty(self.L.read())
                   
                   if self.disable_flag.read() == 1:
                       self.transition_to(S3_DISABLE)
@@ -42,13 +42,28 @@ S6_print_data = 6
 #  @details   Creates an initial state condition for state 7. State 7 disables motors 1 and 2 by setting the PWM levels to 0.
 S7_disable = 7
 
+## @brief     State 8 of the user interface task
+#  @details   Creates an initial state condition for state 8. State 8 prints the per-task run time and jitter statistics.
+S8_print_profile = 8
+
+## @brief     State 9 of the user interface task
+#  @details   Creates an initial state condition for state 9. State 9 prints the CPU load of each task and the overall CPU load.
+S9_print_load = 9
+
+## @brief     State 10 of the user interface task
+#  @details   Creates an initial state condition for state 10. State 10 prints the sensor-to-actuator latency of the fused control task.
+S10_print_latency = 10
+
+## @brief     State 11 of the user interface task
+#  @details   Creates an initial state condition for state 11. State 11 measures and prints the time of a full touch panel scan.
+S11_time_scan = 11
 
 
 class Task_User():
     ''' @brief      User interface task for data collection and interaction with all the tasks
         @details    Implements a finite state machine that communicates with the user to interface with all the tasks
     '''    
-    def __init__(self, period, balance_flag, calib_pan_flag, calib_IMU_flag, disable_flag, state_vect_x, state_vect_y, L_1, L_2):
+    def __init__(self, period, balance_flag, calib_pan_flag, calib_IMU_flag, disable_flag, state_vect_x, state_vect_y, L_1, L_2, profiler=None, load=None, control=None, panel=None):
         ''' @brief                  Constructs the user interface task
             @details                The user task is implemented as a finite state machine that interacts between the user and the program.
             @param period           The period, in microseconds, between runs of the task
@@ -58,8 +73,12 @@ class Task_User():
             @param disable_flag     A boolean flag used to disable the motors
             @param L_1              Variable used to define actuation level for motor 1
             @param L_2              Variable used to define actuation level for motor 2
-            @param state_vect_x     List used to define state vector x
-            @param state_vect_y     List used to define state vector y
+            @param state_vect_x     State vector share used to define state vector x
+            @param state_vect_y     State vector share used to define state vector y
+            @param profiler         Optional profiler object holding task timing statistics
+            @param load             Optional load monitor object holding CPU load statistics
+            @param control          Optional fused control task holding sensor-to-actuator latency statistics
+            @param panel            Optional touch panel object whose scan time can be measured
         '''
         ## @brief     The frequency of the task
         #  @details   Defines variable that specifies timer frequency
@@ -82,6 +101,9 @@ class Task_User():
         ## @brief     A variable used for indexing
         #  @details   This value helps index state vector points for data collection
         self.i = 0
+        ## @brief     A variable used for indexing
+        #  @details   This value tracks the next state vector point to print
+        self.print_i = 0
         ## @brief     A boolean flag used to start touch panel calibration
         #  @details   Works with the task panel and user interface to do resistive touch panel calibration
         self.calib_pan_flag = calib_pan_flag
@@ -91,10 +113,10 @@ class Task_User():
         ## @brief     A boolean flag used to disable motors
         #  @details   Works with the motor task and user interface to halt motor movement
         self.disable_flag = disable_flag
-        ## @brief     A shared list used to define state vector x
+        ## @brief     A shared StateVector used to define state vector x
         #  @details   Contains variables for x position, theta y, x velocity, and angular velocity (theta y dot)
         self.state_vect_x = state_vect_x
-        ## @brief     A shared list used to define state vector y
+        ## @brief     A shared StateVector used to define state vector y
         #  @details   Contains variables for y position, theta x, y velocity, and angular velocity (theta x dot)
         self.state_vect_y = state_vect_y     
         ## @brief     Variable used to define actuation level for motor 1
@@ -103,6 +125,18 @@ class Task_User():
         ## @brief     Variable used to define actuation level for motor 2
         #  @details   This value is calculated using input gain and torque
         self.L_2 = L_2
+        ## @brief     Profiler holding the run time and jitter statistics of every task
+        #  @details   May be None, in which case there are no statistics to print
+        self.profiler = profiler
+        ## @brief     Load monitor holding the time spent in each task and idling
+        #  @details   May be None, in which case there is no CPU load to print
+        self.load = load
+        ## @brief     Fused control task holding the sensor-to-actuator latency statistics
+        #  @details   May be None, in which case there is no latency to print
+        self.control = control
+        ## @brief     Touch panel object whose scan time is measured
+        #  @details   May be None, in which case there is no scan to time
+        self.panel = panel
         ## @brief     The utime.ticks_us() value associated with the next run of the FSM
         #  @details   Defines a variable that adds the period to the ongoing timer
         self.next_time = utime.ticks_add(utime.ticks_us(), self.period) 
@@ -149,37 +183,17 @@ class Task_User():
                       "\'c\' to calibrate the touch panel,",
                       "\'C\' to calibrate the IMU,",
                       "\'b\' to balance the ball and/or platform,",
-                      "\'d\' to collect state vector data.",sep="\n")
+                      "\'d\' to collect state vector data,",
+                      "\'p\' to print task timing statistics,",
+                      "\'u\' to print CPU utilization,",
+                      "\'l\' to print sensor-to-actuator latency,",
+                      "\'t\' to time a touch panel scan.",sep="\n")
                 self.state = S1_wait_for_char
                 
             elif self.state == S1_wait_for_char:
                         
                 if self.ser.any():
-                    char_in = self.ser.read(1).decode()
-                    
-                    if (char_in == 'e' or char_in == 'E'):
-                        self.transition_to(S7_disable)
-                    
-                    elif (char_in == 'c'):
-                        self.transition_to(S3_calibrate_panel)
-                        
-                    elif (char_in == 'C'):
-                        self.transition_to(S4_calibrate_IMU)
-                        
-                    elif (char_in == 'b'):
-                        print('Ball balance commencing... ')
-                        self.transition_to(S2_ball) 
-                    
-                    elif (char_in == 'd'):
-                        ## @brief     Starts timer for data collection
-                        #  @details   An increasing microsecond counter equal to current_time
-                        self.collect_time = current_time
-                        print('Printing state vector data... ')
-                        self.transition_to(S5_collect_data) 
-                    
-                    else:
-                        print('Command \'{:}\' is invalid.'.format(char_in))
-                        pass                                                        
+                    self.handle_char(self.ser.read(1).decode(), current_time)
             
             elif self.state == S2_ball:
                  self.balance_flag.write(1)
@@ -200,15 +214,15 @@ class Task_User():
              if self.time_diff <= 5:
                  
                  self.time_array[self.i] = self.time_diff
-                 self.x_array[self.i] = self.state_vect_x[0].read()
-                 self.thy_array[self.i] = self.state_vect_x[1].read()
-                 self.xd_array[self.i] = self.state_vect_x[2].read()
-                 self.thyd_array[self.i] = self.state_vect_x[3].read()
+                 self.x_array[self.i] = self.state_vect_x.read(0)
+                 self.thy_array[self.i] = self.state_vect_x.read(1)
+                 self.xd_array[self.i] = self.state_vect_x.read(2)
+                 self.thyd_array[self.i] = self.state_vect_x.read(3)
                  
-                 self.y_array[self.i] = self.state_vect_y[0].read()
-                 self.thx_array[self.i] = self.state_vect_y[1].read()
-                 self.yd_array[self.i] = self.state_vect_y[2].read()
-                 self.thxd_array[self.i] = self.state_vect_y[3].read()
+                 self.y_array[self.i] = self.state_vect_y.read(0)
+                 self.thx_array[self.i] = self.state_vect_y.read(1)
+                 self.yd_array[self.i] = self.state_vect_y.read(2)
+                 self.thxd_array[self.i] = self.state_vect_y.read(3)
                  
                  self.i += 1                   
                  
@@ -221,27 +235,103 @@ class Task_User():
                      
                      
             elif self.state == S6_print_data:
-                for number in range(self.i):
+                #Prints a few lines per run so that the control tasks can run between them
+                for number in range(self.print_i, min(self.print_i + 5, self.i)):
                      print(str(round(self.time_array[number], 2)) + '[s], ' +str(round(self.x_array[number], 2)) + ' x pos [mm], ' + str(round(self.thy_array[number], 2)) + ' theta_y [deg], ' + str(round(self.xd_array[number], 2)) + ' x-vel [mm/s],' + str(round(self.thyd_array[number], 2)) + ' ang vel(y) [deg/s],' + 
                           str(round(self.y_array[number], 2)) + ' y pos [mm], ' + str(round(self.thx_array[number], 2)) + ' theta_x [deg], ' + str(round(self.yd_array[number], 2)) + ' y-vel [mm/s],' + str(round(self.thxd_array[number], 2)) + ' ang vel(x) [deg/s]')
 
 #                    Use the code below to print data values without units (for ease of plotting)
 #                    print(str(round(self.time_array[number], 2)) + ', ' + str(round(self.x_array[number], 2)) + ', ' + str(round(self.thy_array[number], 2)) + ', ' + str(round(self.xd_array[number], 2)) + ', ' + str(round(self.thyd_array[number], 2)) + ', ' +
 #                          str(round(self.y_array[number], 2)) + ', ' + str(round(self.thx_array[number], 2)) + ', ' + str(round(self.yd_array[number], 2)) + ', ' + str(round(self.thxd_array[number], 2)))  
+                self.print_i += 5
             
-                else:
+                if self.print_i >= self.i:
                     print('Finished collecting data.')
+                    self.print_i = 0
+                    self.i = 0
                     self.transition_to(S0_init)
                     
             elif self.state == S7_disable:
                 self.disable_flag.write(1)
                 print('Motors disabled. Press b to recommence balancing.')
                 self.transition_to(S1_wait_for_char)    
+                
+            elif self.state == S8_print_profile:
+                if self.profiler == None:
+                    print('Task profiling is not enabled.')
+                else:
+                    self.profiler.dump()
+                self.transition_to(S1_wait_for_char)
+                
+            elif self.state == S9_print_load:
+                if self.load == None:
+                    print('CPU load monitoring is not enabled.')
+                else:
+                    self.load.report()
+                self.transition_to(S1_wait_for_char)
+                
+            elif self.state == S10_print_latency:
+                if self.control == None:
+                    print('Fused control is not enabled.')
+                else:
+                    self.control.print_latency()
+                self.transition_to(S1_wait_for_char)
+                
+            elif self.state == S11_time_scan:
+                if self.panel == None:
+                    print('No touch panel to time.')
+                else:
+                    print('Touch panel x, y, and z scan: {:.0f} us'.format(self.panel.scan_time_us()))
+                self.transition_to(S1_wait_for_char)
                                  
             else:
                     raise ValueError('Invalid State.')         
 
             
+    def handle_char(self, char_in, current_time):
+        ''' @brief              Handles one command character typed by the user
+            @details            Called from state 1 of run() when a character is waiting on
+                                the serial port, or directly by a runtime that reads the
+                                serial port itself, such as async_runtime.py.
+            @param char_in      The character typed by the user
+            @param current_time The utime.ticks_us() value when the character was received
+        '''
+        if (char_in == 'e' or char_in == 'E'):
+            self.transition_to(S7_disable)
+        
+        elif (char_in == 'c'):
+            self.transition_to(S3_calibrate_panel)
+            
+        elif (char_in == 'C'):
+            self.transition_to(S4_calibrate_IMU)
+            
+        elif (char_in == 'b'):
+            print('Ball balance commencing... ')
+            self.transition_to(S2_ball) 
+        
+        elif (char_in == 'd'):
+            ## @brief     Starts timer for data collection
+            #  @details   An increasing microsecond counter equal to the time the command was received
+            self.collect_time = current_time
+            print('Printing state vector data... ')
+            self.transition_to(S5_collect_data) 
+        
+        elif (char_in == 'p'):
+            self.transition_to(S8_print_profile)
+        
+        elif (char_in == 'u'):
+            self.transition_to(S9_print_load)
+        
+        elif (char_in == 'l'):
+            self.transition_to(S10_print_latency)
+        
+        elif (char_in == 't'):
+            self.transition_to(S11_time_scan)
+        
+        else:
+            print('Command \'{:}\' is invalid.'.format(char_in))
+            pass
+
     def transition_to(self, new_state):
         ''' @brief            Transitions the FSM to a new state
             @details          A function that transitions the FSM to a new state
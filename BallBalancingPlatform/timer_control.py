@@ -0,0 +1,168 @@
+'''@file        timer_control.py
+   @brief       Runs the IMU read, controllers, and motor duty writes from a hardware timer.
+   @details     In this mode the control path no longer depends on the foreground
+                task loop, so a slow print in Task_User or the blocking
+                Touch_Pan.calibrate() cannot stall it. The timer interrupt itself
+                only records a timestamp and hands the control step to
+                micropython.schedule(), which runs it between bytecodes of the
+                foreground program at the timer rate. Handing off this way keeps the
+                interrupt allocation-free while still allowing the controller to use
+                floats. The control step reuses preallocated buffers for the IMU
+                readings and communicates with the foreground tasks only through
+                shares.
+   @author      Faith Chau
+   @author      Luisa Chiu
+   @date        December 9, 2021
+'''
+
+import utime
+import micropython
+import array
+
+class TimerControl:
+    ''' @brief      Timer-driven control path for both motors
+        @details    Reads the IMU, updates the angle and angular velocity entries of
+                    both state vectors, runs both controllers, and writes both motor
+                    duty cycles once per timer period.
+    '''
+
+    def __init__(self, timer, IMU_obj, calib_IMU_flag, state_vect_x, state_vect_y, closedloop_1, closedloop_2, motor_1, motor_2, balance_flag, disable_flag,
+                 load=None, load_index=0):
+        ''' @brief                  Constructs the timer-driven control path
+            @details                The timer is not started until start() is called.
+            @param timer            A pyb.Timer object reserved for the control path
+            @param IMU_obj          IMU object used to read angles and angular velocities
+            @param calib_IMU_flag   A boolean flag; IMU reads are skipped while the IMU is being calibrated
+            @param state_vect_x     State vector share used to define state vector x
+            @param state_vect_y     State vector share used to define state vector y
+            @param closedloop_1     The controller object for motor 1
+            @param closedloop_2     The controller object for motor 2
+            @param motor_1          The motor object that calls motor 1
+            @param motor_2          The motor object that calls motor 2
+            @param balance_flag     A boolean flag used to start balancing the platform and/or ball
+            @param disable_flag     A boolean flag used to disable the motors
+            @param load             An optional profiler.LoadMonitor that accounts for the time of
+                                    the control steps, which run while the scheduler sleeps or
+                                    between the bytecodes of a task
+            @param load_index       The index of the load monitor entry of the control steps,
+                                    one not used by a scheduled task
+        '''
+        ## @brief     The timer that triggers the control path
+        #  @details   Reserved for the control path; must not be shared with the motor PWM timer
+        self.timer = timer
+        ## @brief     The IMU object
+        #  @details   This IMU driver was defined in the main.py file
+        self.IMU_obj = IMU_obj
+        ## @brief     A boolean flag used to start IMU calibration
+        #  @details   IMU reads are skipped while this flag is raised
+        self.calib_IMU_flag = calib_IMU_flag
+        ## @brief     A shared StateVector used to define state vector x
+        #  @details   Contains variables for x position, theta y, x velocity, and angular velocity (theta y dot)
+        self.state_vect_x = state_vect_x
+        ## @brief     A shared StateVector used to define state vector y
+        #  @details   Contains variables for y position, theta x, y velocity, and angular velocity (theta x dot)
+        self.state_vect_y = state_vect_y
+        ## @brief     The controller object for motor 1
+        self.closedloop_1 = closedloop_1
+        ## @brief     The controller object for motor 2
+        self.closedloop_2 = closedloop_2
+        ## @brief     The motor object that calls motor 1
+        self.motor_1 = motor_1
+        ## @brief     The motor object that calls motor 2
+        self.motor_2 = motor_2
+        ## @brief     A boolean flag used to start balancing the platform and/or ball
+        self.balance_flag = balance_flag
+        ## @brief     A boolean flag used to disable motors
+        #  @details   Cleared once both motors have been stopped
+        self.disable_flag = disable_flag
+        ## @brief     Preallocated array for the euler angle readings
+        self.angle = array.array('f', 3*[0])
+        ## @brief     Preallocated array for the angular velocity readings
+        self.angular_velocity = array.array('f', 3*[0])
+        ## @brief     Reference to the bound step() method
+        #  @details   Created once, because creating a bound method inside the interrupt would allocate
+        self._step_ref = self.step
+        ## @brief     Reference to the bound _isr() method passed to the timer
+        self._isr_ref = self._isr
+        ## @brief     True while a scheduled control step has not run yet
+        self.pending = False
+        ## @brief     The utime.ticks_us() value of the most recent timer interrupt
+        self.isr_time = 0
+        ## @brief     Number of timer interrupts that were dropped because the previous step had not run yet
+        self.missed = 0
+        ## @brief     Number of control steps completed
+        self.runs = 0
+        ## @brief     Delay, in microseconds, between the latest interrupt and the start of its control step
+        self.latency = 0
+        ## @brief     Longest delay, in microseconds, between an interrupt and the start of its control step
+        self.max_latency = 0
+        ## @brief     Duration, in microseconds, of the latest control step
+        self.run_time = 0
+        ## @brief     The optional load monitor the control steps are accounted in
+        #  @details   When None, the time of the control steps is not accounted
+        self.load = load
+        ## @brief     The index of the load monitor entry of the control steps
+        self.load_index = load_index
+        if load is not None:
+            load.set_name(load_index, 'TimerControl')
+
+    def start(self, freq):
+        ''' @brief      Starts running the control path
+            @param freq The control rate in Hz
+        '''
+        self.IMU_obj.set_operating()
+        self.timer.init(freq=freq)
+        self.timer.callback(self._isr_ref)
+
+    def stop(self):
+        ''' @brief      Stops the control path and sets both motor duty cycles to zero
+        '''
+        self.timer.callback(None)
+        self.motor_1.set_duty(0)
+        self.motor_2.set_duty(0)
+
+    def _isr(self, tim):
+        ''' @brief      Timer interrupt callback. Must not allocate.
+            @param tim  The timer that triggered the interrupt
+        '''
+        self.isr_time = utime.ticks_us()
+        if self.pending:
+            self.missed += 1
+        else:
+            self.pending = True
+            micropython.schedule(self._step_ref, 0)
+
+    def step(self, arg):
+        ''' @brief      Runs one iteration of the control path
+            @param arg  Unused argument passed by micropython.schedule()
+        '''
+        start_time = utime.ticks_us()
+        self.pending = False
+        self.latency = utime.ticks_diff(start_time, self.isr_time)
+        if self.latency > self.max_latency:
+            self.max_latency = self.latency
+
+        if self.calib_IMU_flag.read() == 0:
+            self.IMU_obj.euler_angle_into(self.angle)
+            self.IMU_obj.angular_vel_into(self.angular_velocity)
+            self.state_vect_x.write_field(1, self.angle[2])
+            self.state_vect_y.write_field(1, self.angle[1])
+            self.state_vect_x.write_field(3, self.angular_velocity[2])
+            self.state_vect_y.write_field(3, self.angular_velocity[1])
+
+        if self.disable_flag.read() == 1:
+            self.motor_1.set_duty(0)
+            self.motor_2.set_duty(0)
+            self.balance_flag.write(0)
+            self.disable_flag.write(0)
+
+        elif self.balance_flag.read() == 1:
+            self.closedloop_1.run()
+            self.closedloop_2.run()
+            self.motor_1.set_duty(self.closedloop_1.L.read())
+            self.motor_2.set_duty(self.closedloop_2.L.read())
+
+        self.runs += 1
+        self.run_time = utime.ticks_diff(utime.ticks_us(), start_time)
+        if self.load is not None:
+            self.load.interrupt_time(self.load_index, self.run_time)
@@ -20,19 +20,123 @@ OUT_PP = micropython.const(Pin.OUT_PP)
 ## @brief     Constant created for Pin.IN
 #  @details   Used to increase task speed
 IN = micropython.const(Pin.IN)
+## @brief     Constant created for Pin.ANALOG
+#  @details   Used to increase task speed
+ANALOG = micropython.const(Pin.ANALOG)
+## @brief     Smallest z ADC count that detects contact
+#  @details   The integer form of the z_ADC > 0.1 check of get_coords()
+Z_THRESHOLD = micropython.const(410)
+## @brief     Fraction bits of the fixed-point calibration coefficients
+CAL_SHIFT = micropython.const(12)
+## @brief     Contact state of the contact-first scan: no contact
+#  @details   Only z is scanned
+NO_CONTACT = micropython.const(0)
+## @brief     Contact state of the contact-first scan: contact seen in fewer than press_scans scans in a row
+#  @details   Only z is scanned, and z_ADC_flag stays 0
+PRESSING = micropython.const(1)
+## @brief     Contact state of the contact-first scan: contact confirmed
+#  @details   z, x, and y are scanned
+TOUCHING = micropython.const(2)
+## @brief     Contact state of the contact-first scan: contact lost in fewer than release_scans scans in a row
+#  @details   Only z is scanned, and the previous x and y counts and z_ADC_flag are kept
+RELEASING = micropython.const(3)
+## @brief     Default time, in microseconds, the fast scans wait after switching the pins before a read
+#  @details   The slow scans create their pin and ADC objects between switching the
+#             pins and reading, which takes longer than this on its own
+SETTLE_US = micropython.const(4)
+## @brief     Filter of the oversampled readings: the median of the samples
+MEDIAN = micropython.const(0)
+## @brief     Filter of the oversampled readings: the mean of the middle half of the sorted samples
+TRIMMED_MEAN = micropython.const(1)
+
+class BurstADC:
+    ''' @brief   Reads an ADC several times in a burst and filters the samples into one reading
+        @details Has the read() method of pyb.ADC, so a scan can use it in place of
+                 the ADC. The samples go into a buffer preallocated by the
+                 constructor, either in a loop of ADC.read() calls or with
+                 ADC.read_timed() paced by a timer, and are sorted in place. The
+                 median rejects single spikes, while the trimmed mean drops the
+                 lowest and highest quarter of the samples and averages the rest,
+                 which lowers random noise more for the same number of samples.
+    '''
+
+    def __init__ (self, adc, samples, sample_filter=MEDIAN, timer=None):
+        ''' @brief                  Constructs a burst reader
+            @param adc              The pyb.ADC to read
+            @param samples          The number of samples per reading
+            @param sample_filter    MEDIAN or TRIMMED_MEAN
+            @param timer            Optional pyb.Timer running at the sample rate of ADC.read_timed().
+                                    None reads the samples in a loop as fast as possible.
+        '''
+        ## @brief     The pyb.ADC to read
+        self.adc = adc
+        ## @brief     The number of samples per reading
+        self.samples = samples
+        ## @brief     MEDIAN or TRIMMED_MEAN
+        self.sample_filter = sample_filter
+        ## @brief     Timer pacing ADC.read_timed(), or None
+        self.timer = timer
+        ## @brief     The samples of the latest reading, sorted
+        self.buf = array.array('H', samples*[0])
+        ## @brief     Number of samples dropped at each end by the trimmed mean
+        self.trim = samples//4
+
+    # emitter: native
+    def read(self):
+        ''' @brief  Reads the samples and returns the filtered reading
+            @return The median or trimmed mean, rounded to a whole count
+        '''
+        buf = self.buf
+        n = self.samples
+        if self.timer is None:
+            adc = self.adc
+            for i in range(n):
+                buf[i] = adc.read()
+        else:
+            self.adc.read_timed(buf, self.timer)
+        # Insertion sort, which is fast for the few samples of a burst
+        for i in range(1, n):
+            value = buf[i]
+            j = i - 1
+            while j >= 0 and buf[j] > value:
+                buf[j + 1] = buf[j]
+                j -= 1
+            buf[j + 1] = value
+        if self.sample_filter == MEDIAN:
+            if n & 1:
+                return buf[n >> 1]
+            return (buf[(n >> 1) - 1] + buf[n >> 1] + 1) >> 1
+        total = 0
+        for i in range(self.trim, n - self.trim):
+            total += buf[i]
+        count = n - 2*self.trim
+        return (total + (count >> 1))//count
 
 class Touch_Pan:
     ''' @brief   Hardware driver to interface resistive touch panels with the STM32 microcontroller
         @details Scans X, Y, and Z components of contact point on touch panel by configuring 4 pin objects
     '''
 
-    def __init__ (self, x_p, x_m, y_p, y_m):
+    def __init__ (self, x_p, x_m, y_p, y_m, fast=False, contact_first=False, press_scans=2, release_scans=2,
+                  samples=(1, 1, 1), sample_filter=MEDIAN, timer=None, settle_us=SETTLE_US):
         ''' @brief              Constructs a touch panel object
             @details            The touch panel object is created from four touch panel pins configured to read the touch panel.
             @param x_p          Used to scan x component from touch panel, configured as a push-pull output 
             @param x_m          Used to scan x component from touch panel, configured as a push-pull output   
             @param y_p          Used to scan y component from touch panel, configured as a push-pull output
             @param y_m          Used to scan y component from touch panel, configured as a push-pull output 
+            @param fast         True to create the pin and ADC objects once and switch the pin
+                                modes in place on every scan, see scan_fast_into()
+            @param contact_first True to scan z first and skip x and y without debounced
+                                contact, see scan_contact_first_into(). Implies fast.
+            @param press_scans  Number of scans in a row with contact before the contact counts
+            @param release_scans Number of scans in a row without contact before the contact is lost
+            @param samples      The number of ADC samples of the x, y, and z readings. Readings of
+                                more than one sample are filtered by a BurstADC. Implies fast.
+            @param sample_filter MEDIAN or TRIMMED_MEAN, the filter of the oversampled readings
+            @param timer        Optional pyb.Timer that paces the samples with ADC.read_timed()
+            @param settle_us    Time, in microseconds, the fast scans wait after switching the pins
+                                before each read, so the panel voltage settles first
         '''
         ## @brief     Variable for pin reading x-component of contact point 
         #  @details   Used to locate touch in x-direction
@@ -61,6 +165,54 @@ class Touch_Pan:
         ## @brief     Array to define beta values
         #  @details   Used to calibrate the touch panel and account for center offset
         self.beta = array.array('f', 6*[0]) 
+        ## @brief     True if the scans reuse the pin and ADC objects created here
+        self.fast = fast or contact_first or max(samples) > 1
+        ## @brief     True if the scans measure z first and skip x and y without contact
+        self.contact_first = contact_first
+        ## @brief     Number of scans in a row with contact before the contact counts
+        self.press_scans = press_scans
+        ## @brief     Number of scans in a row without contact before the contact is lost
+        self.release_scans = release_scans
+        ## @brief     The debounced contact state of the contact-first scan
+        #  @details   One of NO_CONTACT, PRESSING, TOUCHING, and RELEASING
+        self.contact_state = NO_CONTACT
+        ## @brief     Number of scans in a row that agree with a pending contact change
+        self._debounce = 0
+        ## @brief     Time, in microseconds, the fast scans wait after switching the pins before each read
+        self.settle_us = settle_us
+        if self.fast:
+            ## @brief     ADC that reads the y and z scans on x_p
+            self._adc_x_p = pyb.ADC(x_p)
+            ## @brief     ADC that reads the x scan on y_m
+            self._adc_y_m = pyb.ADC(y_m)
+            ## @brief     The reader of the x scan, the ADC of y_m or a BurstADC of it
+            self._x_reader = self._adc_y_m
+            ## @brief     The reader of the y scan, the ADC of x_p or a BurstADC of it
+            self._y_reader = self._adc_x_p
+            ## @brief     The reader of the z scan, the ADC of x_p or a BurstADC of it
+            self._z_reader = self._adc_x_p
+            if samples[0] > 1:
+                self._x_reader = BurstADC(self._adc_y_m, samples[0], sample_filter, timer)
+            if samples[1] > 1:
+                self._y_reader = BurstADC(self._adc_x_p, samples[1], sample_filter, timer)
+            if samples[2] > 1:
+                self._z_reader = BurstADC(self._adc_x_p, samples[2], sample_filter, timer)
+            ## @brief     Pin object of x_p, switched between push-pull output and analog input
+            self._pin_x_p = Pin(x_p, ANALOG)
+            ## @brief     Pin object of x_m, switched between push-pull output and input
+            self._pin_x_m = Pin(x_m, OUT_PP)
+            ## @brief     Pin object of y_p, switched between push-pull output and input
+            self._pin_y_p = Pin(y_p, OUT_PP)
+            ## @brief     Pin object of y_m, switched between push-pull output, input, and analog input
+            self._pin_y_m = Pin(y_m, IN)
+            ## @brief     The counts of the latest scan of get_coords()
+            self._counts = array.array('i', 3*[0])
+            ## @brief     True while the pins are in the modes of the z scan
+            self._z_drive = True
+            self._pin_x_m.low()
+            self._pin_y_p.high()
+            ## @brief     The scan used by get_coords() and scan_counts_into()
+            self._scan_into = self.scan_contact_first_into if contact_first else self.scan_fast_into
 
     def get_x(self): 
         ''' @brief Reads x position. Returns uncalibrated values.
@@ -98,7 +250,7 @@ class Touch_Pan:
         
         self._z_y_p.high()
         self._z_x_m.low()
-        self.z_ADC = self.z_x_p.read()/4095
+        self.z_ADC = self._z_x_p.read()/4095
         if self.z_ADC > 0.1:
             self.z_ADC_flag = 1
         else:
@@ -106,9 +258,17 @@ class Touch_Pan:
             
         return self.z_ADC
     
+    # emitter: native
     def get_coords(self):
         ''' @brief Gets x, y, and z positions. Returns uncalibrated and calibrated values.
         '''
+        if self.fast:
+            counts = self._counts
+            self._scan_into(counts)
+            self.x_ADC = counts[0]
+            self.y_ADC = counts[1]
+            self.z_ADC = counts[2]/4095
+            return self._calibrated()
         self._x_x_p = Pin(self.x_p, OUT_PP)
         self._x_x_m = Pin(self.x_m, OUT_PP)
         self._x_y_p = Pin(self.y_p, IN)
@@ -117,7 +277,7 @@ class Touch_Pan:
         self._x_x_m.low()
         ## @brief Uncalibrated x-position values read by touch panel
         #  @details Measures x-position
-        self.x_ADC = self.x_y_m.read()
+        self.x_ADC = self._x_y_m.read()
         
         self._y_x_p = pyb.ADC(self.x_p)
         self._y_x_m = Pin(self.x_m, IN)
@@ -127,7 +287,7 @@ class Touch_Pan:
         self._y_y_m.low()
         ## @brief Uncalibrated y-position values read by touch panel
         #  @details Measures y-position
-        self.y_ADC = self.y_x_p.read()      
+        self.y_ADC = self._y_x_p.read()      
         
         self._z_x_p = pyb.ADC(self.x_p)
         self._z_x_m = Pin(self.x_m, OUT_PP)
@@ -139,14 +299,18 @@ class Touch_Pan:
         
         ## @brief Uncalibrated z-position values read by touch panel
         #  @details Measures z-position (contact with panel)
-        self.z_ADC = self.z_x_p.read()/4095
+        self.z_ADC = self._z_x_p.read()/4095
         
         if self.z_ADC > 0.1:
             self.z_ADC_flag = 1
         else:
             self.z_ADC_flag = 0
-            
-        
+        return self._calibrated()
+
+    # emitter: native
+    def _calibrated(self):
+        ''' @brief Applies the calibration to the latest scan. Returns uncalibrated and calibrated values.
+        '''
         if self.calibrate_flag == 1:
             ## @brief Calibrated x-position values read by touch panel
             #  @details Measures x-position accurately based on manual or automatic calibration constants
@@ -155,10 +319,7 @@ class Touch_Pan:
             #  @details Measures y-position accurately based on manual or automatic calibration constants
             self.y_ADC_cal = self.x_ADC*self.beta[2] + self.y_ADC*self.beta[3] + self.beta[5]
 
-            if self.z_ADC > 0.1:
-                self.z_ADC_flag = 1
-            else:
-                self.z_ADC_flag = 0 
+            if self.z_ADC_flag == 0:
                 self.x_ADC_cal = 0
                 self.y_ADC_cal = 0
             ## @brief Calibrated x and y positions read by panel
@@ -172,8 +333,214 @@ class Touch_Pan:
             return self.uncalibrated_pos
         
      
+    # emitter: native
+    def scan_counts_into(self, counts):
+        ''' @brief          Scans x, y, and z and stores the raw ADC counts
+            @details        Performs the same scan as get_coords() but keeps the readings as
+                            integers, without the division of the z reading and without
+                            applying the calibration. Only the fast scans, used when the
+                            panel was created with fast=True, create no objects; otherwise
+                            the pin and ADC objects of every scan are created like in
+                            get_coords(). Also sets z_ADC_flag.
+            @param counts   An integer array of at least three elements that receives the x, y, and z counts
+        '''
+        if self.fast:
+            self._scan_into(counts)
+            return
+        self._x_x_p = Pin(self.x_p, OUT_PP)
+        self._x_x_m = Pin(self.x_m, OUT_PP)
+        self._x_y_p = Pin(self.y_p, IN)
+        self._x_y_m = pyb.ADC(self.y_m)
+        self._x_x_p.high()
+        self._x_x_m.low()
+        counts[0] = self._x_y_m.read()
+
+        self._y_x_p = pyb.ADC(self.x_p)
+        self._y_x_m = Pin(self.x_m, IN)
+        self._y_y_p = Pin(self.y_p, OUT_PP)
+        self._y_y_m = Pin(self.y_m, OUT_PP)
+        self._y_y_p.high()
+        self._y_y_m.low()
+        counts[1] = self._y_x_p.read()
+
+        self._z_x_p = pyb.ADC(self.x_p)
+        self._z_x_m = Pin(self.x_m, OUT_PP)
+        self._z_y_p = Pin(self.y_p, OUT_PP)
+        self._z_y_m = Pin(self.y_m, IN)
+        self._z_y_p.high()
+        self._z_x_m.low()
+        counts[2] = self._z_x_p.read()
+        if counts[2] >= Z_THRESHOLD:
+            self.z_ADC_flag = 1
+        else:
+            self.z_ADC_flag = 0
+
+    # emitter: native
+    def scan_fast_into(self, counts):
+        ''' @brief          Scans x, y, and z with the pin and ADC objects created by the constructor
+            @details        Performs the same scan as scan_counts_into() without creating
+                            any objects. Between the scans only the pins whose mode changes
+                            are switched with Pin.init(), and the pins an ADC reads are
+                            switched to analog mode first. The scan starts from and ends in
+                            the pin modes of the z scan, except for x_m, which the x scan
+                            sets again. Every read waits settle_us after the pins are
+                            switched. Readings of more than one sample come from a
+                            BurstADC. Also sets z_ADC_flag.
+            @param counts   An integer array of at least three elements that receives the x, y, and z counts
+        '''
+        x_p = self._pin_x_p
+        x_m = self._pin_x_m
+        y_p = self._pin_y_p
+        y_m = self._pin_y_m
+        settle = self.settle_us
+        # x: x_p high, x_m low, y_p floating, read y_m
+        y_p.init(IN)
+        y_m.init(ANALOG)
+        x_m.init(OUT_PP)
+        x_m.low()
+        x_p.init(OUT_PP)
+        x_p.high()
+        utime.sleep_us(settle)
+        counts[0] = self._x_reader.read()
+        # y: y_p high, y_m low, x_m floating, read x_p
+        x_p.init(ANALOG)
+        x_m.init(IN)
+        y_m.init(OUT_PP)
+        y_m.low()
+        y_p.init(OUT_PP)
+        y_p.high()
+        utime.sleep_us(settle)
+        counts[1] = self._y_reader.read()
+        # z: y_p high, x_m low, y_m floating, read x_p
+        y_m.init(IN)
+        x_m.init(OUT_PP)
+        x_m.low()
+        utime.sleep_us(settle)
+        counts[2] = self._z_reader.read()
+        if counts[2] >= Z_THRESHOLD:
+            self.z_ADC_flag = 1
+        else:
+            self.z_ADC_flag = 0
+        self._z_drive = True
+
+    # emitter: native
+    def scan_contact_first_into(self, counts):
+        ''' @brief          Scans z, then x and y only while the ball is on the panel
+            @details        Scans z first and updates the debounced contact state: contact
+                            counts after press_scans scans in a row with contact and is lost
+                            after release_scans scans in a row without. x and y are only
+                            scanned in the TOUCHING state. Otherwise counts[0] and counts[1]
+                            keep their previous values, so with no ball on the panel a scan
+                            is one ADC read, and the pins stay in the modes of the z scan.
+                            A read waits settle_us only when the pins were switched for it.
+                            Sets z_ADC_flag to 1 while the contact counts, in the TOUCHING
+                            and RELEASING states.
+            @param counts   An integer array of at least three elements that receives the x, y, and z counts
+        '''
+        x_p = self._pin_x_p
+        x_m = self._pin_x_m
+        y_p = self._pin_y_p
+        y_m = self._pin_y_m
+        # z: y_p high, x_m low, y_m floating, read x_p
+        if not self._z_drive:
+            y_m.init(IN)
+            x_m.init(OUT_PP)
+            x_m.low()
+            self._z_drive = True
+            utime.sleep_us(self.settle_us)
+        counts[2] = self._z_reader.read()
+        state = self.contact_state
+        if counts[2] >= Z_THRESHOLD:
+            if state == NO_CONTACT or state == PRESSING:
+                self._debounce = self._debounce + 1 if state == PRESSING else 1
+                state = TOUCHING if self._debounce >= self.press_scans else PRESSING
+            else:
+                state = TOUCHING
+        else:
+            if state == TOUCHING or state == RELEASING:
+                self._debounce = self._debounce + 1 if state == RELEASING else 1
+                state = NO_CONTACT if self._debounce >= self.release_scans else RELEASING
+            else:
+                state = NO_CONTACT
+        self.contact_state = state
+        if state == TOUCHING or state == RELEASING:
+            self.z_ADC_flag = 1
+        else:
+            self.z_ADC_flag = 0
+        if state != TOUCHING:
+            return
+        # x: x_p high, x_m low, y_p floating, read y_m
+        y_p.init(IN)
+        y_m.init(ANALOG)
+        x_p.init(OUT_PP)
+        x_p.high()
+        utime.sleep_us(self.settle_us)
+        counts[0] = self._x_reader.read()
+        # y: y_p high, y_m low, x_m floating, read x_p
+        x_p.init(ANALOG)
+        x_m.init(IN)
+        y_m.init(OUT_PP)
+        y_m.low()
+        y_p.init(OUT_PP)
+        y_p.high()
+        utime.sleep_us(self.settle_us)
+        counts[1] = self._y_reader.read()
+        self._z_drive = False
+
+    def scan_time_us(self, scans=20):
+        ''' @brief          Measures the time of a full x, y, and z scan
+            @details        Times scan_fast_into() when the panel uses the fast scans,
+                            including a contact-first panel, so the time is that of a scan
+                            with the ball on the panel whether or not it is there. The
+                            debounced contact state and z_ADC_flag are left as they were.
+                            Otherwise times the scan of scan_counts_into() that creates
+                            its pin and ADC objects.
+            @param scans    The number of scans to average
+            @return         The mean time of one scan in microseconds
+        '''
+        counts = array.array('i', 3*[0])
+        scan = self.scan_fast_into if self.fast else self.scan_counts_into
+        flag = self.z_ADC_flag
+        start = utime.ticks_us()
+        for n in range(scans):
+            scan(counts)
+        elapsed = utime.ticks_diff(utime.ticks_us(), start)
+        self.z_ADC_flag = flag
+        return elapsed/scans
+
+    def fixed_coefficients_into(self, coeffs, scale):
+        ''' @brief          Converts the calibration to fixed-point integer coefficients
+            @details        With the coefficients, a position in units of 1/scale mm is
+                            (coeffs[0]*x + coeffs[1]*y + coeffs[4]) >> CAL_SHIFT for x and
+                            (coeffs[2]*x + coeffs[3]*y + coeffs[5]) >> CAL_SHIFT for y, where
+                            x and y are the counts from scan_counts_into(). Before the panel is
+                            calibrated the coefficients pass the counts through unscaled, one
+                            position unit per count, so that the products stay well below 2**30.
+                            Like the uncalibrated readings of get_coords() these are not positions.
+            @param coeffs   An integer array of at least six elements that receives the coefficients
+            @param scale    The number of position units per mm
+        '''
+        if self.calibrate_flag == 1:
+            for n in range(6):
+                coeffs[n] = int(round(self.beta[n]*scale*(1 << CAL_SHIFT)))
+        else:
+            for n in range(6):
+                coeffs[n] = 0
+            coeffs[0] = 1 << CAL_SHIFT
+            coeffs[3] = 1 << CAL_SHIFT
+
     def calibrate(self):
         ''' @brief Calibrates touch panel
+            @details Blocks until the calibration is finished. calibrate_steps() performs the
+                     same calibration in steps so that other tasks can run while waiting for contact.
+        '''
+        for delay in self.calibrate_steps():
+            utime.sleep(delay)
+
+    def calibrate_steps(self):
+        ''' @brief Calibrates touch panel one contact check at a time
+            @details A generator that yields the time, in seconds, to wait before each contact
+                     check. The calibration is finished when the generator is exhausted.
         '''
         filename = "RT_cal_coeffs.txt"
         if filename in os.listdir():
@@ -213,7 +580,7 @@ class Touch_Pan:
             self.i = 0
             print('Place a finger on the ' + str(self.panel_coords_instr[self.i]))
             while self.i <= (len(self.panel_meas)-1): 
-                utime.sleep(.4)
+                yield .4
                 self.get_coords()
 
                 if self.z_ADC_flag == 1:
@@ -8,6 +8,7 @@
 '''
 
 import utime
+import scheduling
 
 ## @brief     State 1 of the user interface task
 #  @details   Creates an initial state condition for state 1
@@ -18,7 +19,7 @@ class Task_Encoder():
         @details    Implements a finite state machine that interacts with the encoder driver and task user interface
 
     '''
-    def __init__(self, period, enc_pos, z_flag, enc_delta, enc_obj, my_Q):
+    def __init__(self, period, enc_pos, z_flag, enc_delta, enc_obj, my_Q, policy=scheduling.RESYNC):
         ''' @brief              Constructs an encoder task
             @details            The encoder task is implemented as a finite state machine
             @param period       The period, in microseconds, between runs of the task
@@ -27,6 +28,7 @@ class Task_Encoder():
             @param enc_delta    The change in time increments in timer count
             @param enc_obj      The encoder object that calls encoders 1 or 2
             @param my_Q         A shares object that represents the queue for holding list items
+            @param policy       What to do when the task starts after its next release: scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC
         '''
         ## @brief     The frequency of the task
         #  @details   Defines variable that specifies timer frequency
@@ -49,6 +51,12 @@ class Task_Encoder():
         ## @brief     Sets initial state to State 1
         #  @details   FSM starts at State 1, where the update function is called for encoder object
         self.state = S1_UPDATE
+        ## @brief     The overrun policy of the task
+        #  @details   One of scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC, applied by scheduling.next_release()
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted by scheduling.next_release()
+        self.missed = 0
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -74,7 +82,7 @@ class Task_Encoder():
                 self.enc_delta.write(self.enc_obj.get_delta())
                 self.z_flag.write(0)
             
-            self.next_time = utime.ticks_add(self.next_time, self.period)
+            scheduling.next_release(self, current_time)
             self.runs += 1
             
                 
@@ -7,6 +7,7 @@
     \image html  Lab2_TaskUser_FSM.png "Task User FSM"
 '''
 import utime
+import scheduling
 import pyb
 
 ## @brief     State 0 of the user interface task
@@ -30,7 +31,7 @@ class Task_User():
     ''' @brief      User interface task for data collection and interaction with encoder object
         @details    Implements a finite state machine that runs a data collection interface to interact with the encoder object.
     '''    
-    def __init__(self, period, enc_pos, z_flag, enc_delta, my_Q):
+    def __init__(self, period, enc_pos, z_flag, enc_delta, my_Q, policy=scheduling.RESYNC):
         ''' @brief              Constructs the user interface task
             @details            The user task is implemented as a finite state machine that takes in character input from the user and obtains information from the encoder task to present to user.
             @param period       The period, in microseconds, between runs of the task
@@ -38,6 +39,7 @@ class Task_User():
             @param z_flag       A boolean flag used to reset encoder position to 0
             @param enc_delta    The change in time increments in timer count
             @param my_Q         A shares object that represents the queue for holding list items
+            @param policy       What to do when the task starts after its next release: scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC
         '''
         ## @brief     The frequency of the task
         #  @details   Defines variable that specifies timer frequency
@@ -57,6 +59,12 @@ class Task_User():
         ## @brief     Sets initial state to State 0
         #  @details   FSM starts at State 0, where user input is prompted for further action
         self.state = S0_init
+        ## @brief     The overrun policy of the task
+        #  @details   One of scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC, applied by scheduling.next_release()
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted by scheduling.next_release()
+        self.missed = 0
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -136,7 +144,7 @@ class Task_User():
             else:
                 raise ValueError('Invalid State')
             
-            self.next_time = utime.ticks_add(self.next_time, self.period)
+            scheduling.next_release(self, current_time)
             self.runs += 1
             
     def transition_to(self, new_state):
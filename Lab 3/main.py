@@ -67,17 +67,19 @@ def main():
     enc_delta_2 = shares.Share(0)
     dutycycle_1 = shares.Share(0)
     dutycycle_2 = shares.Share(0)   
+    enc_hist_1 = shares.HistoryShare(2, typecode='l')
+    enc_hist_2 = shares.HistoryShare(2, typecode='l')
     
     ## @brief        Creates a parameterized task constructor for task_userinterface.py
     #  @details      The constructor takes input arguments and objects and passes them into user task
     task1 = task_userinterface.Task_User(period, enc_pos_1, enc_pos_2, z_flag_1, z_flag_2, fault_user_flag, enable_flag, enc_delta_1,
-                                         enc_delta_2, dutycycle_1, dutycycle_2)
+                                         enc_delta_2, dutycycle_1, dutycycle_2, enc_hist_1, enc_hist_2)
     ## @brief        Creates a parameterized task constructor for task_encoder.py corresponding to encoder 1
     #  @details      The constructor takes input arguments and objects and interacts with both the encoder driver and user task
-    task2 = task_encoder.Task_Encoder(period, enc_pos_1, z_flag_1, enc_delta_1, encoder1)
+    task2 = task_encoder.Task_Encoder(period, enc_pos_1, z_flag_1, enc_delta_1, encoder1, enc_hist_1)
     ## @brief        Creates a parameterized task constructor for task_encoder.py corresponding to encoder 2
     #  @details      The constructor takes input arguments and objects and interacts with both the encoder driver and user task   
-    task3 = task_encoder.Task_Encoder(period, enc_pos_2, z_flag_2, enc_delta_2, encoder2)
+    task3 = task_encoder.Task_Encoder(period, enc_pos_2, z_flag_2, enc_delta_2, encoder2, enc_hist_2)
     ## @brief        Creates a parameterized task constructor for task_motor.py corresponding to motor 1
     #  @details      The constructor takes input arguments and objects and passes them into user task
     task4 = task_motor.Task_Motor(period, motor_1, motor_drv, fault_user_flag, enable_flag, dutycycle_1)
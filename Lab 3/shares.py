@@ -4,6 +4,9 @@
                 multiple tasks.
 '''
 
+import array
+import utime
+
 class Share:
     ''' @brief      A standard shared variable.
         @details    Values can be accessed with read() or changed with write()
@@ -54,4 +57,138 @@ class Queue:
         ''' @brief      Find the number of items in the queue. Call before get().
             @return     The number of items in the queue
         '''
-        return len(self._buffer)
\ No newline at end of file
+        return len(self._buffer)
+
+class HistoryShare:
+    ''' @brief      A shared variable that keeps its most recent timestamped samples.
+        @details    Every write stores the value and its utime.ticks_us() time in a
+                    preallocated ring of the last size samples. The finite-difference
+                    derivative, moving average, and exponential filter are computed
+                    from the true time between samples, not from a nominal period,
+                    and each query takes the same time regardless of size. Rates are
+                    returned per microsecond, the unit of the tick counter.
+    '''
+    def __init__(self, size=8, tau=None, typecode='f'):
+        ''' @brief          Constructs a history with no samples
+            @param size     The number of samples kept, at least 2
+            @param tau      Optional time constant, in microseconds, of the exponential filter.
+                            Without it, ema() returns the latest value.
+            @param typecode The array typecode of the values
+        '''
+        ## @brief     The number of samples kept
+        self.size = size
+        ## @brief     Time constant, in microseconds, of the exponential filter
+        self.tau = tau
+        ## @brief     The latest values, oldest first starting at _next once the ring is full
+        self._values = array.array(typecode, size*[0])
+        ## @brief     The utime.ticks_us() times of the values
+        self._times = array.array('l', size*[0])
+        ## @brief     Index of the slot the next write goes to
+        self._next = 0
+        ## @brief     The number of samples in the ring
+        self.count = 0
+        ## @brief     Sum of the values in the ring, for the moving average
+        #  @details   Recomputed every time the ring index wraps so that rounding errors do not build up
+        self._sum = 0
+        ## @brief     Output of the exponential filter
+        self._ema = 0
+        ## @brief     Incremented on every write
+        #  @details   Kept below 2**30 so that it stays a small integer
+        self.seq = 0
+
+    def write(self, value, now=None):
+        ''' @brief          Adds a sample, replacing the oldest one once the ring is full
+            @param value    The new value
+            @param now      The utime.ticks_us() time of the sample, read if not given
+        '''
+        if now is None:
+            now = utime.ticks_us()
+        n = self._next
+        if self.count == 0:
+            self._ema = value
+        elif self.tau is None:
+            self._ema = value
+        else:
+            dt = utime.ticks_diff(now, self._times[n - 1 if n > 0 else self.size - 1])
+            self._ema += (value - self._ema)*dt/(self.tau + dt)
+        if self.count == self.size:
+            self._sum -= self._values[n]
+        else:
+            self.count += 1
+        self._values[n] = value
+        self._times[n] = now
+        self._sum += value
+        n += 1
+        if n == self.size:
+            n = 0
+            total = 0
+            for k in range(self.count):
+                total += self._values[k]
+            self._sum = total
+        self._next = n
+        self.seq = (self.seq + 1) & 0x3FFFFFFF
+
+    def _index(self, back):
+        ''' @brief      Returns the ring index of the sample written back writes ago
+        '''
+        n = self._next - 1 - back
+        if n < 0:
+            n += self.size
+        return n
+
+    def read(self, back=0):
+        ''' @brief      Access a recent value
+            @param back 0 for the latest value, 1 for the one before it, and so on
+            @return     The value
+        '''
+        return self._values[self._index(back)]
+
+    def time(self, back=0):
+        ''' @brief      Access the time of a recent value
+            @param back 0 for the latest value, 1 for the one before it, and so on
+            @return     The utime.ticks_us() time of the value
+        '''
+        return self._times[self._index(back)]
+
+    def derivative(self, lag=1):
+        ''' @brief      Finite-difference derivative over the true time between two samples
+            @details    A lag of 1 uses the last two samples. A larger lag averages the
+                        slope over more samples, which filters out measurement noise at
+                        the cost of delay. It is limited to the samples in the ring.
+            @param lag  How many samples back the earlier sample is
+            @return     The change per microsecond, or 0 with fewer than two samples
+        '''
+        if lag > self.count - 1:
+            lag = self.count - 1
+        if lag < 1:
+            return 0
+        new = self._index(0)
+        old = self._index(lag)
+        dt = utime.ticks_diff(self._times[new], self._times[old])
+        if dt <= 0:
+            return 0
+        return (self._values[new] - self._values[old])/dt
+
+    def average(self):
+        ''' @brief      Moving average of the samples in the ring
+            @return     The average, or 0 without samples
+        '''
+        if self.count == 0:
+            return 0
+        return self._sum/self.count
+
+    def ema(self):
+        ''' @brief      Exponentially filtered value
+            @details    The filter weight of every sample follows from the time since
+                        the previous one, so irregular sampling does not change the
+                        time constant.
+            @return     The filtered value
+        '''
+        return self._ema
+
+    def clear(self):
+        ''' @brief      Discards every sample
+        '''
+        self._next = 0
+        self.count = 0
+        self._sum = 0
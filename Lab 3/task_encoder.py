@@ -8,6 +8,7 @@
 '''
 
 import utime
+import scheduling
 
 ## @brief     State 1 of the user interface task
 #  @details   Creates an initial state condition for state 1
@@ -18,7 +19,7 @@ class Task_Encoder():
         @details    Implements a finite state machine that interacts with the encoder driver and task user interface
 
     '''
-    def __init__(self, period, enc_pos, z_flag, enc_delta, encoder_obj):
+    def __init__(self, period, enc_pos, z_flag, enc_delta, encoder_obj, enc_hist=None, policy=scheduling.RESYNC):
         ''' @brief                Constructs an encoder task
             @details              The encoder task is implemented as a finite state machine
             @param period         The period, in microseconds, between runs of the task
@@ -26,6 +27,8 @@ class Task_Encoder():
             @param z_flag         A boolean flag used to reset encoder position to 0
             @param enc_delta      The change in time increments in timer count
             @param encoder_obj    The encoder object that calls encoders 1 or 2
+            @param enc_hist       Optional shares.HistoryShare that receives every encoder position with its time
+            @param policy         What to do when the task starts after its next release: scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC
         '''
         ## @brief     The frequency of the task
         #  @details   Defines variable that specifies timer frequency
@@ -42,9 +45,18 @@ class Task_Encoder():
         ## @brief     The change in position
         #  @details   The difference between two recorded positions of the encoder
         self.enc_delta = enc_delta
+        ## @brief     Recent encoder positions and the times they were read
+        #  @details   Lets other tasks find the velocity from the true time between updates
+        self.enc_hist = enc_hist
         ## @brief     Sets initial state to State 1
         #  @details   FSM starts at State 1, where the update function is called for encoder object
         self.state = S1_UPDATE
+        ## @brief     The overrun policy of the task
+        #  @details   One of scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC, applied by scheduling.next_release()
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted by scheduling.next_release()
+        self.missed = 0
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -64,15 +76,20 @@ class Task_Encoder():
                self.encoder_obj.update()
                self.enc_pos.write(self.encoder_obj.get_position())
                self.enc_delta.write(self.encoder_obj.get_delta())
+               if self.enc_hist is not None:
+                   self.enc_hist.write(self.encoder_obj.get_position(), current_time)
 
             if self.z_flag.read() == 1:
                 self.encoder_obj.set_position(0)
                 self.encoder_obj.update()
                 self.enc_pos.write(self.encoder_obj.get_position())
                 self.enc_delta.write(self.encoder_obj.get_delta())
+                if self.enc_hist is not None:
+                    self.enc_hist.clear()
+                    self.enc_hist.write(self.encoder_obj.get_position(), current_time)
                 self.z_flag.write(0)
                 
-            self.next_time = utime.ticks_add(self.next_time, self.period)
+            scheduling.next_release(self, current_time)
             self.runs += 1
       
                 
@@ -11,6 +11,7 @@
 
 import utime
 import shares
+import scheduling
 
 dutycycle_1 = shares.Share(0)
 dutycycle_2 = shares.Share(0)
@@ -33,7 +34,7 @@ class Task_Motor():
     ''' @brief      Motor task that creates variables for motor driver functions and parameters
         @details    Implements a finite state machine for lab 3
     '''
-    def __init__(self, period, motor_obj, motor_drv, fault_user_flag, enable_flag, dutycycle):
+    def __init__(self, period, motor_obj, motor_drv, fault_user_flag, enable_flag, dutycycle, policy=scheduling.RESYNC):
         ''' @brief                   Constructs a motor task
             @details                 The motor task is implemented as a finite state machine.
             @param period            The period, in microseconds, between runs of the task
@@ -42,6 +43,7 @@ class Task_Motor():
             @param fault_user_flag   A boolean flag used to alert user of fault for a corresponding motor
             @param enable_flag       A boolean flag used to enable a corresponding motor
             @param dutycycle         A variable that defines duty cycle for a corresponding motor
+            @param policy            What to do when the task starts after its next release: scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC
     '''
         
         ## @brief     A boolean flag used to alert user of fault for a corresponding motor
@@ -65,6 +67,12 @@ class Task_Motor():
         ## @brief     Initializes starting state to be state 2
         #  @details   Motors begin in the stop state
         self.state = S2_STOP
+        ## @brief     The overrun policy of the task
+        #  @details   One of scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC, applied by scheduling.next_release()
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted by scheduling.next_release()
+        self.missed = 0
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -130,7 +138,7 @@ class Task_Motor():
                           print('Fault cleared!') 
                           self.transition_to(S2_STOP)
 
-            self.next_time = utime.ticks_add(self.next_time, self.period)
+            scheduling.next_release(self, current_time)
             self.runs += 1                
                 
                 
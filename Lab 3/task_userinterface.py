@@ -7,6 +7,7 @@
     \image html  Lab3_TaskUser_FSM.png "Lab 3 Task User FSM"
 '''
 import utime
+import scheduling
 import pyb
 import math
 import array
@@ -83,7 +84,8 @@ class Task_User():
     ''' @brief      User interface task for data collection and interaction with encoder object
         @details    Implements a finite state machine that runs a data collection interface to interact with the encoder object.
     '''    
-    def __init__(self, period, enc_pos_1, enc_pos_2, z_flag_1, z_flag_2, fault_user_flag, enable_flag, enc_delta_1, enc_delta_2, dutycycle_1, dutycycle_2):
+    def __init__(self, period, enc_pos_1, enc_pos_2, z_flag_1, z_flag_2, fault_user_flag, enable_flag, enc_delta_1, enc_delta_2, dutycycle_1, dutycycle_2,
+                 enc_hist_1=None, enc_hist_2=None, policy=scheduling.RESYNC):
         ''' @brief                  Constructs the user interface task
             @details                The user task is implemented as a finite state machine that takes in character input from the user and obtains information from the encoder task to present to user.
             @param period           The period, in microseconds, between runs of the task
@@ -97,6 +99,9 @@ class Task_User():
             @param enc_delta_2      The change in time increments in timer count for encoder 2
             @param dutycycle_1      A variable that defines duty cycle for motor 1
             @param dutycycle_2      A variable that defines duty cycle for motor 2
+            @param enc_hist_1       Optional history of encoder 1 positions used to calculate velocity
+            @param enc_hist_2       Optional history of encoder 2 positions used to calculate velocity
+            @param policy           What to do when the task starts after its next release: scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC
         '''
         ## @brief     The frequency of the task
         #  @details   Defines variable that specifies timer frequency
@@ -113,6 +118,12 @@ class Task_User():
         ## @brief     The change in encoder 2 position
         #  @details   The difference between two recorded positions of the encoder        
         self.enc_delta_2 = enc_delta_2
+        ## @brief     Recent encoder 1 positions and the times they were read
+        #  @details   When given, velocity is calculated from the true time between encoder updates
+        self.enc_hist_1 = enc_hist_1
+        ## @brief     Recent encoder 2 positions and the times they were read
+        #  @details   When given, velocity is calculated from the true time between encoder updates
+        self.enc_hist_2 = enc_hist_2
         ## @brief     A boolean flag used to reset encoder 1 position to 0
         #  @details   When character "z" is pressed on the keyboard, z-flag will be 'True' and reset encoder 1 position
         self.z_flag_1 = z_flag_1
@@ -122,6 +133,12 @@ class Task_User():
         ## @brief     Sets initial state to State 0
         #  @details   FSM starts at State 0, where user input is prompted for further action
         self.state = S0_init
+        ## @brief     The overrun policy of the task
+        #  @details   One of scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC, applied by scheduling.next_release()
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted by scheduling.next_release()
+        self.missed = 0
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -256,7 +273,10 @@ class Task_User():
             elif self.state == S2_collect_data_1:
                  ## @brief     Creates a variable that calculates velocity for motor 1
                  #  @details   Calculates velocity using delta values, period, and unit conversions
-                 self.measured_vel_1 = (self.enc_delta_1.read()*2*math.pi/4000)/self.period*1000000
+                 if self.enc_hist_1 is not None:
+                     self.measured_vel_1 = self.enc_hist_1.derivative()*2*math.pi/4000*1000000
+                 else:
+                     self.measured_vel_1 = (self.enc_delta_1.read()*2*math.pi/4000)/self.period*1000000
                  ## @brief     Creates a variable that calculates difference between time reference points
                  #  @details   Used to collect data for a maximum time of 30 seconds
                  self.time_diff = utime.ticks_diff(current_time, self.collect_time)/1000000
@@ -279,7 +299,10 @@ class Task_User():
             elif self.state == S3_collect_data_2:
                  ## @brief     Creates a variable that calculates velocity for motor 2
                  #  @details   Calculates velocity using delta values, period, and unit conversions
-                 self.measured_vel_2 = (self.enc_delta_2.read()*2*math.pi/4000)/self.period*1000000
+                 if self.enc_hist_2 is not None:
+                     self.measured_vel_2 = self.enc_hist_2.derivative()*2*math.pi/4000*1000000
+                 else:
+                     self.measured_vel_2 = (self.enc_delta_2.read()*2*math.pi/4000)/self.period*1000000
                  ## @brief     Creates a variable that calculates difference between time reference points
                  #  @details   Used to collect data for a maximum time of 30 seconds
                  self.time_diff = utime.ticks_diff(current_time, self.collect_time)/1000000
@@ -456,7 +479,7 @@ class Task_User():
             else:
                 raise ValueError('Invalid State.')
             
-            self.next_time = utime.ticks_add(self.next_time, self.period)
+            scheduling.next_release(self, current_time)
             self.runs += 1
             
     def transition_to(self, new_state):
@@ -1,70 +1,134 @@
 '''@file        closedloop.py
    @brief       Closed loop control used with a motor and encoder to modify and control motor speed
    @details     Takes input values (gain and reference value) to compute actuation levels based on measured values. Can also be used to modify gain value.
+                The controller is a discrete PID controller. With an integral gain, the
+                steady-state tracking error of a velocity step is driven to zero instead of
+                only being reduced by a larger proportional gain.
    @author      Faith Chau
    @author      Luisa Chiu
    @date        November 15, 2021
 '''
 
-from ulab import numpy as np
-
 class ClosedLoop:
     ''' @brief   A closed loop speed control used in conjuction with the motor and encoder drivers
-        @details Objects of this class can be used to control and monitor motor speed
-        
+        @details Objects of this class can be used to control and monitor motor speed.
+                 Every run computes the actuation level
+                 L = Kp*e + I + D,  e = inp_vel - meas_vel,
+                 where the integral term I accumulates Ki*T*e and the derivative term
+                 D acts on the measured velocity through a first-order low pass filter
+                 with time constant tau, discretized with the backward Euler method:
+                 D = a*D - b*(meas_vel - previous meas_vel),  a = tau/(tau + T),  b = Kd/(tau + T).
+                 The coefficients are computed once by set_gains(), so a run only
+                 takes a handful of multiply-adds. The integrator is clamped to the
+                 saturation limits and does not grow while the output is saturated
+                 in the same direction, so it does not wind up during large steps.
     '''
 
-    def __init__ (self, sat_max, sat_min, L, state_vect, gain):
+    def __init__ (self, inp_vel, meas_vel, sat_max, sat_min, L, gain, Ki=0, Kd=0, period=20000, tau=0.05):
         ''' @brief            Constructs a controller object that computes an actuation value based on reference and measured values
-            @details          This class uses gains and position and angle data to compute an actuation value.
+            @details          This class uses the gains and the reference and measured velocities to compute an actuation value.
+            @param inp_vel    Variable that defines the reference velocity in rad/s
+            @param meas_vel   Variable that defines the measured velocity in rad/s
             @param sat_max    Variable used to define maximum saturation limit for the PWM level used for motor speed
             @param sat_min    Variable used to define minimum saturation limit for the PWM level used for motor speed
             @param L          Variable used to define actuation level
-            @state_vect       Variable used to define state vectors
-            @param gain       Variable used to define proportional gain value
+            @param gain       Variable used to define proportional gain value, Kp, in percent per rad/s
+            @param Ki         The integral gain in percent per rad
+            @param Kd         The derivative gain in percent per rad/s^2
+            @param period     The period, in microseconds, between runs of the controller
+            @param tau        Time constant, in seconds, of the derivative filter
         '''
+        ## @brief    Variable that defines the reference velocity
+        #  @details  This is the reference velocity inputted by the user
+        self.inp_vel = inp_vel
+        ## @brief    Variable that defines the measured velocity
+        #  @details  Calculated from the encoder delta by the user interface task
+        self.meas_vel = meas_vel
         ## @brief    Variable used to define maximum saturation limit for the PWM level
         #  @details  This value is set to ensure the motor does not fall below a maximum PWM level
         self.sat_max = sat_max
         ## @brief    Variable used to define minimum saturation limit for the PWM level
         #  @details  This value is set to ensure the motor does not fall below a minimum PWM level
         self.sat_min = sat_min
-        ## @brief    Variable used to define actuation level for motor 1
-        #  @details  This value is calculated using gain, position data, and angle data
+        ## @brief    Variable used to define actuation level
+        #  @details  This value is calculated from the velocity error
         self.L = L
         ## @brief    Variable used to define proportional gain value
-        #  @details  This value is the proportional gain inputted by the user.
+        #  @details  This value is the proportional gain inputted by the user. It is read on every run.
         self.gain = gain
-        ## @brief    Variable used to define state vectors
-        #  @details  This array is filled with data in the following order: [position, velocity, angle, angular velocity]
-        self.state_vect = state_vect
-        
+        ## @brief    The integral term of the actuation level
+        self.integral = 0
+        ## @brief    The filtered derivative term of the actuation level
+        self.derivative = 0
+        ## @brief    The measured velocity of the previous run
+        #  @details  None until the first run, so that the derivative term starts from zero
+        self.prev_vel = None
+        self.set_gains(Ki, Kd, period, tau)
+
+    def set_gains (self, Ki, Kd, period=None, tau=None):
+        ''' @brief        Sets the integral and derivative gains and computes the discrete coefficients
+            @param Ki     The integral gain in percent per rad
+            @param Kd     The derivative gain in percent per rad/s^2
+            @param period Optional new period, in microseconds, between runs
+            @param tau    Optional new time constant, in seconds, of the derivative filter
+        '''
+        if period is not None:
+            ## @brief    The period, in seconds, between runs
+            self.T = period/1000000
+        if tau is not None:
+            ## @brief    Time constant, in seconds, of the derivative filter
+            self.tau = tau
+        ## @brief    The integral gain in percent per rad
+        self.Ki = Ki
+        ## @brief    The derivative gain in percent per rad/s^2
+        self.Kd = Kd
+        ## @brief    Integral increment per unit of error, Ki*T
+        self.ki_T = Ki*self.T
+        ## @brief    Derivative filter pole, tau/(tau + T)
+        self.d_a = self.tau/(self.tau + self.T)
+        ## @brief    Derivative filter gain, Kd/(tau + T)
+        self.d_b = Kd/(self.tau + self.T)
+
+    def reset (self):
+        ''' @brief Clears the integral and derivative terms before a new step response
+        '''
+        self.integral = 0
+        self.derivative = 0
+        self.prev_vel = None
+
     def run (self):
-        ''' @brief Uses state vector values and gain values to compute torque to compute actuation value L.
+        ''' @brief Uses the reference and measured velocities and the gains to compute actuation value L.
         '''
-        ## @brief    Variable used to define the array for state vectors
-        #  @details  This array will be filled with state vector data read from the touch panel and IMU
-        self.state_vect_array = np.array([self.state_vect[0].read(), self.state_vect[1].read(), self.state_vect[2].read(), self.state_vect[3].read()])                  
-        ## @brief    Variable used to define the torque calculated
-        #  @details  This value is calculated using gain values and the state vector values
-        self.Torque = np.dot(-self.gain,self.state_vect_array)
-        self.L.write((13.345)*self.Torque*100/4)
-        if self.L.read() > self.sat_max:
-           self.L.write(self.sat_max)
-        if self.L.read() < self.sat_min:
-           self.L.write(self.sat_min)
-        pass                  
-                           
-    
+        meas = self.meas_vel.read()
+        error = self.inp_vel.read() - meas
+        if self.prev_vel is not None:
+            self.derivative = self.d_a*self.derivative - self.d_b*(meas - self.prev_vel)
+        self.prev_vel = meas
+
+        integral = self.integral + self.ki_T*error
+        if integral > self.sat_max:
+            integral = self.sat_max
+        elif integral < self.sat_min:
+            integral = self.sat_min
+        actuation = self.gain.read()*error + integral + self.derivative
+        if actuation > self.sat_max:
+            actuation = self.sat_max
+            if integral > self.integral:
+                integral = self.integral
+        elif actuation < self.sat_min:
+            actuation = self.sat_min
+            if integral < self.integral:
+                integral = self.integral
+        self.integral = integral
+        self.L.write(actuation)
+
     def get__Kp (self):
         ''' @brief Returns gain value for modification
         '''
-        return self.Kp
-        
+        return self.gain.read()
+
 
     def set__Kp (self, Kp):
         ''' @brief Sets modified gain value
         '''
-        ## @brief    Kp represents the proportional gain value
-        #  @details  This value is used for modification
-        self.Kp = Kp
\ No newline at end of file
+        self.gain.write(Kp)
@@ -8,6 +8,7 @@
 '''
 
 import pyb
+import micropython
 
 class Encoder:
     ''' @brief      Class that reads encoder.
@@ -35,6 +36,7 @@ class Encoder:
         #  @details   The total position moved is characterized by the total number of timer counts
         self.enc_pos = 0                 #initialize encoder position
         
+    # emitter: native
     def update(self):
         ''' @brief      Updates encoder position and delta
             @details    Detects delta overflow and corrects delta and calculates encoder position.
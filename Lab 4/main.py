@@ -100,6 +100,11 @@ def main():
     step_flag = shares.Share(0)
     L_1 = shares.Share(0)
     L_2 = shares.Share(0)
+    ## @brief     Integral gain of the velocity controllers in percent per rad
+    #  @details   Drives the steady-state velocity error of a step response to zero
+    Ki = 10
+    ## @brief     Derivative gain of the velocity controllers in percent per rad/s^2
+    Kd = 0
     
     ## @brief        Creates a parameterized task constructor for task_userinterface.py
     #  @details      The constructor takes input arguments and objects and passes them into user task
@@ -113,10 +118,10 @@ def main():
     task3 = Lab4_task_encoder.Task_Encoder(period, enc_pos_2, z_flag_2, enc_delta_2, encoder2)
     ## @brief        Creates a parameterized task constructor for task_motor.py corresponding to motor 1
     #  @details      The constructor takes input arguments and objects and passes them into user task
-    task4 = Lab4_task_motor.Task_Motor(period, motor_1, motor_drv, fault_user_flag, enable_flag, step_flag, gain_1, L_1, inp_vel_1, meas_vel_1)
+    task4 = Lab4_task_motor.Task_Motor(period, motor_1, motor_drv, fault_user_flag, enable_flag, step_flag, gain_1, L_1, inp_vel_1, meas_vel_1, Ki, Kd)
     ## @brief        Creates a parameterized task constructor for task_motor.py corresponding to motor 2
     #  @details      The constructor takes input arguments and objects and passes them into user task
-    task5 = Lab4_task_motor.Task_Motor(period, motor_2, motor_none, fault_user_flag, enable_flag, step_flag, gain_2, L_2, inp_vel_2, meas_vel_2)
+    task5 = Lab4_task_motor.Task_Motor(period, motor_2, motor_none, fault_user_flag, enable_flag, step_flag, gain_2, L_2, inp_vel_2, meas_vel_2, Ki, Kd)
                                   
     task_list = [task1, task2, task3, task4, task5]
     
@@ -0,0 +1,44 @@
+''' @file       scheduling.py
+    @brief      Release timing for the self-timed tasks of this lab.
+    @details    Each task keeps its own next release time and calls
+                next_release() once per run. The overrun policy decides where
+                the next release goes when a run starts after it was due,
+                matching the policies of the term project scheduler.
+    @author     Faith Chau
+    @author     Luisa Chiu
+    @date       December 9, 2021
+'''
+
+import utime
+
+## @brief     Overrun policy that drops the missed releases of a late task
+#  @details   The next release stays on the original period grid
+SKIP = 0
+## @brief     Overrun policy that runs a late task once for every missed release
+#  @details   The task runs back to back until it has caught up with its period grid
+CATCH_UP = 1
+## @brief     Overrun policy that restarts the period of a late task from its actual start time
+#  @details   The next release is one period after the late run started
+RESYNC = 2
+
+def next_release(task, current_time):
+    ''' @brief              Advances a self-timed task to its next release
+        @details            Adds one period to task.next_time and, if the run started after
+                            that release was already due, applies task.policy and adds the
+                            missed releases to task.missed.
+        @param task         A task with next_time, period, policy, and missed attributes
+        @param current_time The utime.ticks_us() value at which the run started
+    '''
+    late = utime.ticks_diff(current_time, task.next_time)
+    task.next_time = utime.ticks_add(task.next_time, task.period)
+    if late >= task.period:
+        if task.policy == CATCH_UP:
+            # Every release is still run, this one late
+            task.missed += 1
+        else:
+            missed = late // task.period
+            task.missed += missed
+            if task.policy == RESYNC:
+                task.next_time = utime.ticks_add(current_time, task.period)
+            else:
+                task.next_time = utime.ticks_add(task.next_time, missed*task.period)
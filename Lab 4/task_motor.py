@@ -8,6 +8,7 @@
 '''
 
 import utime
+import scheduling
 import closedloop
 
 ## @brief     State 1 of the motor task
@@ -32,7 +33,7 @@ class Task_Motor():
     '''
     
     
-    def __init__(self, period, motor_obj, motor_drv, fault_user_flag, enable_flag, step_flag, gain, L, inp_vel, meas_vel):
+    def __init__(self, period, motor_obj, motor_drv, fault_user_flag, enable_flag, step_flag, gain, L, inp_vel, meas_vel, Ki=0, Kd=0, policy=scheduling.RESYNC):
         ''' @brief                   Constructs a motor task
             @details                 The motor task is implemented as a finite state machine.
             @param period            The period, in microseconds, between runs of the task
@@ -45,6 +46,9 @@ class Task_Motor():
             @param L                 Variable used to define actuation level
             @param inp_vel           Variable that defines input velocity
             @param meas_vel          Variable that defines measured velocity
+            @param Ki                The integral gain of the controller in percent per rad
+            @param Kd                The derivative gain of the controller in percent per rad/s^2
+            @param policy            What to do when the task starts after its next release: scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC
     '''
         
         ## @brief     A boolean flag used to alert user of fault for a corresponding motor
@@ -80,6 +84,12 @@ class Task_Motor():
         ## @brief     Initializes starting state to be state 2
         #  @details   Motors begin in the stop state
         self.state = S2_STOP
+        ## @brief     The overrun policy of the task
+        #  @details   One of scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC, applied by scheduling.next_release()
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted by scheduling.next_release()
+        self.missed = 0
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -88,7 +98,7 @@ class Task_Motor():
         self.next_time = utime.ticks_add(utime.ticks_us(), self.period)
         ## @brief     The controller object that refers to closedloop.py
         #  @details   Creates the controller object used to perform closed loop speed control of the motors
-        self.controller = closedloop.ClosedLoop(inp_vel, meas_vel, 100, -100, L, gain)
+        self.controller = closedloop.ClosedLoop(inp_vel, meas_vel, 100, -100, L, gain, Ki, Kd, self.period)
         
     def run(self):
         ''' @brief Runs one iteration of the FSM
@@ -104,6 +114,7 @@ class Task_Motor():
                    self.motor_obj.set_duty(self.L.read())
                    
                    if self.step_flag.read() == 1:
+                      self.controller.reset()
                       self.transition_to(S5_STEP_RESPONSE) 
                       pass
                   
@@ -119,6 +130,7 @@ class Task_Motor():
                       self.transition_to(S3_FAULT)
 
                    if self.step_flag.read() == 1:
+                      self.controller.reset()
                       self.transition_to(S5_STEP_RESPONSE)                          
                                             
                     
@@ -167,7 +179,7 @@ class Task_Motor():
                    if self.step_flag.read() == 0:
                       self.transition_to(S2_STOP)    
             
-            self.next_time = utime.ticks_add(self.next_time, self.period)
+            scheduling.next_release(self, current_time)
             self.runs += 1                
                 
                 
@@ -7,6 +7,7 @@
     \image html  Lab4_TaskUser_FSM.png "Lab 4 Task User FSM"
 '''
 import utime
+import scheduling
 import pyb
 import math
 import array
@@ -103,7 +104,7 @@ class Task_User():
     ''' @brief      User interface task for data collection and interaction with task encoder, task motor, and task motor driver
         @details    Implements a finite state machine that runs a data collection interface.
     '''    
-    def __init__(self, period, enc_pos_1, enc_pos_2, z_flag_1, z_flag_2, fault_user_flag, enable_flag, enc_delta_1, enc_delta_2, gain_1, gain_2, inp_vel_1, inp_vel_2, step_flag, meas_vel_1, meas_vel_2, L_1, L_2):
+    def __init__(self, period, enc_pos_1, enc_pos_2, z_flag_1, z_flag_2, fault_user_flag, enable_flag, enc_delta_1, enc_delta_2, gain_1, gain_2, inp_vel_1, inp_vel_2, step_flag, meas_vel_1, meas_vel_2, L_1, L_2, policy=scheduling.RESYNC):
         ''' @brief                  Constructs the user interface task
             @details                The user task is implemented as a finite state machine that takes in character input from the user and obtains information from the encoder task to present to user.
             @param period           The period, in microseconds, between runs of the task
@@ -124,6 +125,7 @@ class Task_User():
             @param meas_vel_2       Variable that defines measured velocity for motor 2
             @param L_1              Variable used to define actuation level for motor 1
             @param L_2              Variable used to define actuation level for motor 2
+            @param policy           What to do when the task starts after its next release: scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC
         '''
         ## @brief     The frequency of the task
         #  @details   Defines variable that specifies timer frequency
@@ -149,6 +151,12 @@ class Task_User():
         ## @brief     Sets initial state to State 0
         #  @details   FSM starts at State 0, where user input is prompted for further action
         self.state = S0_init
+        ## @brief     The overrun policy of the task
+        #  @details   One of scheduling.SKIP, scheduling.CATCH_UP, or scheduling.RESYNC, applied by scheduling.next_release()
+        self.policy = policy
+        ## @brief     Number of releases of the task that had not started when the following release was due
+        #  @details   Counted by scheduling.next_release()
+        self.missed = 0
         ## @brief     Sets the number of runs to 0
         #  @details   Defines a variable to keep track of runs
         self.runs = 0
@@ -559,7 +567,7 @@ class Task_User():
             else:
                 raise ValueError('Invalid State.')
             
-            self.next_time = utime.ticks_add(self.next_time, self.period)
+            scheduling.next_release(self, current_time)
             self.runs += 1
             
     def transition_to(self, new_state):